@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Per-message encode/decode cost of the RolyPoly JSON codecs.
+
+Runs every installed backend over typical _S, _B and onStatus payloads:
+
+    python bench/codec_bench.py [--number 200000]
+"""
+
+import argparse
+import timeit
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_socket_server.core.codec import CODECS, get_codec
+
+PAYLOADS = {
+    '_S': ('_S', 'k2j4h5g6f7d8s9a0', {'x': 412.5, 'y': 318.0, 'dir': 3, 'state': 'walk', 'ts': 1718035237123}),
+    '_B': ('_B', {'callback_uid': 'cb_1842', '0': {'id': 1842, 'name': 'Player', 'level': 17,
+                  'items': [101, 102, 205, 307], 'coins': 1250}, 'length': 1}),
+    'onStatus': ('onStatus', {'code': 'NetConnection.Connect.Success', 'description': 'Connection succeeded.'}),
+}
+
+def bench(codec, payload, number):
+    data = codec.encode(payload)
+    encode = min(timeit.repeat(lambda: codec.encode(payload), number=number, repeat=3)) / number
+    decode = min(timeit.repeat(lambda: codec.decode(data), number=number, repeat=3)) / number
+    return len(data), encode, decode
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=200000, help='messages per measurement')
+    args = parser.parse_args()
+
+    print(f"{'codec':<10}{'payload':<10}{'bytes':>7}{'encode ns':>12}{'decode ns':>12}")
+    for name in CODECS:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            print(f"{name:<10}not installed")
+            continue
+
+        for payload_name, payload in PAYLOADS.items():
+            size, encode, decode = bench(codec, payload, args.number)
+            print(f"{name:<10}{payload_name:<10}{size:>7}{encode * 1e9:>12.0f}{decode * 1e9:>12.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Cost of a position update relayed to nearby players, interest grid against a scan of ctx.sessions.
+
+Places entities at random in one map, then for each update moves an
+entity and sends a pre-serialized _S frame to everyone within the radius:
+
+    python bench/interest_bench.py [--entities 1000 5000 10000] [--radius 300] [--map-size 4000]
+
+Sessions are stand-ins counting the frames queued for them, so only the
+index and fan-out cost is measured, not the transports.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_socket_server.core.context import Context
+from py_socket_server.protocol.frames import encode_frame
+
+class Entity:
+    __slots__ = ('id', 'position', 'rooms', 'frames')
+
+    def __init__(self, id):
+        self.id = id
+        self.position = None
+        self.rooms = None
+        self.frames = 0
+
+    def send_frame(self, frame, key=None, droppable=False):
+        self.frames += 1
+
+def step(entity, map_size):
+    _, x, y, _ = entity.position
+    return (min(map_size, max(0.0, x + random.uniform(-20, 20))),
+            min(map_size, max(0.0, y + random.uniform(-20, 20))))
+
+def naive_update(ctx, entity, x, y, radius):
+    """What a handler does without an index, check every session of the process."""
+    space = entity.position[0]
+    entity.position = (space, x, y, None)
+    frame = encode_frame('_S', entity.id, {'x': x, 'y': y})
+    radius_squared = radius * radius
+    sent = 0
+    for other in ctx.sessions.values():
+        position = other.position
+        if other is entity or position is None or position[0] != space:
+            continue
+        dx = position[1] - x
+        dy = position[2] - y
+        if dx * dx + dy * dy <= radius_squared:
+            other.send_frame(frame)
+            sent += 1
+    return sent
+
+def grid_update(ctx, entity, x, y, radius):
+    ctx.interest.move(entity, x, y)
+    return ctx.broadcast_nearby(entity, radius, '_S', entity.id, {'x': x, 'y': y})
+
+def run(count, args):
+    random.seed(count)
+    ctx = Context({'interest': {'cell_size': args.cell_size}})
+    entities = [Entity(f'e{i}') for i in range(count)]
+    for entity in entities:
+        ctx.sessions[entity.id] = entity
+        ctx.interest.move(entity, random.uniform(0, args.map_size), random.uniform(0, args.map_size))
+
+    results = {}
+    for name, update in (('scan', naive_update), ('grid', grid_update)):
+        movers = [random.choice(entities) for _ in range(args.updates)]
+        sent = 0
+        start = time.perf_counter()
+        for entity in movers:
+            x, y = step(entity, args.map_size)
+            sent += update(ctx, entity, x, y, args.radius)
+        elapsed = time.perf_counter() - start
+        results[name] = (elapsed / args.updates * 1e6, sent / args.updates)
+        if name == 'scan':
+            # The scan bypassed the grid, put everyone back where it thinks they are
+            for entity in entities:
+                _, x, y, _ = entity.position
+                ctx.interest.remove(entity)
+                ctx.interest.move(entity, x, y)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entities', type=int, nargs='+', default=[1000, 5000, 10000])
+    parser.add_argument('--radius', type=float, default=300)
+    parser.add_argument('--map-size', type=float, default=4000)
+    parser.add_argument('--cell-size', type=int, default=256)
+    parser.add_argument('--updates', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'entities':>9}{'recipients':>12}{'scan us/update':>16}{'grid us/update':>16}{'speedup':>9}")
+    for count in args.entities:
+        results = run(count, args)
+        scan, grid = results['scan'][0], results['grid'][0]
+        print(f"{count:>9}{results['grid'][1]:>12.1f}{scan:>16.1f}{grid:>16.1f}{scan / grid:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
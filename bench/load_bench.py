@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test with simulated RolyPoly clients.
+
+Starts a PySocketServer (as a subprocess by default, or in this process)
+and drives XMLSocket or WebSocket clients against it. Every client sends
+connect, then periodic _S and _P state, an _LG request every few ticks
+whose _B answer gives the round-trip latency, and answers _NSF pings.
+With --binary, WebSocket clients negotiate MessagePack framing:
+
+    python bench/load_bench.py [--protocol xmls|ws] [--binary] [--clients 2000] [--duration 20]
+    python bench/load_bench.py --compare bench/results/xmls-2000-abc1234.json
+
+Results are printed and saved as JSON (--output, by default under
+bench/results/ named after the protocol, client count and commit), and
+--compare prints the change against an earlier result file.
+
+RSS per connection is the server's resident set growth from before the
+clients connect to when they are all connected and idle. In-process runs
+also count the clients, use them for profiling rather than sizing.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+END = b'\x00'
+CONNECT = ['connect', {}]
+NSF_REPLY = ['_NSF']
+CONNECT_SUCCESS = b'NetConnection.Connect.Success'
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+# Compared by --compare, with True when higher is better
+COMPARED = (
+    ('connections_per_second', True),
+    ('messages_per_second', True),
+    ('connect_ms.p50', False),
+    ('connect_ms.p99', False),
+    ('rtt_ms.p50', False),
+    ('rtt_ms.p99', False),
+    ('rtt_ms.p999', False),
+    ('rss_per_connection', False),
+)
+
+def rss(pid='self') -> int:
+    """Resident set size of a process in bytes."""
+    with open(f'/proc/{pid}/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize()
+
+def percentiles(values) -> dict:
+    """p50/p99/p999 and max of a list of latencies in seconds, as milliseconds."""
+    if not values:
+        return {'count': 0, 'p50': None, 'p99': None, 'p999': None, 'max': None}
+    values = sorted(values)
+    last = len(values) - 1
+    pick = lambda q: round(values[min(last, int(q * len(values)))] * 1000, 3)
+    return {'count': len(values), 'p50': pick(0.5), 'p99': pick(0.99), 'p999': pick(0.999),
+            'max': round(values[last] * 1000, 3)}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def server_config(protocol, port, ping, mode, log_dir) -> dict:
+    listener = {'bind': '127.0.0.1', 'port': port, 'ping': ping, 'ping_timeout': ping, 'connect_timeout': 30}
+    if protocol == 'xmls':
+        listener['mode'] = mode
+    return {
+        'name': 'load_bench',
+        'log_type': 'critical',
+        'log_general_path': os.path.join(log_dir, 'load_bench.log'),
+        'log_error_path': os.path.join(log_dir, 'load_bench-errors.log'),
+        protocol: listener,
+    }
+
+async def start_server(config):
+    """Runs a PySocketServer answering the commands the clients send."""
+    from py_socket_server import PySocketServer
+
+    server = PySocketServer(config)
+
+    async def on_pre_connect(session_id, ctx, message):
+        await ctx.sessions[session_id].accept_connection()
+
+    async def on_state(session_id, ctx, message):
+        pass
+
+    async def on_lg(session_id, ctx, message, respond):
+        await respond(message[1], message[2])
+
+    await server.on('preConnect', on_pre_connect)
+    await server.on('_S', on_state)
+    await server.on('_P', on_state)
+    await server.on('_LG', on_lg)
+    task = asyncio.ensure_future(server.run())
+    return server, task
+
+def serve(args):
+    """Subprocess entry point, prints ready once listening and runs until killed."""
+    async def main():
+        await start_server(json.loads(args.serve))
+        await asyncio.sleep(0.2)
+        print('ready', flush=True)
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+class Stats:
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.pings = 0
+        self.connect_times = []
+        self.rtts = []
+        self.measuring = False
+
+class Client:
+    """One simulated player, sends through send() and reads frames in read_loop()."""
+
+    def __init__(self, index, stats, args):
+        self.index = index
+        self.stats = stats
+        self.args = args
+        self.pending = {}
+        self.connected = None
+        self.closed = False
+        self.callbacks = 0
+
+    async def handle(self, frame: bytes):
+        stats = self.stats
+        if stats.measuring:
+            stats.received += 1
+        if frame.startswith(b'["_B"'):
+            sent = self.pending.pop(json.loads(frame)[1]['callback_uid'], None)
+            if sent is not None and stats.measuring:
+                stats.rtts.append(time.perf_counter() - sent)
+        elif frame.startswith(b'["_NSF"'):
+            stats.pings += 1
+            await self.send_calls([NSF_REPLY])
+        elif CONNECT_SUCCESS in frame and not self.connected.done():
+            self.connected.set_result(True)
+
+    async def run(self, ready: asyncio.Semaphore):
+        self.connected = asyncio.get_running_loop().create_future()
+        async with ready:
+            start = time.perf_counter()
+            await self.open()
+            reader = asyncio.ensure_future(self.read_loop())
+            await self.send_calls([CONNECT])
+            await asyncio.wait_for(self.connected, 30)
+            self.stats.connect_times.append(time.perf_counter() - start)
+        return reader
+
+    async def traffic(self, stop: asyncio.Event):
+        args = self.args
+        position = [random.uniform(0, 1000), random.uniform(0, 1000)]
+        tick = 0
+        # Spread the clients over the interval so they do not send in lockstep
+        await asyncio.sleep(random.uniform(0, args.interval))
+        while not stop.is_set():
+            tick += 1
+            position[0] += random.uniform(-5, 5)
+            position[1] += random.uniform(-5, 5)
+            calls = [['_S', {'x': round(position[0], 1), 'y': round(position[1], 1), 'dir': tick & 7, 'state': 'walk'}]]
+            if tick % args.position_every == 0:
+                calls.append(['_P', round(position[0], 1), round(position[1], 1)])
+            if tick % args.request_every == 0:
+                self.callbacks += 1
+                uid = f'cb{self.index}_{self.callbacks}'
+                self.pending[uid] = time.perf_counter()
+                calls.append(['_LG', {'item': self.callbacks}, uid])
+            if self.stats.measuring:
+                self.stats.sent += len(calls)
+            await self.send_calls(calls)
+            await asyncio.sleep(args.interval)
+
+    async def send_calls(self, calls):
+        await self.send(b''.join(json.dumps(call).encode() + END for call in calls))
+
+class XmlsClient(Client):
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.args.port)
+
+    async def send(self, data):
+        if not self.closed:
+            self.writer.write(data)
+            await self.writer.drain()
+
+    async def read_loop(self):
+        try:
+            while True:
+                frame = await self.reader.readuntil(END)
+                await self.handle(frame[:-1])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.closed = True
+
+    async def close(self):
+        self.closed = True
+        self.writer.close()
+
+class WsClient(Client):
+    async def open(self):
+        from websockets.asyncio.client import connect
+        self.ws = await connect(f'ws://127.0.0.1:{self.args.port}', open_timeout=30, ping_interval=None)
+
+    async def send(self, data):
+        if not self.closed:
+            await self.ws.send(data.decode())
+
+    async def read_loop(self):
+        from websockets.exceptions import ConnectionClosed
+        try:
+            async for message in self.ws:
+                if isinstance(message, str):
+                    message = message.encode()
+                for frame in message.split(END):
+                    if frame:
+                        await self.handle(frame)
+        except ConnectionClosed:
+            pass
+        finally:
+            self.closed = True
+
+    async def close(self):
+        self.closed = True
+        await self.ws.close()
+
+class BinaryWsClient(WsClient):
+    """WebSocket client using the MessagePack subprotocol, each message is a call or a list of calls."""
+
+    async def open(self):
+        from websockets.asyncio.client import connect
+        self.ws = await connect(f'ws://127.0.0.1:{self.args.port}', open_timeout=30, ping_interval=None,
+                                subprotocols=['rolypoly.msgpack'])
+        if self.ws.subprotocol != 'rolypoly.msgpack':
+            raise RuntimeError('Server did not select the binary subprotocol')
+
+    async def send_calls(self, calls):
+        if not self.closed:
+            await self.ws.send(self.codec.encode(calls[0] if len(calls) == 1 else calls))
+
+    async def read_loop(self):
+        from websockets.exceptions import ConnectionClosed
+        try:
+            async for message in self.ws:
+                message = self.codec.decode(message)
+                for call in (message if isinstance(message[0], list) else (message,)):
+                    await self.handle_call(call)
+        except ConnectionClosed:
+            pass
+        finally:
+            self.closed = True
+
+    async def handle_call(self, call):
+        stats = self.stats
+        if stats.measuring:
+            stats.received += 1
+        command = call[0]
+        if command == '_B':
+            sent = self.pending.pop(call[1]['callback_uid'], None)
+            if sent is not None and stats.measuring:
+                stats.rtts.append(time.perf_counter() - sent)
+        elif command == '_NSF':
+            stats.pings += 1
+            await self.send_calls([NSF_REPLY])
+        elif command == 'onStatus' and call[1].get('code') == 'NetConnection.Connect.Success' and not self.connected.done():
+            self.connected.set_result(True)
+
+async def run_load(args, server_pid):
+    stats = Stats()
+    if args.protocol == 'xmls':
+        client_class = XmlsClient
+    elif args.binary:
+        from py_socket_server.core.codec import get_codec
+        BinaryWsClient.codec = get_codec('msgpack')
+        client_class = BinaryWsClient
+    else:
+        client_class = WsClient
+    clients = [client_class(i, stats, args) for i in range(args.clients)]
+
+    base_rss = rss(server_pid)
+    ready = asyncio.Semaphore(args.connect_concurrency)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client.run(ready) for client in clients), return_exceptions=True)
+    connect_elapsed = time.perf_counter() - start
+    readers = [result for result in results if not isinstance(result, BaseException)]
+    failed = [result for result in results if isinstance(result, BaseException)]
+    if failed:
+        print(f"{len(failed)} clients failed to connect, first error: {failed[0]!r}", file=sys.stderr)
+
+    await asyncio.sleep(1)
+    connected_rss = rss(server_pid)
+
+    stop = asyncio.Event()
+    active = [client for client, result in zip(clients, results) if not isinstance(result, BaseException)]
+    senders = [asyncio.ensure_future(client.traffic(stop)) for client in active]
+    # Let every client send once before measuring
+    await asyncio.sleep(args.interval * 2)
+    stats.measuring = True
+    measure_start = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stats.measuring = False
+    measured = time.perf_counter() - measure_start
+    stop.set()
+    await asyncio.gather(*senders, return_exceptions=True)
+
+    disconnected = sum(1 for client in active if client.closed)
+    for client in active:
+        await client.close()
+    await asyncio.gather(*readers, return_exceptions=True)
+
+    return {
+        'clients': args.clients,
+        'connected': len(active),
+        'disconnected_during_run': disconnected,
+        'connect_seconds': round(connect_elapsed, 3),
+        'connections_per_second': round(len(active) / connect_elapsed, 1),
+        'connect_ms': percentiles(stats.connect_times),
+        'duration': round(measured, 3),
+        'messages_sent': stats.sent,
+        'messages_received': stats.received,
+        'messages_per_second': round((stats.sent + stats.received) / measured, 1),
+        'pings_answered': stats.pings,
+        'rtt_ms': percentiles(stats.rtts),
+        'rss_before': base_rss,
+        'rss_connected': connected_rss,
+        'rss_per_connection': round((connected_rss - base_rss) / max(1, len(active))),
+    }
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def lookup(result, path):
+    for key in path.split('.'):
+        result = (result or {}).get(key)
+    return result
+
+def compare(previous, current) -> None:
+    print(f"\ncompared with {previous.get('commit')} ({previous.get('time')})")
+    for path, higher_is_better in COMPARED:
+        old, new = lookup(previous['result'], path), lookup(current['result'], path)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        worse = change < 0 if higher_is_better else change > 0
+        flag = '  <- worse' if worse and abs(change) >= 10 else ''
+        print(f"{path:<26}{old:>12}{new:>12}{change:>+9.1f}%{flag}")
+
+def report(result) -> None:
+    print(f"clients {result['connected']}/{result['clients']}, "
+          f"{result['disconnected_during_run']} disconnected during the run")
+    print(f"connect      {result['connections_per_second']:>10} conn/s   "
+          f"p50 {result['connect_ms']['p50']} ms  p99 {result['connect_ms']['p99']} ms")
+    print(f"traffic      {result['messages_per_second']:>10} msg/s    "
+          f"{result['messages_sent']} sent, {result['messages_received']} received, "
+          f"{result['pings_answered']} pings answered")
+    rtt = result['rtt_ms']
+    print(f"_LG rtt      p50 {rtt['p50']} ms  p99 {rtt['p99']} ms  p999 {rtt['p999']} ms  "
+          f"max {rtt['max']} ms  ({rtt['count']} requests)")
+    print(f"server rss   {result['rss_per_connection']} B/connection")
+
+async def main(args):
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = args.clients * (3 if args.in_process else 2) + 256
+        if soft < wanted:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+    except (ValueError, OSError):
+        pass
+
+    args.port = free_port()
+    log_dir = tempfile.mkdtemp(prefix='load_bench')
+    config = server_config(args.protocol, args.port, args.ping, args.mode, log_dir)
+
+    process = server = task = None
+    if args.in_process:
+        server, task = await start_server(config)
+        await asyncio.sleep(0.2)
+        server_pid = 'self'
+    else:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, __file__, '--serve', json.dumps(config), stdout=asyncio.subprocess.PIPE)
+        line = await asyncio.wait_for(process.stdout.readline(), 30)
+        if line.strip() != b'ready':
+            raise RuntimeError('Server did not start')
+        server_pid = process.pid
+
+    try:
+        result = await run_load(args, server_pid)
+    finally:
+        if process is not None:
+            process.terminate()
+            await process.wait()
+        if server is not None:
+            await server.stop()
+            task.cancel()
+
+    return {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'settings': {
+            'protocol': args.protocol,
+            'mode': args.mode if args.protocol == 'xmls' else None,
+            'binary': args.binary and args.protocol != 'xmls',
+            'in_process': args.in_process,
+            'interval': args.interval,
+            'request_every': args.request_every,
+            'position_every': args.position_every,
+            'ping': args.ping,
+        },
+        'result': result,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--protocol', choices=('xmls', 'ws'), default='xmls')
+    parser.add_argument('--binary', action='store_true', help='WebSocket clients use MessagePack framing')
+    parser.add_argument('--mode', choices=('stream', 'buffered'), default='stream', help='XMLSocket server mode')
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--duration', type=float, default=20, help='seconds of measured traffic')
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between _S updates of a client')
+    parser.add_argument('--position-every', type=int, default=2, help='ticks between _P updates')
+    parser.add_argument('--request-every', type=int, default=4, help='ticks between _LG requests')
+    parser.add_argument('--ping', type=int, default=5, help='server ping interval in seconds')
+    parser.add_argument('--connect-concurrency', type=int, default=200, help='connects in flight at once')
+    parser.add_argument('--in-process', action='store_true', help='run the server in this process')
+    parser.add_argument('--output', help='result file, "-" to only print')
+    parser.add_argument('--compare', help='earlier result file to compare with')
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.serve:
+        serve(args)
+        sys.exit()
+
+    current = asyncio.run(main(args))
+    report(current['result'])
+
+    if args.output != '-':
+        output = Path(args.output) if args.output else \
+            RESULTS_DIR / f"{args.protocol}{'-binary' if args.binary else ''}-{args.clients}-{current['commit'] or 'local'}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2) + '\n')
+        print(f"saved {output}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), current)
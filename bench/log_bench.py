@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Cost of a log call on the event-loop thread, direct handlers against the queued writer.
+
+Writes to files under a temporary directory and to /dev/null instead of stdout:
+
+    python bench/log_bench.py [--number 50000]
+
+The queued numbers include the time the writer thread holds the GIL while
+the loop thread logs, they are what the event loop actually loses.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_socket_server.core.logger import LOG_FORMAT, setup_logging, stop_logging
+
+ARGS = ('k2j4h5g6f7d8s9a0', '10.0.0.1', ['connect', {}])
+
+def measure(call, number) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        call()
+    return (time.perf_counter() - start) / number * 1e9
+
+def run(logger, number):
+    enabled = measure(lambda: logger.info("[socket connect] id=%s ip=%s args=%s", *ARGS), number)
+    lazy = measure(lambda: logger.debug("[socket connect] id=%s ip=%s args=%s", *ARGS), number)
+    eager = measure(lambda: logger.debug(f"[socket connect] id={ARGS[0]} ip={ARGS[1]} args={ARGS[2]}"), number)
+    return enabled, lazy, eager
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=50000, help='calls per measurement')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    devnull = open(os.devnull, 'w')
+
+    direct = logging.getLogger('bench.direct')
+    direct.propagate = False
+    direct.setLevel(logging.INFO)
+    error_handler = logging.FileHandler(os.path.join(directory, 'direct-errors.log'))
+    error_handler.setLevel(logging.ERROR)
+    for handler in (RotatingFileHandler(os.path.join(directory, 'direct.log'), maxBytes=2097152, backupCount=3),
+                    error_handler, logging.StreamHandler(devnull)):
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        direct.addHandler(handler)
+
+    queued = logging.getLogger('bench.queued')
+    queued.propagate = False
+    stdout, sys.stdout = sys.stdout, devnull
+    setup_logging(queued, {'name': 'bench', 'log_type': 'info',
+                           'log_general_path': os.path.join(directory, 'queued.log'),
+                           'log_error_path': os.path.join(directory, 'queued-errors.log')})
+    sys.stdout = stdout
+
+    print(f"{'pipeline':<10}{'info ns':>10}{'debug off, %':>15}{'debug off, f-string':>22}")
+    for name, logger in (('direct', direct), ('queued', queued)):
+        enabled, lazy, eager = run(logger, args.number)
+        print(f"{name:<10}{enabled:>10.0f}{lazy:>15.0f}{eager:>22.0f}")
+
+    start = time.perf_counter()
+    stop_logging()
+    print(f"writer drained its backlog in {time.perf_counter() - start:.2f}s after the loop returned")
+
+if __name__ == '__main__':
+    main()
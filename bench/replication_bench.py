@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Bandwidth and CPU of replicated player state, full states against deltas.
+
+Players of one room move every tick and now and then change status,
+direction or outfit. Reports per simulated second the CPU spent building
+frames and the bytes queued per client, for clients taking full states
+(old clients) and clients that enabled deltas:
+
+    python bench/replication_bench.py [--players 50 100 200] [--rate 20] [--seconds 5]
+
+Sessions are stand-ins counting queued bytes, transports are not included.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_socket_server.core.context import Context
+
+class Player:
+    __slots__ = ('id', 'position', 'rooms', 'bytes', 'dropped_frames')
+
+    def __init__(self, id):
+        self.id = id
+        self.position = None
+        self.rooms = None
+        self.bytes = 0
+        self.dropped_frames = 0
+
+    def send_frame(self, frame, key=None, droppable=False):
+        self.bytes += len(frame)
+
+def initial_state(i) -> dict:
+    return {
+        'avatar': f'avatar_{i % 12}',
+        'outfit': [random.randint(100, 999) for _ in range(8)],
+        'x': random.randint(0, 4000),
+        'y': random.randint(0, 4000),
+        'dir': random.randint(0, 7),
+        'status': 'idle',
+        'name': f'Player{i}',
+    }
+
+def changes(state) -> dict:
+    fields = {'x': state['x'] + random.randint(-8, 8), 'y': state['y'] + random.randint(-8, 8)}
+    roll = random.random()
+    if roll < 0.2:
+        fields['dir'] = random.randint(0, 7)
+    if roll < 0.05:
+        fields['status'] = random.choice(('idle', 'walk', 'sit', 'dance'))
+    if roll < 0.002:
+        fields['outfit'] = [random.randint(100, 999) for _ in range(8)]
+    return fields
+
+def simulate(players, rate, seconds, delta):
+    random.seed(players)
+    ctx = Context({'tick': {'rate': rate}, 'replication': {'keyframe_every': rate * 5}})
+    room = [Player(f'p{i:05d}') for i in range(players)]
+    replication = ctx.replication
+    for i, player in enumerate(room):
+        ctx.rooms.join('map', player)
+        if delta:
+            replication.enable_delta(player)
+        replication.update('map', player.id, initial_state(i))
+    # Everyone gets the first snapshot before measuring
+    ctx.ticks.flush()
+    for player in room:
+        player.bytes = 0
+    replication.build_time = 0.0
+
+    start = time.process_time()
+    for _ in range(rate * seconds):
+        for player in room:
+            replication.update('map', player.id, changes(replication.state('map', player.id)))
+        ctx.ticks.flush()
+    cpu = time.process_time() - start
+
+    return replication.build_time / seconds, cpu / seconds, sum(player.bytes for player in room) / players / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--players', type=int, nargs='+', default=[50, 100, 200])
+    parser.add_argument('--rate', type=int, default=20, help='ticks per second')
+    parser.add_argument('--seconds', type=int, default=5, help='simulated seconds')
+    args = parser.parse_args()
+
+    print(f"{'players':>8}{'clients':>8}{'build ms/s':>12}{'total ms/s':>12}{'KB/s per client':>17}")
+    for players in args.players:
+        for name, delta in (('full', False), ('delta', True)):
+            build, cpu, per_client = simulate(players, args.rate, args.seconds, delta)
+            print(f"{players:>8}{name:>8}{build * 1000:>12.1f}{cpu * 1000:>12.1f}{per_client / 1024:>17.1f}")
+
+if __name__ == '__main__':
+    main()
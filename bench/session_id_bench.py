@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Session id allocation cost, batched allocator against the previous generator.
+
+The previous generator is reproduced here as it was in base_session.py:
+
+    python bench/session_id_bench.py [--number 200000] [--live 50000]
+"""
+
+import argparse
+import math
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_socket_server.core.session_id import ALPHABET, IdAllocator
+
+POOL_SIZE_MULTIPLIER = 128
+pool = None
+pool_offset = 0
+
+def fill_pool(bytes):
+    global pool, pool_offset
+    if pool is None or len(pool) < bytes:
+        pool = os.urandom(bytes * POOL_SIZE_MULTIPLIER)
+        pool_offset = 0
+    elif pool_offset + bytes > len(pool):
+        pool = os.urandom(len(pool))
+        pool_offset = 0
+    pool_offset += bytes
+
+def random_bytes(bytes):
+    fill_pool(bytes)
+    return pool[pool_offset - bytes:pool_offset]
+
+def custom_random(alphabet, default_size, get_random):
+    mask = (2 << (31 - (alphabet_length := len(alphabet)) - 1).bit_length()) - 1
+    step = math.ceil((1.6 * mask * default_size) / alphabet_length)
+
+    def generate(size=default_size):
+        id_str = ""
+        while True:
+            bytes_data = get_random(step)
+            for i in range(step):
+                char_index = bytes_data[i] & mask
+                if char_index < alphabet_length:
+                    id_str += alphabet[char_index]
+                if len(id_str) >= size:
+                    return id_str
+    return generate
+
+legacy_random_id = custom_random(ALPHABET, 16, random_bytes)
+
+def measure(allocate, number):
+    return min(timeit.repeat(allocate, number=number, repeat=5)) / number
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=200000, help='ids per measurement')
+    parser.add_argument('--live', type=int, default=50000, help='live sessions checked for collisions')
+    args = parser.parse_args()
+
+    allocator = IdAllocator()
+    live = {allocator.allocate(): None for _ in range(args.live)}
+    cases = {
+        'legacy': legacy_random_id,
+        'batched': IdAllocator().allocate,
+        'batched+live': IdAllocator(live).allocate,
+        'batched+node': IdAllocator(live, prefix='3-').allocate,
+    }
+
+    print(f"{'generator':<14}{'ns/id':>10}{'ids/s':>14}")
+    baseline = None
+    for name, allocate in cases.items():
+        cost = measure(allocate, args.number)
+        baseline = baseline or cost
+        print(f"{name:<14}{cost * 1e9:>10.0f}{1 / cost:>14,.0f}  x{baseline / cost:.1f}")
+
+    sample = [cases['batched']() for _ in range(100000)]
+    counts = {char: 0 for char in ALPHABET}
+    for session_id in sample:
+        for char in session_id:
+            counts[char] += 1
+    expected = len(sample) * 16 / len(ALPHABET)
+    spread = max(abs(count - expected) / expected for count in counts.values())
+    print(f"unique {len(set(sample)) == len(sample)}, max character frequency deviation {spread:.2%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Bytes per idle XMLSocket connection.
+
+Opens sessions through the real server code path (stream or buffered mode)
+over in-memory transports, sends each one a connect command and reports
+Python heap (tracemalloc) and RSS growth per session at every checkpoint:
+
+    python bench/session_memory.py [--mode stream|buffered] [--counts 10000 50000 100000]
+
+Kernel socket buffers are not included, add them on top when sizing hosts.
+"""
+
+import argparse
+import asyncio
+import gc
+import resource
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_socket_server.core.context import Context
+from py_socket_server.server.xmls_server import PyXmlsServer
+from py_socket_server.server.xmls_protocol import XmlsBufferedProtocol
+
+CONNECT = b'["connect",{}]\x00'
+
+class MemoryTransport(asyncio.Transport):
+    """Transport that accepts writes and discards them."""
+
+    def __init__(self, peer):
+        super().__init__()
+        self.peer = peer
+        self.closing = False
+
+    def get_extra_info(self, name, default=None):
+        if name == 'peername':
+            return self.peer
+        return default
+
+    def write(self, data):
+        pass
+
+    def writelines(self, data):
+        pass
+
+    def is_closing(self):
+        return self.closing
+
+    def close(self):
+        self.closing = True
+
+    def abort(self):
+        self.closing = True
+
+    def pause_reading(self):
+        pass
+
+    def resume_reading(self):
+        pass
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def get_write_buffer_limits(self):
+        return 0, 65536
+
+def rss() -> int:
+    """Current resident set size in bytes."""
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize()
+
+def open_connection(server, mode, i):
+    transport = MemoryTransport((f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}', 40000))
+    if mode == 'buffered':
+        protocol = XmlsBufferedProtocol(server.ctx, server)
+        protocol.connection_made(transport)
+        buffer = protocol.get_buffer(-1)
+        buffer[:len(CONNECT)] = CONNECT
+        protocol.buffer_updated(len(CONNECT))
+    else:
+        reader = asyncio.StreamReader()
+        protocol = asyncio.StreamReaderProtocol(reader, server.handle_request)
+        protocol.connection_made(transport)
+        protocol.data_received(CONNECT)
+    return protocol
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=('stream', 'buffered'), default='buffered')
+    parser.add_argument('--counts', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--no-tracemalloc', action='store_true', help='only report RSS, which is faster')
+    args = parser.parse_args()
+
+    config = {
+        'name': 'bench',
+        'log_type': 'critical',
+        'xmls': {'bind': '127.0.0.1', 'port': 0, 'mode': args.mode, 'ping': 60, 'ping_timeout': 30},
+    }
+    ctx = Context(config)
+    server = PyXmlsServer(ctx)
+
+    connections = []
+    gc.collect()
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+    base_rss = rss()
+    base_heap = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+    print(f"mode {args.mode}")
+    print(f"{'sessions':>10}{'heap B/session':>16}{'rss B/session':>15}")
+    for count in sorted(args.counts):
+        while len(connections) < count:
+            connections.append(open_connection(server, args.mode, len(connections)))
+            if len(connections) % 1000 == 0:
+                # Let the session tasks handle their connect command
+                for _ in range(3):
+                    await asyncio.sleep(0)
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+        gc.collect()
+        heap = tracemalloc.get_traced_memory()[0] - base_heap if tracemalloc.is_tracing() else 0
+        grown = rss() - base_rss
+        print(f"{len(ctx.sessions):>10}{heap / count:>16.0f}{grown / count:>15.0f}")
+
+    for protocol in connections:
+        protocol.connection_lost(None)
+    while ctx.sessions:
+        await asyncio.sleep(0)
+    ctx.timers.stop()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Fan-out cost of room state updates sent right away against batched per tick.
+
+Every player of one room sends updates per second, each relayed to the
+rest of the room. Reports, per simulated second, the CPU spent and the
+frames queued for clients:
+
+    python bench/tick_bench.py [--players 50 100 200] [--updates 10] [--rate 20]
+
+Sessions are stand-ins counting queued frames and bytes, so transports are
+not included. With a rate, a frame carries every change of its tick.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_socket_server.core.context import Context
+
+class Player:
+    __slots__ = ('id', 'position', 'rooms', 'frames', 'bytes')
+
+    def __init__(self, id):
+        self.id = id
+        self.position = None
+        self.rooms = None
+        self.frames = 0
+        self.bytes = 0
+
+    def send_frame(self, frame, key=None, droppable=False):
+        self.frames += 1
+        self.bytes += len(frame)
+
+def simulate(players, updates, rate):
+    ctx = Context({'tick': {'rate': rate}})
+    room = [Player(f'p{i:05d}') for i in range(players)]
+    for player in room:
+        ctx.rooms.join('map', player)
+
+    # Not started, ticks are flushed by hand below, one per 1 / rate of simulated time
+    ticks = ctx.ticks
+    per_tick = updates * players // (rate or updates)
+
+    start = time.process_time()
+    sent = 0
+    for tick in range(rate or updates):
+        for _ in range(per_tick):
+            player = random.choice(room)
+            ticks.update('map', player.id, {'x': random.randint(0, 4000), 'y': random.randint(0, 4000),
+                                            'dir': random.randint(0, 7), 'state': 'walk'})
+            sent += 1
+        if rate:
+            ticks.flush()
+    cpu = time.process_time() - start
+
+    return cpu, sum(player.frames for player in room), sum(player.bytes for player in room), sent
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--players', type=int, nargs='+', default=[50, 100, 200])
+    parser.add_argument('--updates', type=int, default=10, help='updates per player and second')
+    parser.add_argument('--rate', type=int, default=20, help='ticks per second')
+    args = parser.parse_args()
+
+    print(f"{'players':>8}{'mode':>10}{'cpu ms/s':>10}{'frames/s':>11}{'KB/s':>9}")
+    for players in args.players:
+        for name, rate in (('immediate', 0), (f'{args.rate} Hz', args.rate)):
+            cpu, frames, sent_bytes, _ = simulate(players, args.updates, rate)
+            print(f"{players:>8}{name:>10}{cpu * 1000:>10.1f}{frames:>11}{sent_bytes / 1024:>9.0f}")
+
+if __name__ == '__main__':
+    main()
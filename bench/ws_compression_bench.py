@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+CPU and bytes of compressed WebSocket broadcasts, per connection against shared.
+
+A room of clients is sent the same state frame every tick. Per connection
+is permessage-deflate as negotiated by default, each connection compressing
+with its own context. Shared compresses every frame once, without context
+takeover, and reuses the bytes for all recipients:
+
+    python bench/ws_compression_bench.py [--clients 10 100 500] [--ticks 100] [--players 50]
+
+Runs the extensions' encoding as the server does when writing a message,
+sockets are not included.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from websockets.frames import Frame, Opcode
+
+from py_socket_server.protocol.frames import encode_frame
+from py_socket_server.server.ws_compression import CompressionFactory
+
+def tick_frames(players, ticks) -> list:
+    """Frames of a room where every player moves each tick."""
+    random.seed(players)
+    states = {f'p{i:05d}': {'x': random.randint(0, 4000), 'y': random.randint(0, 4000),
+                            'dir': random.randint(0, 7), 'status': 'walk'} for i in range(players)}
+    frames = []
+    for _ in range(ticks):
+        for state in states.values():
+            state['x'] += random.randint(-8, 8)
+            state['y'] += random.randint(-8, 8)
+        frames.append(b''.join(encode_frame('_S', entity_id, state) for entity_id, state in states.items()))
+    return frames
+
+def negotiate(factory, clients) -> list:
+    """Extensions of clients offering permessage-deflate with default parameters."""
+    return [factory.process_request_params([('client_max_window_bits', None)], [])[1] for _ in range(clients)]
+
+def per_connection(frames, clients, args) -> tuple:
+    factory = CompressionFactory(args.window_bits, args.mem_level, 0, shared=False)
+    extensions = negotiate(factory, clients)
+    sent = 0
+    start = time.process_time()
+    for frame in frames:
+        for extension in extensions:
+            sent += len(extension.encode(Frame(Opcode.BINARY, frame)).data)
+    return time.process_time() - start, sent
+
+def shared(frames, clients, args) -> tuple:
+    factory = CompressionFactory(args.window_bits, args.mem_level, 0, shared=True)
+    extensions = negotiate(factory, clients)
+    sent = 0
+    start = time.process_time()
+    for frame in frames:
+        for extension in extensions:
+            sent += len(extension.encode(Frame(Opcode.BINARY, extension.compress_shared(frame))).data)
+    return time.process_time() - start, sent
+
+def uncompressed(frames, clients, args) -> tuple:
+    return 0.0, sum(len(frame) for frame in frames) * clients
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--ticks', type=int, default=100)
+    parser.add_argument('--players', type=int, default=50, help='entities in every frame')
+    parser.add_argument('--window-bits', type=int, default=12)
+    parser.add_argument('--mem-level', type=int, default=5)
+    args = parser.parse_args()
+
+    frames = tick_frames(args.players, args.ticks)
+    print(f"frame {sum(map(len, frames)) // len(frames)} bytes, {args.ticks} ticks")
+    print(f"{'clients':>8}{'mode':>16}{'cpu ms':>10}{'us/frame':>10}{'KB sent':>10}{'ratio':>7}")
+    for clients in args.clients:
+        raw = sum(len(frame) for frame in frames) * clients
+        for name, run in (('none', uncompressed), ('per connection', per_connection), ('shared', shared)):
+            cpu, sent = run(frames, clients, args)
+            print(f"{clients:>8}{name:>16}{cpu * 1000:>10.1f}{cpu / len(frames) * 1e6:>10.0f}"
+                  f"{sent / 1024:>10.0f}{sent / raw:>7.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Per-call cost of WebSocket messages, NUL-terminated JSON against binary MessagePack framing.
+
+Feeds a message of typical client calls through the protocol parser up to
+the command callback, and encodes typical server calls the way call()
+and respond_cmd() do:
+
+    python bench/ws_framing_bench.py [--number 50000]
+
+Needs msgspec or msgpack for the binary rows.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_socket_server.core.codec import get_codec
+from py_socket_server.protocol.frames import response_frame, response_payload, END_MARKER_BYTES
+from py_socket_server.protocol.rolypoly_protocol import RolyPolyProtocol
+
+CALLS = [
+    ['_S', {'x': 412.5, 'y': 318.0, 'dir': 3, 'state': 'walk'}],
+    ['_P', 412.5, 318.0],
+    ['_LG', {'item': 1842}, 'cb_1842'],
+]
+STATE = ('_S', 'k2j4h5g6f7d8s9a0', {'x': 412.5, 'y': 318.0, 'dir': 3, 'state': 'walk'})
+RESULT = {'id': 1842, 'name': 'Player', 'level': 17, 'items': [101, 102, 205, 307], 'coins': 1250}
+
+async def command(*args):
+    pass
+
+async def parse_cost(binary, number) -> float:
+    codec = get_codec('msgpack' if binary else None)
+    protocol = RolyPolyProtocol(codec=codec)
+    protocol.on_command_callback = command
+    if binary:
+        message, parse = codec.encode(CALLS), protocol.binary_invoke_handler
+    else:
+        message, parse = ''.join(json.dumps(call) + '\x00' for call in CALLS), protocol.parser_data
+
+    start = time.perf_counter()
+    for _ in range(number):
+        await parse(message)
+    return (time.perf_counter() - start) / number / len(CALLS) * 1e9
+
+def encode_cost(binary, number) -> tuple:
+    codec = get_codec('msgpack' if binary else None)
+    if binary:
+        call = lambda: codec.encode(STATE)
+        respond = lambda: codec.encode(response_payload(RESULT, 'cb_1842'))
+    else:
+        call = lambda: codec.encode(STATE) + END_MARKER_BYTES
+        respond = lambda: response_frame(codec, RESULT, 'cb_1842')
+
+    results = []
+    for encode in (call, respond):
+        start = time.perf_counter()
+        for _ in range(number):
+            encode()
+        results.append((time.perf_counter() - start) / number * 1e9)
+    return results[0], results[1], len(call()), len(respond())
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{'framing':<9}{'parse ns/call':>15}{'call ns':>9}{'bytes':>7}{'respond ns':>12}{'bytes':>7}")
+    for name, binary in (('json', False), ('msgpack', True)):
+        try:
+            parse = await parse_cost(binary, args.number)
+        except ImportError:
+            print(f"{name:<9}not installed")
+            continue
+        call, respond, call_size, respond_size = encode_cost(binary, args.number)
+        print(f"{name:<9}{parse:>15.0f}{call:>9.0f}{call_size:>7}{respond:>12.0f}{respond_size:>7}")
+
+if __name__ == '__main__':
+    asyncio.run(main())
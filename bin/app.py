@@ -9,25 +9,33 @@ sys.path.append(str(Path(__file__).parent.parent / 'py_socket_server'))
 
 from index import PySocketServer
 
-async def main():
+def load_config():
     with open(r'config.json') as config_file:
         config = json.load(config_file)
 
     if 'wss' in config:
         if 'key' in config['wss'] and not os.path.exists(config['wss']['key']):
             config['wss']['key'] = str(Path(__file__).parent.parent / config['wss']['key'])
-        
+
         if 'cert' in config['wss'] and not os.path.exists(config['wss']['cert']):
             config['wss']['cert'] = str(Path(__file__).parent.parent / config['wss']['cert'])
 
+    return config
+
+async def main(config):
     pss = PySocketServer(config)
     await pss.run()
 
 if __name__ == "__main__":
     import asyncio
     import logging
+    config = load_config()
     try:
-        asyncio.run(main())
+        if config.get('workers', 1) > 1:
+            from py_socket_server.cluster.supervisor import Supervisor
+            Supervisor(config).run()
+        else:
+            asyncio.run(main(config))
     except KeyboardInterrupt:
         logger = logging.getLogger('py-socket-server')
-        logger.info('Shutting down...')
\ No newline at end of file
+        logger.info('Shutting down...')
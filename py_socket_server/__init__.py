@@ -1 +1,2 @@
-from py_socket_server.index import PySocketServer
\ No newline at end of file
+from py_socket_server.index import PySocketServer
+from py_socket_server.cluster.supervisor import Supervisor
\ No newline at end of file
@@ -0,0 +1,62 @@
+import importlib
+
+class ClusterBackend:
+    """
+    Transport and session directory shared by the nodes of a cluster.
+    A backend delivers batches of messages between nodes and maps session
+    ids to the node that owns them. Incoming batches are handed to
+    on_batch(messages), and on_node_down(node_id) is called when a peer
+    goes away so its sessions can be forgotten.
+    """
+
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.on_batch = None
+        self.on_node_down = None
+
+    @classmethod
+    def from_config(cls, node_id, nodes, config, ctx):
+        """Builds the backend from the cluster config section."""
+        return cls(node_id)
+
+    async def start(self) -> None:
+        """Connects the node to the cluster."""
+        raise NotImplementedError("Subclasses should implement this method.")
+
+    async def stop(self) -> None:
+        """Disconnects the node from the cluster."""
+        raise NotImplementedError("Subclasses should implement this method.")
+
+    def nodes(self) -> list:
+        """Returns the ids of the other nodes."""
+        raise NotImplementedError("Subclasses should implement this method.")
+
+    def send(self, node_id, messages: list) -> None:
+        """Delivers a batch of messages to one node without waiting for it."""
+        raise NotImplementedError("Subclasses should implement this method.")
+
+    def register(self, session_id) -> None:
+        """Records that this node owns a session."""
+        raise NotImplementedError("Subclasses should implement this method.")
+
+    def unregister(self, session_id) -> None:
+        """Forgets a session owned by this node."""
+        raise NotImplementedError("Subclasses should implement this method.")
+
+    def lookup(self, session_id):
+        """Returns the id of the node owning a session, or None."""
+        raise NotImplementedError("Subclasses should implement this method.")
+
+def load_backend(name):
+    """Resolves a backend class from a short name or a 'module:Class' path."""
+    if name == 'unix':
+        from py_socket_server.cluster.unix_backend import UnixSocketBackend
+        return UnixSocketBackend
+    if name == 'memory':
+        from py_socket_server.cluster.memory_backend import MemoryBackend
+        return MemoryBackend
+
+    module_name, _, class_name = name.partition(':')
+    if not class_name:
+        raise ValueError(f"Unknown cluster backend {name}")
+    return getattr(importlib.import_module(module_name), class_name)
@@ -0,0 +1,162 @@
+import asyncio
+from py_socket_server.core.codec import get_codec
+from py_socket_server.core.context import excluded_ids
+from py_socket_server.cluster.backend import ClusterBackend, load_backend
+from py_socket_server.cluster.remote_session import RemoteSession
+from py_socket_server.core.session_id import node_of
+
+class Cluster:
+    """
+    Cluster layer behind Context.sessions.
+    Keeps the backend directory in sync with local sessions, resolves remote
+    session ids to RemoteSession proxies and delivers targeted calls and room
+    broadcasts over the backend bus. Outgoing messages are batched per node and
+    flushed once per event-loop iteration without waiting for replies.
+    Messages are checked when queued, a call with arguments that cannot be
+    serialized raises to its caller instead of failing the whole batch.
+    """
+
+    def __init__(self, ctx, backend: ClusterBackend):
+        self.ctx = ctx
+        self.backend = backend
+        backend.on_batch = self.on_batch
+        backend.on_node_down = self.on_node_down
+
+        self.codec = get_codec()
+        self.outbox = {}
+        self._handle = None
+
+        self.handlers = {
+            'call': self.on_call,
+            'call_xml': self.on_call_xml,
+            'disconnect': self.on_disconnect,
+            'broadcast': self.on_broadcast,
+        }
+
+    @property
+    def node_id(self):
+        return self.backend.node_id
+
+    async def start(self):
+        await self.backend.start()
+        for session_id in self.ctx.sessions:
+            self.backend.register(session_id)
+
+    async def stop(self):
+        self.flush()
+        await self.backend.stop()
+
+    def send(self, node_id, *message) -> None:
+        """Queues a message for one node, delivered with the next batch."""
+        self.codec.encode(message)
+        self.queue(node_id, message)
+
+    def publish(self, *message) -> None:
+        """Queues a message for every other node."""
+        nodes = self.backend.nodes()
+        if nodes:
+            self.codec.encode(message)
+        for node_id in nodes:
+            self.queue(node_id, message)
+
+    def queue(self, node_id, message) -> None:
+        messages = self.outbox.get(node_id)
+        if messages is None:
+            messages = self.outbox[node_id] = []
+        messages.append(message)
+
+        if self._handle is None:
+            self._handle = asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        outbox, self.outbox = self.outbox, {}
+        for node_id, messages in outbox.items():
+            try:
+                self.backend.send(node_id, messages)
+            except Exception as error:
+                self.ctx.logger.error("Cluster send to node %s failed: %s", node_id, error)
+
+    def session_opened(self, session) -> None:
+        self.backend.register(session.id)
+
+    def session_closed(self, session) -> None:
+        self.backend.unregister(session.id)
+
+    def broadcast(self, room, args, exclude, key) -> None:
+        if exclude is not None:
+            exclude = list(excluded_ids(exclude))
+        self.publish('broadcast', room, list(args), exclude, key)
+
+    def get_session(self, session_id):
+        node_id = self.backend.lookup(session_id)
+        if node_id is None and self.ctx.session_ids.prefix:
+            node_id = self.node_from_id(session_id)
+        if node_id is None or node_id == self.node_id:
+            return None
+        return RemoteSession(self, session_id, node_id)
+
+    def node_from_id(self, session_id):
+        """Finds the node encoded in a prefixed session id among the known nodes."""
+        prefix = node_of(session_id)
+        if prefix is None:
+            return None
+        for node_id in self.backend.nodes():
+            if str(node_id) == prefix:
+                return node_id
+        return None
+
+    def on_node_down(self, node_id) -> None:
+        self.outbox.pop(node_id, None)
+
+    async def on_batch(self, messages) -> None:
+        for message in messages:
+            try:
+                await self.handlers[message[0]](*message[1:])
+            except Exception as error:
+                self.ctx.logger.error("Cluster node %s failed to handle %s: %s", self.node_id, message[0], error)
+
+    async def on_call(self, session_id, args):
+        session = self.ctx.sessions.get(session_id)
+        if session is not None:
+            await session.call(*args)
+
+    async def on_call_xml(self, session_id, data, uid):
+        session = self.ctx.sessions.get(session_id)
+        if session is not None:
+            await session.call_xml(data, uid)
+
+    async def on_disconnect(self, session_id):
+        session = self.ctx.sessions.get(session_id)
+        if session is not None:
+            await session.disconnect()
+
+    async def on_broadcast(self, room, args, exclude, key):
+        if isinstance(key, list):
+            key = tuple(key)
+        self.ctx.broadcast_local(room, *args, exclude=exclude, key=key)
+
+def backend_from_config(ctx, worker_id=None) -> ClusterBackend | None:
+    """
+    Builds the backend described by the cluster config section.
+    In worker mode the workers of one supervisor form the cluster over the
+    Unix-socket backend unless a cluster section says otherwise.
+    """
+    config = ctx.config.get('cluster') or {}
+    workers = ctx.config.get('workers') or 1
+    if not config and (worker_id is None or workers <= 1):
+        return None
+
+    node_id = config.get('node')
+    nodes = config.get('nodes')
+    if worker_id is not None and workers > 1:
+        if node_id is None:
+            node_id, nodes = worker_id, list(range(workers))
+        else:
+            nodes = [f"{node}-{worker}" for node in (nodes or [node_id]) for worker in range(workers)]
+            node_id = f"{node_id}-{worker_id}"
+
+    return load_backend(config.get('backend', 'unix')).from_config(node_id, nodes, config, ctx)
@@ -0,0 +1,66 @@
+import asyncio
+import json
+from py_socket_server.cluster.backend import ClusterBackend
+
+class MemoryHub:
+    """Shared state for MemoryBackend nodes living in one process."""
+
+    def __init__(self):
+        self.nodes = {}
+        self.directory = {}
+
+default_hub = MemoryHub()
+
+class MemoryBackend(ClusterBackend):
+    """
+    In-process reference backend, for tests and for several servers in one process.
+    Batches go through a JSON round trip so they look exactly like what a
+    networked backend would deliver.
+    """
+
+    def __init__(self, node_id, hub=None):
+        super().__init__(node_id)
+        self.hub = hub or default_hub
+        self.inbox = None
+        self.task = None
+
+    async def start(self):
+        self.inbox = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self.consume())
+        self.hub.nodes[self.node_id] = self
+
+    async def stop(self):
+        if self.hub.nodes.get(self.node_id) is self:
+            del self.hub.nodes[self.node_id]
+        self.hub.directory = {sid: node for sid, node in self.hub.directory.items() if node != self.node_id}
+
+        for node in list(self.hub.nodes.values()):
+            if node.on_node_down is not None:
+                node.on_node_down(self.node_id)
+
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def nodes(self):
+        return [node_id for node_id in self.hub.nodes if node_id != self.node_id]
+
+    def send(self, node_id, messages):
+        node = self.hub.nodes.get(node_id)
+        if node is not None:
+            node.inbox.put_nowait(json.dumps(messages))
+
+    async def consume(self):
+        while True:
+            batch = await self.inbox.get()
+            await self.on_batch(json.loads(batch))
+
+    def register(self, session_id):
+        self.hub.directory[session_id] = self.node_id
+
+    def unregister(self, session_id):
+        if self.hub.directory.get(session_id) == self.node_id:
+            del self.hub.directory[session_id]
+
+    def lookup(self, session_id):
+        return self.hub.directory.get(session_id)
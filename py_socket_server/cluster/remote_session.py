@@ -0,0 +1,17 @@
+class RemoteSession:
+    """Proxy for a session owned by another node, forwarding calls over the cluster bus."""
+
+    def __init__(self, cluster, session_id, node_id):
+        self.cluster = cluster
+        self.id = session_id
+        self.node_id = node_id
+        self.is_remote = True
+
+    async def call(self, *args):
+        self.cluster.send(self.node_id, 'call', self.id, list(args))
+
+    async def call_xml(self, data, uid):
+        self.cluster.send(self.node_id, 'call_xml', self.id, data, uid)
+
+    async def disconnect(self):
+        self.cluster.send(self.node_id, 'disconnect', self.id)
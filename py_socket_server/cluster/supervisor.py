@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+from py_socket_server.index import PySocketServer
+from py_socket_server.core.logger import setup_logging, stop_logging
+
+RESTART_DELAY = 1
+STOP_TIMEOUT = 30
+
+class Supervisor:
+    """
+    Forks `workers` processes that each bind the xmls/ws/wss ports with
+    SO_REUSEPORT, restarts workers that crash and stops them all on
+    SIGTERM/SIGINT. setup(pss) is awaited in every worker before its
+    listeners start, which is where handlers get registered.
+    """
+
+    def __init__(self, config, setup=None):
+        self.config = config
+        self.setup = setup
+        self.workers = config.get('workers', 1)
+        self.children = {}
+        self.stopping = False
+        self.logger = logging.getLogger('py-socket-server')
+
+    def run(self):
+        """Starts the workers and blocks until all of them have exited."""
+        if not hasattr(os, 'fork') or not hasattr(socket, 'SO_REUSEPORT'):
+            raise RuntimeError('Worker mode requires os.fork and SO_REUSEPORT')
+
+        # Workers replace the inherited queue with their own when their server starts
+        setup_logging(self.logger, self.config)
+
+        signal.signal(signal.SIGTERM, self.on_signal)
+        signal.signal(signal.SIGINT, self.on_signal)
+        signal.signal(signal.SIGALRM, self.on_stop_timeout)
+
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+
+            worker_id = self.children.pop(pid, None)
+            if worker_id is None or self.stopping:
+                continue
+
+            self.logger.error("Worker %s (pid %s) exited with code %s, restarting", worker_id, pid, os.waitstatus_to_exitcode(status))
+            time.sleep(RESTART_DELAY)
+            if not self.stopping:
+                self.spawn(worker_id)
+
+        signal.alarm(0)
+        self.logger.info('All workers stopped.')
+
+    def spawn(self, worker_id):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGALRM, signal.SIG_DFL)
+            code = 1
+            try:
+                code = asyncio.run(run_worker(self.config, worker_id, self.setup))
+            except Exception as e:
+                self.logger.error("Worker %s crashed: %s", worker_id, e)
+            finally:
+                # os._exit skips atexit, write out the queued log records first
+                stop_logging()
+                os._exit(code)
+
+        self.children[pid] = worker_id
+        self.logger.info("Worker %s started (pid %s)", worker_id, pid)
+
+    def stop(self):
+        """Asks every worker to stop gracefully, killing them after STOP_TIMEOUT."""
+        if self.stopping:
+            return
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        signal.alarm(STOP_TIMEOUT)
+
+    def on_signal(self, signum, frame):
+        self.stop()
+
+    def on_stop_timeout(self, signum, frame):
+        for pid in list(self.children):
+            self.logger.warning("Worker %s (pid %s) did not stop in time, killing", self.children[pid], pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+async def run_worker(config, worker_id, setup=None) -> int:
+    """Runs one worker until SIGTERM/SIGINT, returning its exit code."""
+    pss = PySocketServer(config, worker_id)
+    if setup is not None:
+        await setup(pss)
+
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopped.set)
+
+    server_task = asyncio.create_task(pss.run())
+    # Listeners that fail to start end the worker so the supervisor restarts it
+    server_task.add_done_callback(lambda task: task.cancelled() or task.exception() is None or stopped.set())
+
+    await stopped.wait()
+    await pss.stop()
+
+    if server_task.done() and not server_task.cancelled() and server_task.exception() is not None:
+        pss.ctx.logger.error("Worker %s failed: %s", worker_id, server_task.exception())
+        return 1
+
+    server_task.cancel()
+    return 0
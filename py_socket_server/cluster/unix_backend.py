@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import tempfile
+from py_socket_server.core.frame_decoder import FrameDecoder
+from py_socket_server.core.codec import get_codec
+from py_socket_server.protocol.base_protocol import END_MARKER_BYTES, encode_frame
+from py_socket_server.cluster.backend import ClusterBackend
+
+class UnixSocketBackend(ClusterBackend):
+    """
+    Reference backend linking the nodes of one host over Unix sockets.
+    Every node listens on its own socket and keeps one outgoing connection
+    per peer. Frames are NUL-terminated JSON arrays, the same framing as
+    the RolyPoly wire format. The session directory is replicated: nodes
+    announce the sessions they own and introduce themselves with the full
+    list when a link comes up.
+    """
+
+    def __init__(self, node_id, nodes, socket_dir=None, name='py_socket_server', logger=None):
+        super().__init__(node_id)
+        self.peer_ids = [node for node in nodes if node != node_id]
+        self.socket_dir = socket_dir or tempfile.gettempdir()
+        self.name = name.lower()
+        self.logger = logger or logging.getLogger('py-socket-server')
+
+        self.local = set()
+        # Session id -> node id, for sessions owned by other nodes
+        self.owners = {}
+        self.peers = {}
+        self.connecting = {}
+        # Node id -> task reading the latest incoming link from that node
+        self.links = {}
+        self.server = None
+
+    @classmethod
+    def from_config(cls, node_id, nodes, config, ctx):
+        socket_dir = config.get('socket_dir') or ctx.config.get('worker_socket_dir')
+        return cls(node_id, nodes or [node_id], socket_dir, ctx.config['name'], ctx.logger)
+
+    def path(self, node_id) -> str:
+        return os.path.join(self.socket_dir, f"{self.name}-node-{node_id}.sock")
+
+    async def start(self):
+        path = self.path(self.node_id)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server = await asyncio.start_unix_server(self.handle_peer, path)
+
+        for node_id in self.peer_ids:
+            await self.connect(node_id)
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+            try:
+                os.unlink(self.path(self.node_id))
+            except OSError:
+                pass
+
+        for writer in list(self.peers.values()):
+            writer.close()
+        self.peers.clear()
+
+        for task in list(self.links.values()):
+            task.cancel()
+        self.links.clear()
+
+    def nodes(self):
+        return self.peer_ids
+
+    async def connect(self, node_id):
+        """Opens the outgoing link to a peer and introduces this node."""
+        if node_id in self.peers:
+            return self.peers[node_id]
+
+        try:
+            _, writer = await asyncio.open_unix_connection(self.path(node_id))
+        except OSError:
+            # The peer is not up yet, it connects to us and says hello once it is
+            return None
+
+        if node_id in self.peers:
+            writer.close()
+            return self.peers[node_id]
+
+        self.peers[node_id] = writer
+        writer.write(encode_frame('hello', self.node_id, list(self.local)))
+        return writer
+
+    async def reconnect(self, node_id):
+        try:
+            writer = await self.connect(node_id)
+        finally:
+            pending = self.connecting.pop(node_id, [])
+
+        if writer is None:
+            self.logger.warning("Node %s dropped %s frames for unreachable node %s", self.node_id, len(pending), node_id)
+            return
+        writer.writelines(pending)
+
+    def write(self, node_id, frame: bytes) -> None:
+        writer = self.peers.get(node_id)
+        if writer is not None and not writer.is_closing():
+            writer.write(frame)
+            return
+
+        self.peers.pop(node_id, None)
+        if node_id not in self.connecting:
+            self.connecting[node_id] = []
+            asyncio.ensure_future(self.reconnect(node_id))
+        self.connecting[node_id].append(frame)
+
+    def send(self, node_id, messages):
+        self.write(node_id, encode_frame('batch', messages))
+
+    def announce(self, *message):
+        frame = encode_frame(*message)
+        for node_id in self.peer_ids:
+            self.write(node_id, frame)
+
+    def register(self, session_id):
+        self.local.add(session_id)
+        self.announce('open', self.node_id, session_id)
+
+    def unregister(self, session_id):
+        self.local.discard(session_id)
+        self.announce('close', session_id)
+
+    def lookup(self, session_id):
+        return self.owners.get(session_id)
+
+    async def handle_peer(self, reader, writer):
+        task = asyncio.current_task()
+        decoder = FrameDecoder(END_MARKER_BYTES)
+        codec = get_codec()
+        peer_id = None
+
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                decoder.feed(data)
+                for frame in decoder:
+                    try:
+                        message = codec.decode(frame)
+                    except codec.errors as error:
+                        self.logger.warning("Node %s skipped a malformed frame from node %s: %s",
+                                            self.node_id, peer_id, error)
+                        continue
+                    kind = message[0]
+                    if kind == 'batch':
+                        await self.on_batch(message[1])
+                    elif kind == 'open':
+                        self.owners[message[2]] = message[1]
+                    elif kind == 'close':
+                        self.owners.pop(message[1], None)
+                    elif kind == 'hello':
+                        peer_id = message[1]
+                        self.links[peer_id] = task
+                        await self.on_hello(peer_id, message[2])
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            # A restarted node may already have opened a newer link
+            if peer_id is not None and self.links.get(peer_id) is task:
+                del self.links[peer_id]
+                self.forget_node(peer_id)
+
+    async def on_hello(self, node_id, session_ids):
+        self.owners = {sid: owner for sid, owner in self.owners.items() if owner != node_id}
+        for session_id in session_ids:
+            self.owners[session_id] = node_id
+        # A peer that started after us has no link back yet, open one so it learns our sessions
+        await self.connect(node_id)
+
+    def forget_node(self, node_id):
+        """Drops everything known about a node whose link went down."""
+        self.owners = {sid: owner for sid, owner in self.owners.items() if owner != node_id}
+        writer = self.peers.pop(node_id, None)
+        if writer is not None:
+            writer.close()
+        if self.on_node_down is not None:
+            self.on_node_down(node_id)
@@ -0,0 +1,196 @@
+import asyncio
+from collections import deque
+
+# error_code values sent with NetConnection.Connect.Rejected
+REJECT_FULL = 'server_full'
+REJECT_RATE = 'rate_limited'
+REJECT_QUEUE_FULL = 'queue_full'
+REJECT_QUEUE_TIMEOUT = 'queue_timeout'
+
+QUEUE_TIMEOUT = 10
+CONNECT_BURST = 10
+MESSAGE_BURST = 100
+# Idle per-IP buckets are forgotten after this many seconds
+BUCKET_TTL = 300
+
+DROP = 'drop'
+DISCONNECT = 'disconnect'
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'stamp')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def take(self, now) -> bool:
+        tokens = self.tokens + (now - self.stamp) * self.rate
+        self.stamp = now
+        if tokens > self.burst:
+            tokens = self.burst
+        if tokens < 1:
+            self.tokens = tokens
+            return False
+        self.tokens = tokens - 1
+        return True
+
+class AdmissionController:
+    """
+    Decides which connect commands are let through during accept storms.
+    A connect is rejected through reject_connection when its IP exceeds the
+    connect rate or the server holds max_sessions admitted sessions. At most
+    max_pending connects run their preConnect handlers at once, the others
+    wait in a bounded FIFO queue for up to queue_timeout seconds, which paces
+    reconnecting clients instead of running every handshake at the same time.
+    Commands are also limited per IP, over the rate they are dropped or the
+    session is disconnected. A limit of 0 disables the check.
+    """
+
+    def __init__(self, ctx, config=None):
+        config = config or {}
+        self.ctx = ctx
+        self.max_sessions = config.get('max_sessions') or 0
+        self.max_pending = config.get('max_pending') or 0
+        self.queue_size = config.get('connect_queue') or 0
+        self.queue_timeout = config.get('queue_timeout') or QUEUE_TIMEOUT
+        self.connect_rate = config.get('ip_connect_rate') or 0
+        self.connect_burst = config.get('ip_connect_burst') or CONNECT_BURST
+        self.message_rate = config.get('ip_message_rate') or 0
+        self.message_burst = config.get('ip_message_burst') or MESSAGE_BURST
+        self.message_policy = config.get('message_policy') or DROP
+
+        self.sessions = 0
+        self.pending = 0
+        self.queue = deque()
+        self.connect_buckets = {}
+        self.message_buckets = {}
+        self.rejected = {}
+        self.dropped_messages = 0
+        self.prune_timer = None
+
+    @property
+    def queued(self) -> int:
+        return len(self.queue)
+
+    def stats(self) -> dict:
+        return {
+            'sessions': self.sessions,
+            'pending': self.pending,
+            'queued': self.queued,
+            'rejected': dict(self.rejected),
+            'dropped_messages': self.dropped_messages,
+        }
+
+    def bucket(self, buckets, ip, rate, burst) -> TokenBucket:
+        bucket = buckets.get(ip)
+        if bucket is None:
+            bucket = buckets[ip] = TokenBucket(rate, burst, asyncio.get_running_loop().time())
+            if self.prune_timer is None:
+                self.prune_timer = self.ctx.timers.schedule(BUCKET_TTL, self.prune)
+        return bucket
+
+    def prune(self):
+        """Forgets buckets that have not been used for BUCKET_TTL seconds, they would be full again anyway."""
+        self.prune_timer = None
+        expired = asyncio.get_running_loop().time() - BUCKET_TTL
+        for buckets in (self.connect_buckets, self.message_buckets):
+            for ip in [ip for ip, bucket in buckets.items() if bucket.stamp < expired]:
+                del buckets[ip]
+        if self.connect_buckets or self.message_buckets:
+            self.prune_timer = self.ctx.timers.schedule(BUCKET_TTL, self.prune)
+
+    async def reject(self, session, reason) -> bool:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        self.ctx.logger.info("[socket admission] id=%s ip=%s rejected, %s", session.id, session.ip, reason)
+        await session.reject_connection(reason)
+        return False
+
+    async def admit(self, session) -> bool:
+        """
+        Runs the admission checks for a connect command, rejecting the session when one fails.
+        Once True is returned, release() must be called after the preConnect handlers ran.
+        """
+        if session.admitted:
+            # A repeated connect only takes the pending slot it will release
+            self.pending += 1
+            return True
+
+        loop = asyncio.get_running_loop()
+        if self.connect_rate and not self.bucket(self.connect_buckets, session.ip, self.connect_rate,
+                                                 self.connect_burst).take(loop.time()):
+            return await self.reject(session, REJECT_RATE)
+
+        if self.max_sessions and self.sessions >= self.max_sessions:
+            return await self.reject(session, REJECT_FULL)
+
+        if self.max_pending and self.pending >= self.max_pending:
+            if len(self.queue) >= self.queue_size:
+                return await self.reject(session, REJECT_QUEUE_FULL)
+
+            waiter = loop.create_future()
+            self.queue.append(waiter)
+            try:
+                # release() hands its pending slot over to the waiter
+                await asyncio.wait_for(waiter, self.queue_timeout)
+            except asyncio.TimeoutError:
+                if waiter in self.queue:
+                    self.queue.remove(waiter)
+                return await self.reject(session, REJECT_QUEUE_TIMEOUT)
+            except asyncio.CancelledError:
+                if waiter in self.queue:
+                    self.queue.remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    self.release_pending()
+                raise
+
+            if self.ctx.sessions.get(session.id) is not session:
+                # The client went away while it waited
+                self.release_pending()
+                return False
+
+            # Sessions admitted while this one waited may have filled the server
+            if self.max_sessions and self.sessions >= self.max_sessions:
+                self.release_pending()
+                return await self.reject(session, REJECT_FULL)
+        else:
+            self.pending += 1
+
+        session.admitted = True
+        self.sessions += 1
+        if self.message_rate:
+            session.message_bucket = self.bucket(self.message_buckets, session.ip, self.message_rate,
+                                                 self.message_burst)
+        return True
+
+    def release(self, session) -> None:
+        """Frees the pending slot held by an admitted session once its preConnect handlers ran."""
+        self.release_pending()
+
+    def release_pending(self) -> None:
+        while self.queue:
+            waiter = self.queue.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.pending -= 1
+
+    def session_closed(self, session) -> None:
+        if session.admitted:
+            session.admitted = False
+            self.sessions -= 1
+
+    def allow_message(self, session) -> bool:
+        """Takes a token from the IP message bucket of a session."""
+        bucket = session.message_bucket
+        if bucket is None or bucket.take(asyncio.get_running_loop().time()):
+            return True
+
+        self.dropped_messages += 1
+        if self.message_policy == DISCONNECT:
+            self.ctx.logger.info("Session %s %s exceeded the message rate, disconnecting", session.id, session.ip)
+            asyncio.ensure_future(session.stop())
+        return False
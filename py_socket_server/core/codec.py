@@ -0,0 +1,118 @@
+import json
+import struct
+
+class JsonCodec:
+    """
+    Stdlib JSON codec for the RolyPoly wire format.
+    Codecs encode straight to bytes and decode from bytes, str or memoryview,
+    decode raises one of the exception types listed in errors.
+    """
+
+    name = 'json'
+    errors = (ValueError,)
+    # Binary codecs are framed by the transport, their messages are not NUL-terminated
+    binary = False
+
+    def encode(self, obj) -> bytes:
+        return json.dumps(obj).encode()
+
+    def decode(self, data):
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.errors = (orjson.JSONDecodeError, ValueError)
+        # Stdlib json turns int dict keys into strings, keep accepting the same payloads
+        self._options = orjson.OPT_NON_STR_KEYS
+        self._dumps = orjson.dumps
+        self.decode = orjson.loads
+
+    def encode(self, obj) -> bytes:
+        return self._dumps(obj, option=self._options)
+
+class MsgspecCodec(JsonCodec):
+    name = 'msgspec'
+
+    def __init__(self):
+        import msgspec
+        self.errors = (msgspec.DecodeError, ValueError)
+        self.encode = msgspec.json.Encoder().encode
+        self.decode = msgspec.json.Decoder().decode
+
+class MsgpackCodec(JsonCodec):
+    """MessagePack codec of the binary WebSocket framing, backed by msgspec or msgpack."""
+
+    name = 'msgpack'
+    binary = True
+
+    def __init__(self):
+        try:
+            import msgspec
+        except ImportError:
+            import msgpack
+            self.errors = (ValueError, TypeError)
+            self.encode = msgpack.Packer().pack
+            self.decode = lambda data: msgpack.unpackb(data, strict_map_key=False)
+        else:
+            self.errors = (msgspec.DecodeError, ValueError)
+            self.encode = msgspec.msgpack.Encoder().encode
+            self.decode = msgspec.msgpack.Decoder().decode
+
+def msgpack_array_header(length) -> bytes:
+    """Returns the MessagePack header of an array, the encoded items follow it back to back."""
+    if length < 16:
+        return bytes((0x90 | length,))
+    if length < 65536:
+        return struct.pack('>BH', 0xdc, length)
+    return struct.pack('>BI', 0xdd, length)
+
+CODECS = {
+    'json': JsonCodec,
+    'orjson': OrjsonCodec,
+    'msgspec': MsgspecCodec,
+    'msgpack': MsgpackCodec,
+}
+
+# Tried in order for 'auto'
+AUTO_ORDER = ('orjson', 'msgspec', 'json')
+
+codecs = {}
+
+def get_codec(name=None) -> JsonCodec:
+    """
+    Returns the shared codec instance for a name from CODECS, or for 'auto' (the default)
+    the first one whose backend is installed.
+    """
+    name = name or 'auto'
+    codec = codecs.get(name)
+    if codec is not None:
+        return codec
+
+    if name == 'auto':
+        for candidate in AUTO_ORDER:
+            try:
+                codec = get_codec(candidate)
+                break
+            except ImportError:
+                continue
+    elif name in CODECS:
+        codec = CODECS[name]()
+    else:
+        raise ValueError(f"Unknown codec {name}")
+
+    codecs[name] = codec
+    return codec
+
+def text_codec(name=None) -> JsonCodec:
+    """
+    Returns get_codec(name) for a listener framing calls with NUL terminators. Binary codecs
+    are a config error there, clients cannot parse them and NUL bytes occur inside values.
+    """
+    if getattr(CODECS.get(name), 'binary', False):
+        raise ValueError(f"Codec {name} is binary, NUL-terminated listeners need a JSON codec")
+    return get_codec(name)
@@ -1,16 +1,85 @@
-from pyee.asyncio import AsyncIOEventEmitter
 import logging
+from py_socket_server.core.rooms import Rooms
+from py_socket_server.core.interest import interest_from_config
+from py_socket_server.core.tick import tick_from_config
+from py_socket_server.core.replication import replication_from_config
+from py_socket_server.core.router import Router
+from py_socket_server.core.dispatcher import dispatcher_from_config
+from py_socket_server.core.admission import AdmissionController
+from py_socket_server.core.session_id import allocator_from_config
+from py_socket_server.core.metrics import Histogram, metrics_from_config
+from py_socket_server.core.timer_wheel import TimerWheel
+from py_socket_server.protocol.frames import shared_frame
 
 default = {
     "name": "py_socket_server",
+    "workers": 1,
+    "worker_socket_dir": "",
+    "cluster": {},
+    "session_id": {
+        "size": 16,
+        "batch": 1024,
+        "node_prefix": False
+    },
+    "dispatch": {
+        "max_concurrency": 1024,
+        "mailbox_size": 256,
+        "priority": {"_NSF": 0}
+    },
+    "admission": {
+        "max_sessions": 0,
+        "max_pending": 0,
+        "connect_queue": 0,
+        "queue_timeout": 10,
+        "ip_connect_rate": 0,
+        "ip_connect_burst": 10,
+        "ip_message_rate": 0,
+        "ip_message_burst": 100,
+        "message_policy": "drop"
+    },
+    "metrics": {
+        "enabled": False,
+        "bind": "127.0.0.1",
+        "port": 0
+    },
+    "http": {
+        "bind": "127.0.0.1",
+        "port": 0,
+        "token": ""
+    },
+    "interest": {
+        "cell_size": 256
+    },
+    "tick": {
+        "rate": 0
+    },
+    "replication": {
+        "keyframe_every": 100,
+        "command": "_S",
+        "delta_command": "_SD"
+    },
     "log_general_path": "logs/py_socket_server.log",
     "log_error_path": "logs/py_socket_server-errors.log",
 	"log_type": "critical",
+    "log_json": False,
+    "log_batch": 256,
+    "log_rate": 0,
+    "log_burst": 20,
     "xmls": {
         "bind": "0.0.0.0",
         "port": 1935,
 		"ping": 60,
-		"ping_timeout": 30
+		"ping_timeout": 30,
+		"connect_timeout": 30,
+		"flush_threshold": 65536,
+		"flush_delay_ms": 0,
+		"max_queue_bytes": 1048576,
+		"overflow_policy": "disconnect",
+		"codec": "auto",
+		"mode": "stream",
+		"read_buffer_size": 65536,
+		"max_frame_size": 1048576,
+		"policy_port": 0
     },
     "wss": {
         "bind": "0.0.0.0",
@@ -18,13 +87,41 @@ default = {
         "key": "./key.pem",
         "cert": "./cert.pem",
 		"ping": 60,
-		"ping_timeout": 30
+		"ping_timeout": 30,
+		"connect_timeout": 30,
+		"flush_threshold": 65536,
+		"flush_delay_ms": 0,
+		"max_queue_bytes": 1048576,
+		"overflow_policy": "disconnect",
+		"codec": "auto",
+		"binary": True,
+		"compression": {
+			"enabled": True,
+			"window_bits": 12,
+			"mem_level": 5,
+			"min_size": 256,
+			"shared": True
+		}
     },
     "ws": {
         "bind": "0.0.0.0",
         "port": 8000,
 		"ping": 60,
-		"ping_timeout": 30
+		"ping_timeout": 30,
+		"connect_timeout": 30,
+		"flush_threshold": 65536,
+		"flush_delay_ms": 0,
+		"max_queue_bytes": 1048576,
+		"overflow_policy": "disconnect",
+		"codec": "auto",
+		"binary": True,
+		"compression": {
+			"enabled": True,
+			"window_bits": 12,
+			"mem_level": 5,
+			"min_size": 256,
+			"shared": True
+		}
     }
 }
 
@@ -33,7 +130,103 @@ class Context:
         self.config = config
 
         self.sessions = {}
+        self.session_ids = allocator_from_config(config.get('session_id'), self.sessions)
+        self.rooms = Rooms()
+        self.interest = interest_from_config(config.get('interest'))
+
+        self.metrics = metrics_from_config(config.get('metrics'))
+        self.router = Router(self)
+        self.dispatcher = dispatcher_from_config(self.router, config.get('dispatch'))
+        if self.metrics.enabled:
+            self.dispatcher.queue_wait = Histogram(self.metrics.buckets)
+            self.dispatcher.sample_mask = self.metrics.sample_every - 1
+        self.admission = AdmissionController(self, config.get('admission'))
+
+        self.logger = logging.getLogger('py-socket-server')
+
+        self.timers = TimerWheel(logger=self.logger)
+        self.ticks = tick_from_config(self, config.get('tick'))
+        self.replication = replication_from_config(self, config.get('replication'))
+
+        # Set by PySocketServer when sessions are spread over several workers
+        self.cluster = None
+        # Set by PySocketServer when the HTTP API pages through sessions
+        self.session_index = None
+        self.reuse_port = False
+
+    def add_session(self, session) -> None:
+        self.sessions[session.id] = session
+        if session.metrics is not None:
+            session.metrics.opened += 1
+        if self.session_index is not None:
+            self.session_index.add(session)
+        if self.cluster is not None:
+            self.cluster.session_opened(session)
+
+    def remove_session(self, session) -> None:
+        self.admission.session_closed(session)
+        if self.sessions.get(session.id) is session:
+            del self.sessions[session.id]
+            if session.metrics is not None:
+                session.metrics.closed += 1
+            if self.session_index is not None:
+                self.session_index.remove(session)
+            if self.cluster is not None:
+                self.cluster.session_closed(session)
+        self.rooms.leave_all(session)
+        self.interest.remove(session)
+        self.replication.forget(session)
+
+    async def broadcast(self, room, *args, exclude=None, key=None) -> int:
+        """
+        Sends a call to every session in a room, including members on other workers.
+        The payload is serialized once and the same frame is queued for each member.
+        With a key, a frame still queued for a member under the same key is replaced.
+        Returns the number of local sessions the frame was queued for.
+        """
+        if self.cluster is not None:
+            self.cluster.broadcast(room, args, exclude, key)
+        return self.broadcast_local(room, *args, exclude=exclude, key=key)
+
+    def broadcast_local(self, room, *args, exclude=None, key=None) -> int:
+        """Sends a call to the members of a room connected to this process."""
+        members = self.rooms.members(room)
+        if not members:
+            return 0
+
+        excluded = excluded_ids(exclude)
+        frame = shared_frame(*args)
+        sent = 0
+        for session in members:
+            if session.id in excluded:
+                continue
+            session.send_frame(frame, key)
+            sent += 1
+        return sent
+
+    def broadcast_nearby(self, session, radius, *args, key=None, include_self=False) -> int:
+        """
+        Sends a call to the sessions within radius of a session, found through the interest grid.
+        Positions come from interest.move(), only sessions of this process are reached.
+        Returns the number of sessions the frame was queued for.
+        """
+        recipients = self.interest.nearby(session, radius)
+        if include_self and session.position is not None:
+            recipients.append(session)
+        if not recipients:
+            return 0
 
-        self.py_event = AsyncIOEventEmitter()
+        frame = shared_frame(*args)
+        for recipient in recipients:
+            recipient.send_frame(frame, key)
+        return len(recipients)
 
-        self.logger = logging.getLogger('py-socket-server')
\ No newline at end of file
+def excluded_ids(exclude) -> set:
+    """Normalizes a session, session id or collection of either into a set of ids."""
+    if exclude is None:
+        return set()
+    if isinstance(exclude, str):
+        return {exclude}
+    if hasattr(exclude, 'id'):
+        return {exclude.id}
+    return {item if isinstance(item, str) else item.id for item in exclude}
@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import itertools
+
+MAX_CONCURRENCY = 1024
+MAILBOX_SIZE = 256
+
+# Commands at IMMEDIATE priority run inline in the read loop, outside mailboxes and the concurrency limit
+IMMEDIATE = 0
+DEFAULT_PRIORITY = 1
+PRIORITIES = {'_NSF': IMMEDIATE}
+
+class Dispatcher:
+    """
+    Global execution limits for routed commands.
+    At most max_concurrency handlers run at once across all sessions; when the
+    limit is reached, waiting mailboxes get the next free slot by command
+    priority (lower first), then in arrival order.
+    """
+
+    def __init__(self, router, max_concurrency=MAX_CONCURRENCY, mailbox_size=MAILBOX_SIZE, priorities=None):
+        self.router = router
+        self.max_concurrency = max_concurrency
+        self.mailbox_size = mailbox_size
+        self.priorities = {**PRIORITIES, **(priorities or {})}
+
+        self.active = 0
+        self.waiters = []
+        # Commands queued in all mailboxes, and the longest any of them waited
+        self.queued = 0
+        self.wait_max = 0.0
+        self._seq = itertools.count()
+        # Histogram of sampled mailbox queue waits, set when metrics are enabled
+        self.queue_wait = None
+        self.sample_mask = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self.waiters)
+
+    def priority(self, command) -> int:
+        return self.priorities.get(command, DEFAULT_PRIORITY)
+
+    async def acquire(self, priority) -> None:
+        if self.active < self.max_concurrency and not self.waiters:
+            self.active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self._seq), waiter))
+        # release() hands the slot over, active is already counted when the waiter wakes up
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self.waiters:
+            _, _, waiter = heapq.heappop(self.waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def mailbox(self, session) -> 'Mailbox':
+        return Mailbox(self, session)
+
+class Mailbox:
+    """
+    Per-session serial command queue.
+    Commands are handled one at a time by a task that exists only while the
+    mailbox is not empty, so commands of one session complete in the order
+    they were received. A command with a lower priority value overtakes
+    queued commands of higher values, commands of equal priority keep their
+    order. When the mailbox is full, push waits, which stops the session
+    from reading until its handlers catch up.
+    """
+
+    __slots__ = ('dispatcher', 'session', 'queue', 'task', 'space', 'closed',
+                 'processed', 'wait_last', 'wait_max', 'wait_total', '_seq')
+
+    def __init__(self, dispatcher: Dispatcher, session):
+        self.dispatcher = dispatcher
+        self.session = session
+        self.queue = []
+        self.task = None
+        self.space = None
+        self.closed = False
+
+        self.processed = 0
+        self.wait_last = 0.0
+        self.wait_max = 0.0
+        self.wait_total = 0.0
+        self._seq = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    @property
+    def depth(self) -> int:
+        """Queued commands, including the one being handled."""
+        return len(self.queue) + (self.task is not None)
+
+    @property
+    def wait_avg(self) -> float:
+        return self.wait_total / self.processed if self.processed else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'depth': self.depth,
+            'processed': self.processed,
+            'wait_last': self.wait_last,
+            'wait_max': self.wait_max,
+            'wait_avg': self.wait_avg,
+        }
+
+    async def push(self, priority, command, message, args) -> None:
+        while len(self.queue) >= self.dispatcher.mailbox_size and not self.closed:
+            if self.space is None:
+                self.space = asyncio.get_running_loop().create_future()
+            await self.space
+
+        if self.closed:
+            return
+
+        loop = asyncio.get_running_loop()
+        self._seq += 1
+        heapq.heappush(self.queue, (priority, self._seq, loop.time(), command, message, args))
+        self.dispatcher.queued += 1
+        if self.task is None:
+            self.task = loop.create_task(self.drain())
+
+    def wake(self) -> None:
+        if self.space is not None:
+            if not self.space.done():
+                self.space.set_result(None)
+            self.space = None
+
+    async def drain(self):
+        dispatcher = self.dispatcher
+        loop = asyncio.get_running_loop()
+        try:
+            while self.queue:
+                priority, _, queued_at, command, message, args = heapq.heappop(self.queue)
+                dispatcher.queued -= 1
+                self.wake()
+
+                await dispatcher.acquire(priority)
+                try:
+                    wait = loop.time() - queued_at
+                    self.wait_last = wait
+                    self.wait_total += wait
+                    if wait > self.wait_max:
+                        self.wait_max = wait
+                        if wait > dispatcher.wait_max:
+                            dispatcher.wait_max = wait
+                    self.processed += 1
+                    if dispatcher.queue_wait is not None and not self.processed & dispatcher.sample_mask:
+                        dispatcher.queue_wait.observe(wait)
+
+                    await dispatcher.router.dispatch(self.session, command, message, args)
+                finally:
+                    dispatcher.release()
+        finally:
+            self.task = None
+
+    def close(self) -> None:
+        """
+        Stops accepting commands. Those already queued are still handled, so the
+        last commands of a client that disconnects right after sending are not lost.
+        """
+        self.closed = True
+        self.wake()
+
+def dispatcher_from_config(router, config) -> Dispatcher:
+    """Builds a Dispatcher from the dispatch config section."""
+    config = config or {}
+    return Dispatcher(
+        router,
+        config.get('max_concurrency') or MAX_CONCURRENCY,
+        config.get('mailbox_size') or MAILBOX_SIZE,
+        config.get('priority')
+    )
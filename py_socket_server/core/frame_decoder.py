@@ -0,0 +1,75 @@
+COMPACT_MIN_SIZE = 4096
+
+class FrameTooLargeError(ValueError):
+    """Raised when a frame grows beyond the configured maximum size."""
+
+class FrameDecoder:
+    """Incremental splitter for marker-terminated frames."""
+
+    __slots__ = ('_buffer', '_marker', 'max_frame_size', '_offset', '_scan')
+
+    def __init__(self, marker=b'\x00', max_frame_size=None):
+        self._buffer = bytearray()
+        self._marker = marker
+        self.max_frame_size = max_frame_size
+        # Start of the first frame that has not been yielded yet
+        self._offset = 0
+        # Position the next marker search starts from
+        self._scan = 0
+
+    def __len__(self):
+        """Returns the number of buffered bytes that are not yet consumed."""
+        return len(self._buffer) - self._offset
+
+    def __iter__(self):
+        return self.frames()
+
+    def feed(self, data) -> None:
+        """Appends received bytes to the buffer."""
+        self._buffer += data
+
+    def frames(self):
+        """Yields every complete frame currently in the buffer."""
+        buffer = self._buffer
+        try:
+            while True:
+                index = buffer.find(self._marker, self._scan)
+                if index < 0:
+                    # Only the bytes appended after this point need scanning later, along with
+                    # the tail that may hold the start of a multi-byte marker
+                    self._scan = max(self._offset, len(buffer) - len(self._marker) + 1)
+                    if self.max_frame_size and len(buffer) - self._offset > self.max_frame_size:
+                        raise FrameTooLargeError(f'Frame exceeds {self.max_frame_size} bytes')
+                    break
+
+                if self.max_frame_size and index - self._offset > self.max_frame_size:
+                    raise FrameTooLargeError(f'Frame exceeds {self.max_frame_size} bytes')
+
+                # The view is released before yielding so feed() may resize the buffer meanwhile
+                with memoryview(buffer) as view:
+                    frame = bytes(view[self._offset:index])
+                self._offset = self._scan = index + len(self._marker)
+                yield frame
+        finally:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drops consumed bytes once they dominate the buffer."""
+        if self._offset == 0:
+            return
+
+        if self._offset == len(self._buffer):
+            self._buffer.clear()
+        elif self._offset >= COMPACT_MIN_SIZE and self._offset * 2 >= len(self._buffer):
+            del self._buffer[:self._offset]
+        else:
+            return
+
+        self._scan -= self._offset
+        self._offset = 0
+
+    def clear(self) -> None:
+        """Discards all buffered data."""
+        self._buffer.clear()
+        self._offset = 0
+        self._scan = 0
@@ -0,0 +1,115 @@
+import math
+
+# Width of a grid cell in map units, about the usual broadcast radius works best
+CELL_SIZE = 256
+
+class InterestGrid:
+    """
+    Uniform grid of session positions, one per map (space).
+    A session is filed under the cell holding its position and the cell is
+    only changed when a move crosses a cell border, so an update is a tuple
+    store most of the time. A query only visits the cells overlapping the
+    radius, the cost follows the number of players near the point rather
+    than the number of sessions. A radius spanning more cells than are
+    occupied visits the occupied cells instead. Positions are kept on
+    session.position as (space, x, y, cell).
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        if cell_size <= 0:
+            raise ValueError(f'cell_size must be positive, got {cell_size}')
+        self.cell_size = cell_size
+        # (space, column, row) -> sessions in that cell
+        self.cells = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def cell_of(self, space, x, y):
+        size = self.cell_size
+        return space, math.floor(x / size), math.floor(y / size)
+
+    def move(self, session, x, y, space=None) -> None:
+        """Sets the position of a session, adding it to the grid on its first move."""
+        cell = self.cell_of(space, x, y)
+        position = session.position
+        if position is not None:
+            old_cell = position[3]
+            if old_cell == cell:
+                session.position = (space, x, y, cell)
+                return
+            self.discard(session, old_cell)
+        else:
+            self.count += 1
+
+        members = self.cells.get(cell)
+        if members is None:
+            members = self.cells[cell] = set()
+        members.add(session)
+        session.position = (space, x, y, cell)
+
+    def remove(self, session) -> None:
+        """Removes a session from the grid, its position is forgotten."""
+        position = session.position
+        if position is None:
+            return
+        self.discard(session, position[3])
+        session.position = None
+        self.count -= 1
+
+    def discard(self, session, cell) -> None:
+        members = self.cells.get(cell)
+        if members is None:
+            return
+        members.discard(session)
+        if not members:
+            del self.cells[cell]
+
+    def query(self, x, y, radius, space=None) -> list:
+        """Returns the sessions of a space within radius of a point."""
+        size = self.cell_size
+        cells = self.cells
+        span = 2 * radius / size + 1
+        if span * span > len(cells):
+            # A radius covering more cells than are occupied looks at the occupied ones instead
+            groups = self.occupied(x, y, radius, space)
+        else:
+            first_column, last_column = math.floor((x - radius) / size), math.floor((x + radius) / size)
+            first_row, last_row = math.floor((y - radius) / size), math.floor((y + radius) / size)
+            groups = [cells.get((space, column, row)) for column in range(first_column, last_column + 1)
+                      for row in range(first_row, last_row + 1)]
+
+        radius_squared = radius * radius
+        found = []
+        for members in groups:
+            if not members:
+                continue
+            for session in members:
+                _, other_x, other_y, _ = session.position
+                dx = other_x - x
+                dy = other_y - y
+                if dx * dx + dy * dy <= radius_squared:
+                    found.append(session)
+        return found
+
+    def occupied(self, x, y, radius, space) -> list:
+        """Returns the sessions of every occupied cell of a space overlapping the square around a point."""
+        size = self.cell_size
+        low_x, high_x, low_y, high_y = x - radius, x + radius, y - radius, y + radius
+        return [members for (cell_space, column, row), members in self.cells.items()
+                if cell_space == space and column * size <= high_x and (column + 1) * size > low_x
+                and row * size <= high_y and (row + 1) * size > low_y]
+
+    def nearby(self, session, radius) -> list:
+        """Returns the other sessions within radius of a session, empty when it has no position."""
+        position = session.position
+        if position is None:
+            return []
+        space, x, y, _ = position
+        return [other for other in self.query(x, y, radius, space) if other is not session]
+
+def interest_from_config(config) -> InterestGrid:
+    """Builds the grid from the interest config section."""
+    config = config or {}
+    return InterestGrid(config.get('cell_size') or CELL_SIZE)
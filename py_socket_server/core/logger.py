@@ -1,9 +1,251 @@
+import atexit
 import datetime
+import json
 import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+LOG_FORMAT = '[%(asctime)s] [%(levelname)s] %(message)s'
+LOG_MAX_BYTES = 2097152
+LOG_BACKUP_COUNT = 3
+# Records written per batch, one flush per handler and batch
+LOG_BATCH = 256
+LOG_BURST = 20
 
 class NoExcInfoFilter(logging.Filter):
     def filter(self, record):
         record.exc_info = None
         return True
-    
-log_formatter = logging.Formatter('[%(asctime)s] [%(levelname)s] %(message)s')
\ No newline at end of file
+
+log_formatter = logging.Formatter(LOG_FORMAT)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the message formatted and the arguments kept apart."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        args = getattr(record, 'log_args', None)
+        if args is None and record.args:
+            args = log_values(record.args)
+        if args:
+            entry['args'] = args
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry)
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limits how often a message is logged, per call site and first argument.
+    Messages use lazy % formatting, so the call site is the message template,
+    and session messages pass the session id first, which limits every
+    session separately. Each key gets burst records, refilled at rate per second.
+    """
+
+    def __init__(self, rate, burst=LOG_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.suppressed = 0
+
+    def filter(self, record):
+        # Warnings and errors are never dropped
+        if record.levelno >= logging.WARNING:
+            return True
+
+        first = record.args[0] if record.args and isinstance(record.args, tuple) else None
+        key = (record.msg, first if isinstance(first, (str, int)) else None)
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= 65536:
+                self.buckets.clear()
+            self.buckets[key] = [self.burst - 1, now]
+            return True
+
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            self.suppressed += 1
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+class BatchFlush:
+    """Stream handler mixin whose flush the LogWriter defers to the end of a batch."""
+
+    deferred = False
+
+    def flush(self):
+        if not self.deferred:
+            super().flush()
+
+class BatchStreamHandler(BatchFlush, logging.StreamHandler):
+    pass
+
+class BatchFileHandler(BatchFlush, logging.FileHandler):
+    pass
+
+class BatchRotatingFileHandler(BatchFlush, RotatingFileHandler):
+    pass
+
+class LogWriter:
+    """
+    Background thread writing the records a LogQueueHandler put on a queue.
+    The event loop only enqueues records. The thread takes every record
+    already waiting, up to batch, hands them to the handlers and flushes
+    each handler once per batch.
+    """
+
+    def __init__(self, handlers, batch=LOG_BATCH):
+        self.handlers = handlers
+        self.batch = batch
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.pid = os.getpid()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='py-socket-server-log', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Writes the queued records and stops the thread."""
+        thread, self.thread = self.thread, None
+        # A forked child has the writer object but not its thread
+        if thread is None or self.pid != os.getpid():
+            return
+        self.queue.put(None)
+        thread.join()
+        for handler in self.handlers:
+            handler.close()
+
+    def run(self):
+        get = self.queue.get
+        get_nowait = self.queue.get_nowait
+        while True:
+            record = get()
+            stopping = record is None
+            records = [] if stopping else [record]
+            while not stopping and len(records) < self.batch:
+                try:
+                    record = get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                else:
+                    records.append(record)
+
+            if records:
+                self.write(records)
+            if stopping:
+                return
+
+    def write(self, records):
+        for handler in self.handlers:
+            handler.deferred = True
+            try:
+                for record in records:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            finally:
+                handler.deferred = False
+                handler.flush()
+
+class LogQueueHandler(QueueHandler):
+    """
+    Enqueues records, leaving the formatting of lines to the writer thread.
+    The message is merged on the calling thread, arguments such as connect
+    parameters or sessions change or are not safe to read once the call has
+    returned. The arguments are kept as a snapshot of plain values in
+    record.log_args for JSON output.
+    """
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        if record.args:
+            record.log_args = log_values(record.args)
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            # Tracebacks are not picklable nor safe to render later, render them now
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def log_values(args) -> list:
+    """Returns log arguments as JSON values, anything but scalars as its str()."""
+    return [arg if isinstance(arg, (int, float, str, bool, type(None))) else str(arg)
+            for arg in (args if isinstance(args, tuple) else (args,))]
+
+writer = None
+
+def setup_logging(logger: logging.Logger, config) -> LogWriter:
+    """
+    Logs through a queue feeding a LogWriter, replacing the queue of an earlier call. Configured
+    by log_general_path, log_error_path, log_type, log_json, log_batch, log_rate and log_burst.
+    """
+    global writer
+
+    name = config.get('name', 'py_socket_server').lower()
+    general_log_file = config.get('log_general_path') or f"logs/{name}.log"
+    errors_log_file = config.get('log_error_path') or f"logs/{name}-errors.log"
+    for path in (general_log_file, errors_log_file):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+    formatter = JsonFormatter() if config.get('log_json') else logging.Formatter(LOG_FORMAT)
+    universal_handler = BatchRotatingFileHandler(general_log_file, maxBytes=LOG_MAX_BYTES,
+                                                 backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    error_handler = BatchFileHandler(errors_log_file, encoding='utf-8')
+    error_handler.setLevel(logging.ERROR)
+    console_handler = BatchStreamHandler(stream=sys.stdout)
+    handlers = [universal_handler, console_handler, error_handler]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    stop_logging()
+    writer = LogWriter(handlers, config.get('log_batch') or LOG_BATCH)
+
+    queue_handler = LogQueueHandler(writer.queue)
+    if config.get('log_rate'):
+        queue_handler.addFilter(RateLimitFilter(config['log_rate'], config.get('log_burst') or LOG_BURST))
+
+    for handler in list(logger.handlers):
+        if isinstance(handler, LogQueueHandler):
+            logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(logging.getLevelName(config.get('log_type', 'info').upper()))
+
+    websockets_logger = logging.getLogger("websockets.server")
+    websockets_logger.setLevel(logging.ERROR)
+    for handler in list(websockets_logger.handlers):
+        if isinstance(handler, LogQueueHandler):
+            websockets_logger.removeHandler(handler)
+    websockets_logger.addHandler(queue_handler)
+    if not any(isinstance(f, NoExcInfoFilter) for f in websockets_logger.filters):
+        websockets_logger.addFilter(NoExcInfoFilter())
+
+    writer.start()
+    return writer
+
+def stop_logging() -> None:
+    """Writes out queued records, called before a process exits without running atexit."""
+    global writer
+    if writer is not None:
+        writer.stop()
+        writer = None
@@ -0,0 +1,182 @@
+from bisect import bisect_left
+
+PREFIX = 'py_socket_server'
+
+# Handler latency bucket bounds in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Latency is measured for one command in this many, a power of two
+SAMPLE_EVERY = 64
+
+# Label for commands without a registered handler, so clients cannot grow the label set
+OTHER_COMMAND = '_other'
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+class Histogram:
+    """Fixed-bucket histogram, counts are kept per bucket and made cumulative when rendered."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # The last slot counts values above the highest bound (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q) -> float:
+        """Estimates a quantile as the upper bound of the bucket holding it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class CommandMetrics:
+    """Counters of one routed command."""
+
+    __slots__ = ('received', 'errors', 'latency')
+
+    def __init__(self, buckets):
+        self.received = 0
+        self.errors = 0
+        self.latency = Histogram(buckets)
+
+class ListenerMetrics:
+    """Traffic counters of one listener, shared by all of its sessions."""
+
+    __slots__ = ('protocol', 'listener', 'opened', 'closed', 'bytes_in', 'bytes_out', 'writes',
+                 'parse_errors', 'send_errors')
+
+    def __init__(self, protocol, listener):
+        self.protocol = protocol
+        self.listener = listener
+        self.opened = 0
+        self.closed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.writes = 0
+        self.parse_errors = 0
+        self.send_errors = 0
+
+# (metric name, type, help, attribute) for ListenerMetrics
+LISTENER_METRICS = (
+    ('connections_opened_total', COUNTER, 'Sessions opened.', 'opened'),
+    ('connections_closed_total', COUNTER, 'Sessions closed.', 'closed'),
+    ('received_bytes_total', COUNTER, 'Bytes received from clients.', 'bytes_in'),
+    ('sent_bytes_total', COUNTER, 'Bytes handed to transports.', 'bytes_out'),
+    ('writes_total', COUNTER, 'Coalesced writes handed to transports.', 'writes'),
+    ('parse_errors_total', COUNTER, 'Sessions stopped because a frame could not be parsed.', 'parse_errors'),
+    ('send_errors_total', COUNTER, 'Failed writes.', 'send_errors'),
+)
+
+class Metrics:
+    """
+    Metrics registry of a server.
+    Hot paths hold on to the preallocated CommandMetrics and ListenerMetrics
+    objects and bump plain attributes, nothing is looked up per message. When
+    disabled, listener() returns None and routes are compiled without counters,
+    so instrumented code only pays for an is-None check. Latency histograms
+    only time one command in sample_every, timing every command would cost
+    more than most handlers. Other components add collectors, called when
+    rendering, that return samples of their own stats.
+    """
+
+    def __init__(self, enabled=False, buckets=LATENCY_BUCKETS, sample_every=SAMPLE_EVERY):
+        if sample_every < 1 or sample_every & (sample_every - 1):
+            raise ValueError(f'sample_every must be a power of two, got {sample_every}')
+
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.sample_every = sample_every
+        self.commands = {}
+        self.listeners = {}
+        self.collectors = []
+
+    def command(self, command) -> CommandMetrics:
+        metrics = self.commands.get(command)
+        if metrics is None:
+            metrics = self.commands[command] = CommandMetrics(self.buckets)
+        return metrics
+
+    def listener(self, protocol, config) -> ListenerMetrics | None:
+        """Returns the counters of the listener described by a protocol config section."""
+        if not self.enabled:
+            return None
+        metrics = self.listeners.get(protocol)
+        if metrics is None:
+            metrics = self.listeners[protocol] = ListenerMetrics(protocol, f"{config.get('bind')}:{config.get('port')}")
+        return metrics
+
+    def collect(self, collector) -> None:
+        """
+        Adds a collector, called as collector() when rendering. It returns an iterable of
+        (name, type, help, samples) where samples is a list of (labels dict, value).
+        """
+        self.collectors.append(collector)
+
+    def families(self):
+        """Yields (name, type, help, samples) for every metric, names without the prefix."""
+        listeners = list(self.listeners.values())
+        for name, kind, help, attribute in LISTENER_METRICS:
+            yield name, kind, help, [({'protocol': metrics.protocol, 'listener': metrics.listener},
+                                      getattr(metrics, attribute)) for metrics in listeners]
+
+        commands = sorted(self.commands.items())
+        yield ('commands_total', COUNTER, 'Commands routed to handlers.',
+               [({'command': command}, metrics.received) for command, metrics in commands])
+        yield ('command_errors_total', COUNTER, 'Handlers that raised.',
+               [({'command': command}, metrics.errors) for command, metrics in commands])
+        yield ('command_duration_seconds', HISTOGRAM, 'Time spent in the handlers of a command, sampled.',
+               [({'command': command}, metrics.latency) for command, metrics in commands])
+
+        for collector in self.collectors:
+            yield from collector()
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, kind, help, samples in self.families():
+            name = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if kind == HISTOGRAM:
+                    render_histogram(lines, name, labels, value)
+                else:
+                    lines.append(f"{name}{render_labels(labels)} {value}")
+        lines.append('')
+        return '\n'.join(lines)
+
+def render_labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+def render_histogram(lines, name, labels, histogram) -> None:
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        lines.append(f"{name}_bucket{render_labels({**labels, 'le': le})} {cumulative}")
+    lines.append(f"{name}_sum{render_labels(labels)} {histogram.sum}")
+    lines.append(f"{name}_count{render_labels(labels)} {histogram.count}")
+
+def metrics_from_config(config) -> Metrics:
+    """Builds the registry from the metrics config section."""
+    config = config or {}
+    return Metrics(bool(config.get('enabled')), config.get('buckets') or LATENCY_BUCKETS,
+                   config.get('sample_every') or SAMPLE_EVERY)
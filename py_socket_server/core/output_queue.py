@@ -0,0 +1,166 @@
+import asyncio
+from collections import deque
+
+FLUSH_THRESHOLD = 65536
+FLUSH_DELAY_MS = 0
+MAX_QUEUE_BYTES = 1048576
+
+DROP_OLDEST = 'drop_oldest'
+DISCONNECT = 'disconnect'
+OVERFLOW_POLICIES = (DROP_OLDEST, DISCONNECT)
+
+class OutputQueue:
+    """
+    Per-session bounded outbound queue that coalesces frames into one write.
+    Frames queued during an event-loop iteration are flushed together once
+    the loop gets back to its ready queue (or after flush_delay_ms), or
+    immediately when the queued size reaches the flush threshold.
+    When the backlog (queued bytes plus bytes still held by the transport)
+    exceeds max_bytes, the overflow policy either drops the oldest droppable
+    frames or disconnects the session. Frames pushed with a key replace a
+    queued frame with the same key, so only the latest state is sent. Only
+    keyed frames and frames pushed as droppable, state a later frame
+    supersedes, are ever dropped: replies and status calls are not, when
+    dropping state is not enough the session is disconnected.
+    """
+
+    __slots__ = ('on_flush', 'on_overflow', 'get_pending', 'threshold', 'delay', 'max_bytes', 'policy',
+                 'entries', 'keys', 'size', 'dropped', 'coalesced', 'overflows', '_handle')
+
+    def __init__(self, on_flush, threshold=FLUSH_THRESHOLD, delay_ms=FLUSH_DELAY_MS,
+                 max_bytes=MAX_QUEUE_BYTES, policy=DISCONNECT, on_overflow=None, get_pending=None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy {policy}')
+
+        self.on_flush = on_flush
+        self.on_overflow = on_overflow
+        self.get_pending = get_pending
+        self.threshold = threshold
+        self.delay = delay_ms / 1000
+        self.max_bytes = max_bytes
+        self.policy = policy
+
+        # Entries are [key, size, chunks, droppable] so coalescing can replace them in place.
+        # Both are only allocated while something is queued, idle sessions hold neither.
+        self.entries = None
+        self.keys = None
+        self.size = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.overflows = 0
+        self._handle = None
+
+    def __len__(self):
+        return self.size
+
+    def backlog(self) -> int:
+        """Returns queued bytes plus bytes already handed to the transport."""
+        if self.get_pending is None:
+            return self.size
+        return self.size + self.get_pending()
+
+    def push(self, *chunks, key=None, droppable=False) -> None:
+        """Queues chunks that are written back to back as one frame, droppable when keyed or flagged."""
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+
+        if self.entries is None:
+            self.entries = deque()
+        entry = self.keys.get(key) if key is not None and self.keys is not None else None
+        if entry is not None:
+            self.size += size - entry[1]
+            entry[1] = size
+            entry[2] = chunks
+            self.coalesced += 1
+        else:
+            entry = [key, size, chunks, droppable or key is not None]
+            self.entries.append(entry)
+            if key is not None:
+                if self.keys is None:
+                    self.keys = {}
+                self.keys[key] = entry
+            self.size += size
+
+        if self.max_bytes and self.backlog() > self.max_bytes:
+            self.overflow()
+            if not self.entries:
+                return
+
+        if self.size >= self.threshold:
+            self.flush()
+        elif self._handle is None:
+            loop = asyncio.get_running_loop()
+            if self.delay > 0:
+                self._handle = loop.call_later(self.delay, self.flush)
+            else:
+                self._handle = loop.call_soon(self.flush)
+
+    def overflow(self) -> None:
+        """Applies the overflow policy once the backlog is over max_bytes."""
+        self.overflows += 1
+
+        if self.policy == DROP_OLDEST:
+            # The newest frame is always kept, bytes owned by the transport cannot be dropped
+            entries = self.entries
+            newest = entries[-1]
+            kept = deque()
+            while entries and self.backlog() > self.max_bytes:
+                entry = entries.popleft()
+                if not entry[3] or entry is newest:
+                    kept.append(entry)
+                    continue
+                if entry[0] is not None:
+                    del self.keys[entry[0]]
+                self.size -= entry[1]
+                self.dropped += 1
+            kept.extend(entries)
+            self.entries = kept
+            if self.backlog() <= self.max_bytes:
+                return
+
+        self.dropped += len(self.entries)
+        self.clear()
+        if self.on_overflow is not None:
+            self.on_overflow()
+
+    def take(self) -> list:
+        """Removes and returns all queued chunks in order."""
+        chunks = []
+        if self.entries is not None:
+            for entry in self.entries:
+                chunks.extend(entry[2])
+        self.entries = None
+        self.keys = None
+        self.size = 0
+        return chunks
+
+    def flush(self) -> None:
+        """Hands queued chunks to the flush callback right away."""
+        self.cancel()
+        if self.entries:
+            self.on_flush()
+
+    def cancel(self) -> None:
+        """Cancels a scheduled flush."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def clear(self) -> None:
+        self.cancel()
+        self.entries = None
+        self.keys = None
+        self.size = 0
+
+def output_queue_from_config(config, on_flush, on_overflow=None, get_pending=None) -> OutputQueue:
+    """Builds an OutputQueue from a protocol config section."""
+    return OutputQueue(
+        on_flush,
+        config.get('flush_threshold') or FLUSH_THRESHOLD,
+        config.get('flush_delay_ms') or FLUSH_DELAY_MS,
+        config.get('max_queue_bytes', MAX_QUEUE_BYTES),
+        config.get('overflow_policy') or DISCONNECT,
+        on_overflow,
+        get_pending
+    )
@@ -0,0 +1,223 @@
+import time
+from py_socket_server.protocol.frames import SharedFrame, encode_frame
+
+# Ticks between full keyframes sent to delta clients
+KEYFRAME_EVERY = 100
+# Call carrying an entity's full state, the shape every client understands
+STATE_COMMAND = '_S'
+# Call carrying only the fields that changed, for clients that enabled deltas
+DELTA_COMMAND = '_SD'
+
+class RoomState:
+    """Replicated entities of a room and the fields changed since the last flush."""
+
+    __slots__ = ('entities', 'dirty', 'generation', 'since_keyframe', 'members_seen')
+
+    def __init__(self):
+        self.entities = {}
+        self.dirty = {}
+        # Flushes sent so far, a session in sync holds the state of this generation
+        self.generation = 0
+        self.since_keyframe = 0
+        self.members_seen = 0
+
+class Replicator:
+    """
+    Replicates entity state to the members of a room, with deltas for clients that support them.
+    Handlers set fields with update(), at the next tick every client is sent:
+
+        [STATE_COMMAND, entity_id, state]    full state of each changed entity, unless deltas are enabled
+        [DELTA_COMMAND, entity_id, fields]   only the changed fields, once enable_delta() was called
+        [STATE_COMMAND, entity_id, state]    every entity of the room, when joining, resyncing or at a keyframe
+
+    Old clients keep getting full states in the call shape they already parse.
+    Each session records the room generation it was last sent, together with its
+    dropped frame count, in place of a per-entity copy. TCP delivers in order, so
+    every session in sync holds the same state and one encoded frame serves them
+    all. A session that joins, reconnects as a new session, or lost a frame to
+    its output queue is out of sync and gets a full snapshot. Delta clients also
+    get one every keyframe_every ticks. A client is sent its own entity, so it
+    gets its state back after a reconnect.
+    """
+
+    def __init__(self, ctx, keyframe_every=KEYFRAME_EVERY, command=STATE_COMMAND, delta_command=DELTA_COMMAND):
+        self.ctx = ctx
+        self.keyframe_every = keyframe_every
+        self.command = command
+        self.delta_command = delta_command
+        self.rooms = {}
+        # session id -> {room -> (generation, dropped frames)}
+        self.views = {}
+        self.delta_sessions = set()
+
+        self.keyframes = 0
+        self.resyncs = 0
+        # Time spent comparing views and encoding frames
+        self.build_time = 0.0
+        # Bytes queued for clients per kind of frame
+        self.bytes = {'full': 0, 'delta': 0, 'snapshot': 0}
+
+    def update(self, room, entity_id, fields) -> None:
+        """
+        Sets fields of an entity replicated to a room. Values equal to the current ones are not
+        sent again, pass new lists and dicts rather than mutating the ones already set.
+        """
+        state = self.rooms.get(room)
+        if state is None:
+            state = self.rooms[room] = RoomState()
+
+        entity = state.entities.get(entity_id)
+        if entity is None:
+            entity = state.entities[entity_id] = {}
+        changed = state.dirty.get(entity_id)
+        for name, value in fields.items():
+            if name in entity and entity[name] == value:
+                continue
+            entity[name] = value
+            if changed is None:
+                changed = state.dirty[entity_id] = {}
+            changed[name] = value
+
+        if changed and not self.ctx.ticks.rate:
+            outgoing = {}
+            self.collect_room(room, state, outgoing)
+            send(outgoing)
+
+    def remove(self, room, entity_id) -> None:
+        """Stops replicating an entity, clients are not told, announce departures as before."""
+        state = self.rooms.get(room)
+        if state is None:
+            return
+        state.entities.pop(entity_id, None)
+        state.dirty.pop(entity_id, None)
+        if not state.entities:
+            del self.rooms[room]
+
+    def state(self, room, entity_id) -> dict | None:
+        state = self.rooms.get(room)
+        return state.entities.get(entity_id) if state is not None else None
+
+    def enable_delta(self, session, enabled=True) -> None:
+        """Sends a session changed fields only, for clients that announced delta support at connect."""
+        if enabled:
+            self.delta_sessions.add(session.id)
+        else:
+            self.delta_sessions.discard(session.id)
+
+    def resync(self, session) -> None:
+        """Sends a session full snapshots of its rooms at the next tick."""
+        self.views.pop(session.id, None)
+
+    def sync(self, session) -> None:
+        """
+        Sends a session the full state of its rooms right away. Without a tick rate, rooms are
+        only flushed on update(), call this after a join so the session does not wait for one.
+        """
+        views = self.views.get(session.id)
+        if views is None:
+            views = self.views[session.id] = {}
+        chunks = []
+        for room in session.rooms or ():
+            state = self.rooms.get(room)
+            if state is None:
+                continue
+            chunks.extend(encode_frame(self.command, entity_id, entity) for entity_id, entity in state.entities.items())
+            views[room] = (state.generation, session.dropped_frames)
+        if chunks:
+            snapshot = b''.join(chunks)
+            self.bytes['snapshot'] += len(snapshot)
+            session.send_frame(snapshot, droppable=True)
+
+    def forget(self, session) -> None:
+        self.views.pop(session.id, None)
+        self.delta_sessions.discard(session.id)
+
+    def collect(self, outgoing) -> None:
+        """Adds the frames of every room to outgoing, a dict of session -> chunks."""
+        for room, state in list(self.rooms.items()):
+            self.collect_room(room, state, outgoing)
+
+    def collect_room(self, room, state, outgoing) -> None:
+        members = self.ctx.rooms.members(room)
+        changed, state.dirty = state.dirty, {}
+        state.since_keyframe += 1
+        keyframe = state.since_keyframe >= self.keyframe_every
+        # Idle rooms are only looked at when members came or went, or for a keyframe
+        if not changed and not keyframe and len(members) == state.members_seen:
+            return
+        state.members_seen = len(members)
+        if not members:
+            return
+        if keyframe:
+            state.since_keyframe = 0
+            self.keyframes += 1
+
+        generation = state.generation
+        state.generation += 1
+        current = state.generation
+        views = self.views
+        delta_sessions = self.delta_sessions
+        command = self.command
+        full = delta = snapshot = None
+        start = time.perf_counter()
+
+        for member in members:
+            member_id = member.id
+            dropped = member.dropped_frames
+            rooms = views.get(member_id)
+            if rooms is None:
+                rooms = views[member_id] = {}
+            in_sync = rooms.get(room) == (generation, dropped)
+            rooms[room] = (current, dropped)
+
+            if not in_sync or (keyframe and member_id in delta_sessions):
+                if snapshot is None:
+                    snapshot = SharedFrame(b''.join(encode_frame(command, entity_id, entity)
+                                                    for entity_id, entity in state.entities.items()))
+                if not in_sync:
+                    self.resyncs += 1
+                chunk, kind = snapshot, 'snapshot'
+            elif not changed:
+                continue
+            elif member_id in delta_sessions:
+                if delta is None:
+                    delta = SharedFrame(b''.join(encode_frame(self.delta_command, entity_id, fields)
+                                                 for entity_id, fields in changed.items()))
+                chunk, kind = delta, 'delta'
+            else:
+                if full is None:
+                    full = SharedFrame(b''.join(encode_frame(command, entity_id, state.entities[entity_id])
+                                                for entity_id in changed if entity_id in state.entities))
+                chunk, kind = full, 'full'
+
+            if not chunk:
+                continue
+            self.bytes[kind] += len(chunk)
+            chunks = outgoing.get(member)
+            if chunks is None:
+                outgoing[member] = [chunk]
+            else:
+                chunks.append(chunk)
+
+        self.build_time += time.perf_counter() - start
+
+    def stats(self) -> dict:
+        return {
+            'rooms': len(self.rooms),
+            'delta_sessions': len(self.delta_sessions),
+            'keyframes': self.keyframes,
+            'resyncs': self.resyncs,
+            'build_time': self.build_time,
+            'bytes': dict(self.bytes),
+        }
+
+def send(outgoing) -> None:
+    """Queues one frame per session from a dict of session -> chunks."""
+    for session, chunks in outgoing.items():
+        session.send_frame(chunks[0] if len(chunks) == 1 else b''.join(chunks), droppable=True)
+
+def replication_from_config(ctx, config) -> Replicator:
+    """Builds the replicator from the replication config section."""
+    config = config or {}
+    return Replicator(ctx, config.get('keyframe_every') or KEYFRAME_EVERY,
+                      config.get('command') or STATE_COMMAND, config.get('delta_command') or DELTA_COMMAND)
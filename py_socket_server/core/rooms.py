@@ -0,0 +1,44 @@
+class Rooms:
+    """Registry of named rooms and the sessions that joined them."""
+
+    def __init__(self):
+        self.rooms = {}
+
+    def __contains__(self, room):
+        return room in self.rooms
+
+    def __iter__(self):
+        return iter(self.rooms)
+
+    def join(self, room, session) -> None:
+        """Adds a session to a room, creating the room on first join."""
+        members = self.rooms.get(room)
+        if members is None:
+            members = self.rooms[room] = set()
+        members.add(session)
+        if session.rooms is None:
+            session.rooms = set()
+        session.rooms.add(room)
+
+    def leave(self, room, session) -> None:
+        """Removes a session from a room, dropping the room once it is empty."""
+        if session.rooms is not None:
+            session.rooms.discard(room)
+        members = self.rooms.get(room)
+        if members is None:
+            return
+        members.discard(session)
+        if not members:
+            del self.rooms[room]
+
+    def leave_all(self, session) -> None:
+        """Removes a session from every room it joined."""
+        for room in list(session.rooms or ()):
+            self.leave(room, session)
+
+    def members(self, room) -> set:
+        """Returns the sessions in a room."""
+        return self.rooms.get(room, set())
+
+    def count(self, room) -> int:
+        return len(self.rooms.get(room, ()))
@@ -0,0 +1,114 @@
+import asyncio
+import inspect
+from functools import partial
+from time import perf_counter
+from py_socket_server.core.metrics import OTHER_COMMAND
+
+class Router:
+    """
+    Maps command and lifecycle event names to the handlers registered with PySocketServer.on.
+    The handlers of a command are compiled once, together with the middleware
+    chain, into a single coroutine that the session reading the command awaits
+    inline, instead of emitting an event that spawns a task per listener.
+    The compiled table is rebuilt lazily after a handler or middleware is added.
+    With metrics enabled, routes count their commands and errors, and time
+    the handlers of one command in metrics.sample_every.
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.handlers = {}
+        self.middleware = []
+        self.routes = {}
+
+    def on(self, event, handler) -> None:
+        """Registers a handler, called as handler(session_id, ctx, message[, responder]) for commands."""
+        self.handlers.setdefault(event, []).append(handler)
+        self.routes.clear()
+
+    def off(self, event, handler) -> None:
+        handlers = self.handlers.get(event)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+            self.routes.clear()
+
+    def use(self, middleware) -> None:
+        """
+        Adds a middleware wrapping every routed command, in registration order.
+        Called as middleware(session, message, call_next), it runs the rest of the
+        chain with await call_next() or drops the command by not calling it.
+        """
+        self.middleware.append(middleware)
+        self.routes.clear()
+
+    def compile(self, command):
+        stats = None
+        if self.ctx.metrics.enabled:
+            stats = self.ctx.metrics.command(command if command in self.handlers else OTHER_COMMAND)
+
+        route = self.invoker(command, tuple(self.handlers.get(command, ())), stats)
+        for middleware in reversed(self.middleware):
+            route = self.chain(middleware, route, stats)
+        return route
+
+    def chain(self, middleware, route, stats=None):
+        async def step(session, message, args):
+            try:
+                await middleware(session, message, partial(route, session, message, args))
+            except Exception as error:
+                if stats is not None:
+                    stats.errors += 1
+                self.on_error(message[0], error)
+
+        return step
+
+    def invoker(self, command, handlers, stats=None):
+        ctx = self.ctx
+        sample_mask = ctx.metrics.sample_every - 1
+
+        async def invoke(session, message, args):
+            start = None
+            if stats is not None:
+                stats.received += 1
+                if not stats.received & sample_mask:
+                    start = perf_counter()
+
+            for handler in handlers:
+                try:
+                    result = handler(session.id, ctx, *args)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as error:
+                    if stats is not None:
+                        stats.errors += 1
+                    self.on_error(command, error)
+
+            if start is not None:
+                stats.latency.observe(perf_counter() - start)
+
+        return invoke
+
+    async def dispatch(self, session, command, message, args=()) -> None:
+        """Runs the compiled route of a command, args are what the handlers receive after ctx."""
+        route = self.routes.get(command)
+        if route is None:
+            route = self.routes[command] = self.compile(command)
+        await route(session, message, args)
+
+    async def emit(self, event, *args) -> None:
+        """Calls the handlers of a lifecycle event with args as given, bypassing middleware."""
+        for handler in self.handlers.get(event, ()):
+            try:
+                result = handler(*args)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as error:
+                self.on_error(event, error)
+
+    def on_error(self, event, error) -> None:
+        self.ctx.logger.error("Handler for %s failed, %s: %s", event, error.__class__.__name__, error)
+        for handler in self.handlers.get('error', ()):
+            result = handler(error)
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+
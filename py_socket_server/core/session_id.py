@@ -0,0 +1,94 @@
+import os
+
+ALPHABET = '1234567890abcdefghijklmnopqrstuvwxyz'
+ID_SIZE = 16
+BATCH_SIZE = 1024
+
+# Separates the node prefix from the random part, which only uses ALPHABET
+NODE_SEPARATOR = '-'
+
+def translation(alphabet):
+    """
+    Returns the bytes.translate() table and delete set mapping random bytes onto an alphabet.
+    Only the largest multiple of the alphabet length is kept so every character is equally likely.
+    """
+    size = len(alphabet)
+    limit = 256 - 256 % size
+    encoded = alphabet.encode('ascii')
+    table = bytes(encoded[byte % size] if byte < limit else 0 for byte in range(256))
+    return table, bytes(range(limit, 256)), limit
+
+class IdAllocator:
+    """
+    Hands out random session ids from a pool generated in batches.
+    A batch is a single os.urandom() call mapped onto the alphabet with
+    bytes.translate(), so the per-id cost is one slice. Ids held by live
+    sessions are skipped, and with a node prefix the owner of an id can be
+    read from the id itself.
+    """
+
+    __slots__ = ('taken', 'size', 'batch', 'alphabet', 'prefix', 'ready', '_table', '_reject', '_limit')
+
+    def __init__(self, taken=None, size=ID_SIZE, batch=BATCH_SIZE, alphabet=ALPHABET, prefix=''):
+        self.taken = taken if taken is not None else {}
+        self.size = size
+        self.batch = batch
+        self.alphabet = alphabet
+        self.prefix = prefix
+        self.ready = []
+        self._table, self._reject, self._limit = translation(alphabet)
+
+    def set_node(self, node_id) -> None:
+        """Prefixes the ids allocated from now on with a cluster node id."""
+        self.prefix = f"{node_id}{NODE_SEPARATOR}" if node_id is not None else ''
+        self.ready = []
+
+    def random_text(self, wanted) -> str:
+        """Returns wanted random characters of the alphabet."""
+        chars = b''
+        while len(chars) < wanted:
+            # Ask for enough bytes that rejected ones rarely need a second round
+            missing = wanted - len(chars)
+            chars += os.urandom(missing * 256 // self._limit + 16).translate(self._table, self._reject)
+        return chars[:wanted].decode('ascii')
+
+    def refill(self) -> None:
+        size = self.size
+        wanted = size * self.batch
+        text = self.random_text(wanted)
+        prefix = self.prefix
+        self.ready = [prefix + text[i:i + size] for i in range(0, wanted, size)]
+
+    def allocate(self) -> str:
+        """Returns an id no live session uses."""
+        ready = self.ready
+        taken = self.taken
+        while True:
+            if not ready:
+                self.refill()
+                ready = self.ready
+            session_id = ready.pop()
+            if session_id not in taken:
+                return session_id
+
+def node_of(session_id: str) -> str | None:
+    """Returns the node prefix of an id allocated with set_node(), as a string."""
+    node, separator, _ = session_id.rpartition(NODE_SEPARATOR)
+    return node if separator else None
+
+default_allocator = IdAllocator()
+
+def random_id(size=ID_SIZE) -> str:
+    """Returns a random id from the shared pool, for ids that are not session ids."""
+    if size != default_allocator.size:
+        return default_allocator.random_text(size)
+    return default_allocator.allocate()
+
+def allocator_from_config(config, taken=None) -> IdAllocator:
+    """Builds an IdAllocator from the session_id config section."""
+    config = config or {}
+    return IdAllocator(
+        taken,
+        config.get('size') or ID_SIZE,
+        config.get('batch') or BATCH_SIZE,
+    )
@@ -0,0 +1,73 @@
+from bisect import bisect_right
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Sessions looked at per page when filters skip most of them
+MAX_SCAN = 10000
+# Removed slots are compacted away once they are the majority
+COMPACT_MIN = 1024
+
+class SessionIndex:
+    """
+    Sessions in the order they were added, paged with cursors.
+    Every session gets an increasing sequence number, a cursor is the last
+    number a page returned, so a page costs a binary search plus the slots
+    it scans, however many sessions there are and however they change
+    between pages. Removed sessions leave an empty slot until compaction.
+    """
+
+    __slots__ = ('seqs', 'slots', 'seq_of', 'next_seq', 'removed')
+
+    def __init__(self):
+        self.seqs = []
+        self.slots = []
+        self.seq_of = {}
+        self.next_seq = 1
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.seq_of)
+
+    def add(self, session) -> None:
+        if session.id in self.seq_of:
+            return
+        seq = self.next_seq
+        self.next_seq += 1
+        self.seq_of[session.id] = seq
+        self.seqs.append(seq)
+        self.slots.append(session)
+
+    def remove(self, session) -> None:
+        seq = self.seq_of.pop(session.id, None)
+        if seq is None:
+            return
+        self.slots[bisect_right(self.seqs, seq) - 1] = None
+        self.removed += 1
+        if self.removed >= COMPACT_MIN and self.removed * 2 > len(self.slots):
+            self.compact()
+
+    def compact(self) -> None:
+        kept = [(seq, session) for seq, session in zip(self.seqs, self.slots) if session is not None]
+        self.seqs = [seq for seq, _ in kept]
+        self.slots = [session for _, session in kept]
+        self.removed = 0
+
+    def page(self, cursor=0, limit=PAGE_SIZE, match=None, max_scan=MAX_SCAN):
+        """
+        Returns (sessions, next_cursor) for the sessions added after cursor that match.
+        next_cursor is None once the end is reached. A page can hold fewer than limit
+        sessions when max_scan slots were looked at first, keep paging with its cursor.
+        """
+        seqs, slots = self.seqs, self.slots
+        start = bisect_right(seqs, cursor)
+        end = min(len(slots), start + max_scan)
+        sessions = []
+        i = start
+        while i < end and len(sessions) < limit:
+            session = slots[i]
+            i += 1
+            if session is not None and (match is None or match(session)):
+                sessions.append(session)
+
+        next_cursor = seqs[i - 1] if i < len(slots) else None
+        return sessions, next_cursor
@@ -0,0 +1,203 @@
+import asyncio
+from py_socket_server.core.metrics import Histogram
+from py_socket_server.protocol.frames import SharedFrame, encode_frame
+
+# Ticks per second, 0 sends every update right away
+TICK_RATE = 0
+
+# Bounds of the per-tick flush time histogram, in seconds
+TICK_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+# Bounds of the per-client frame size histogram, in bytes
+FRAME_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144)
+
+class TickScheduler:
+    """
+    Fixed-rate state replication.
+    Handlers record state changes with update() or update_nearby() instead of
+    sending them, ctx.replication adds its frames to the same tick. Changes
+    are merged per entity, field by field, until the next tick, which encodes
+    each entity's state once and queues a single frame per client holding
+    every change it should see. The frame is the usual NUL-terminated calls
+    back to back, clients parse it like separate sends. A client is not sent
+    its own entity. Without a rate, updates are sent right away.
+
+    A tick that runs past the start of the next one is an overrun, missed ticks
+    are skipped rather than run back to back. Flush time, overruns and frame
+    sizes are measured.
+    """
+
+    def __init__(self, ctx, rate=TICK_RATE):
+        self.ctx = ctx
+        self.rate = rate
+        self.interval = 1 / rate if rate else None
+        # room -> {entity id -> {command -> state}}
+        self.rooms = {}
+        # entity id -> (session, radius, {command -> state})
+        self.nearby = {}
+        self.tick = 0
+        self.handle = None
+        self.next_time = None
+
+        self.duration = Histogram(TICK_BUCKETS)
+        self.frame_bytes = Histogram(FRAME_BUCKETS)
+        self.overruns = 0
+        self.overrun_time = 0.0
+        self.skipped = 0
+        self.frames = 0
+
+    def start(self) -> None:
+        if not self.rate or self.handle is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self.next_time = loop.time() + self.interval
+        self.handle = loop.call_at(self.next_time, self.on_tick)
+
+    def stop(self) -> None:
+        """Stops ticking after sending the changes recorded so far."""
+        if self.handle is None:
+            return
+        self.handle.cancel()
+        self.handle = None
+        self.flush()
+
+    def update(self, room, entity_id, state, command='_S') -> None:
+        """Records the state of an entity for the members of a room, merged with its earlier changes."""
+        if not self.rate:
+            self.ctx.broadcast_local(room, command, entity_id, state, exclude=entity_id)
+            return
+
+        changes = self.rooms.get(room)
+        if changes is None:
+            changes = self.rooms[room] = {}
+        merge(changes, entity_id, command, state)
+
+    def update_nearby(self, session, radius, state, command='_S') -> None:
+        """Records the state of a session for the sessions within radius of it at the next tick."""
+        if not self.rate:
+            self.ctx.broadcast_nearby(session, radius, command, session.id, state)
+            return
+
+        entry = self.nearby.get(session.id)
+        if entry is None:
+            self.nearby[session.id] = (session, radius, {command: state})
+            return
+        commands = entry[2]
+        if entry[1] != radius:
+            self.nearby[session.id] = (session, radius, commands)
+        merge_state(commands, command, state)
+
+    def on_tick(self) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self.tick += 1
+        try:
+            self.flush()
+        except Exception as e:
+            self.ctx.logger.error("Tick %s failed, %s: %s", self.tick, e.__class__.__name__, e)
+        now = loop.time()
+        self.duration.observe(now - start)
+
+        next_time = self.next_time + self.interval
+        if now > next_time:
+            # Skip the ticks that are already due instead of running them back to back
+            self.overruns += 1
+            self.overrun_time += now - next_time
+            missed = int((now - next_time) / self.interval) + 1
+            self.skipped += missed
+            next_time += missed * self.interval
+        self.next_time = next_time
+        self.handle = loop.call_at(next_time, self.on_tick)
+
+    def flush(self) -> None:
+        """Queues one frame per client with the changes recorded since the previous tick."""
+        rooms, nearby = self.rooms, self.nearby
+        replication = self.ctx.replication
+        if not rooms and not nearby and not replication.rooms:
+            return
+        self.rooms, self.nearby = {}, {}
+
+        outgoing = {}
+        members_of = self.ctx.rooms.members
+        for room, changes in rooms.items():
+            members = members_of(room)
+            if not members:
+                continue
+            # Every entity's calls are contiguous, a member's own calls are sliced out
+            pieces = []
+            spans = {}
+            offset = 0
+            for entity_id, commands in changes.items():
+                start = offset
+                for command, state in commands.items():
+                    piece = encode_frame(command, entity_id, state)
+                    pieces.append(piece)
+                    offset += len(piece)
+                spans[entity_id] = (start, offset)
+            shared = SharedFrame(b''.join(pieces))
+
+            for member in members:
+                span = spans.get(member.id)
+                chunk = shared if span is None else shared[:span[0]] + shared[span[1]:]
+                if not chunk:
+                    continue
+                chunks = outgoing.get(member)
+                if chunks is None:
+                    outgoing[member] = [chunk]
+                else:
+                    chunks.append(chunk)
+
+        nearby_of = self.ctx.interest.nearby
+        for entity_id, (session, radius, commands) in nearby.items():
+            recipients = nearby_of(session, radius)
+            if not recipients:
+                continue
+            piece = SharedFrame(b''.join(encode_frame(command, entity_id, state)
+                                         for command, state in commands.items()))
+            for recipient in recipients:
+                chunks = outgoing.get(recipient)
+                if chunks is None:
+                    outgoing[recipient] = [piece]
+                else:
+                    chunks.append(piece)
+
+        replication.collect(outgoing)
+
+        observe = self.frame_bytes.observe
+        for session, chunks in outgoing.items():
+            frame = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+            session.send_frame(frame, droppable=True)
+            observe(len(frame))
+        self.frames += len(outgoing)
+
+    def stats(self) -> dict:
+        return {
+            'rate': self.rate,
+            'ticks': self.tick,
+            'overruns': self.overruns,
+            'overrun_time': self.overrun_time,
+            'skipped': self.skipped,
+            'frames': self.frames,
+            'duration_p99': self.duration.quantile(0.99),
+            'frame_bytes_p99': self.frame_bytes.quantile(0.99),
+        }
+
+def merge(changes, entity_id, command, state) -> None:
+    commands = changes.get(entity_id)
+    if commands is None:
+        changes[entity_id] = {command: state}
+    else:
+        merge_state(commands, command, state)
+
+def merge_state(commands, command, state) -> None:
+    """Merges a change into the pending state of one command, dicts field by field, anything else replaces."""
+    pending = commands.get(command)
+    if isinstance(pending, dict) and isinstance(state, dict):
+        if pending is not state:
+            commands[command] = {**pending, **state}
+    else:
+        commands[command] = state
+
+def tick_from_config(ctx, config) -> TickScheduler:
+    """Builds the scheduler from the tick config section."""
+    config = config or {}
+    return TickScheduler(ctx, config.get('rate') or TICK_RATE)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import math
+
+TIMER_TICK = 1.0
+WHEEL_SIZE = 512
+
+class Timer:
+    """Handle of a timer scheduled on a TimerWheel."""
+    __slots__ = ('wheel', 'rounds', 'slot', 'callback', 'args')
+
+    def __init__(self, wheel, rounds, slot, callback, args):
+        self.wheel = wheel
+        self.rounds = rounds
+        self.slot = slot
+        self.callback = callback
+        self.args = args
+
+    def cancel(self) -> None:
+        if self.wheel is not None:
+            self.wheel.remove(self)
+
+    def cancelled(self) -> bool:
+        return self.wheel is None
+
+class TimerWheel:
+    """
+    Hashed timer wheel running every coarse timer from a single loop callback.
+    Timers are bucketed into slots one tick wide and a slot is fired as a batch,
+    so thousands of session timers cost one scheduled callback per tick.
+    Resolution is one tick; the wheel stops ticking while it is empty.
+    """
+
+    def __init__(self, tick=TIMER_TICK, size=WHEEL_SIZE, logger=None):
+        self.tick = tick
+        self.size = size
+        self.logger = logger or logging.getLogger('py-socket-server')
+        # Only occupied slots are allocated, mapping slot index to its timers
+        self.slots = {}
+        self.position = 0
+        self.count = 0
+        self._next_time = None
+        self._handle = None
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, delay, callback, *args) -> Timer:
+        """Calls callback(*args) after roughly delay seconds."""
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self.position + ticks) % self.size
+        timer = Timer(self, (ticks - 1) // self.size, slot, callback, args)
+        timers = self.slots.get(slot)
+        if timers is None:
+            timers = self.slots[slot] = set()
+        timers.add(timer)
+        self.count += 1
+
+        if self._handle is None:
+            loop = asyncio.get_running_loop()
+            self._next_time = loop.time() + self.tick
+            self._handle = loop.call_at(self._next_time, self.advance)
+        return timer
+
+    def remove(self, timer: Timer) -> None:
+        timers = self.slots[timer.slot]
+        timers.discard(timer)
+        if not timers:
+            del self.slots[timer.slot]
+        timer.wheel = None
+        self.count -= 1
+
+    def advance(self) -> None:
+        """Fires the slots for every tick that elapsed since the last call."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        while self._next_time <= now:
+            self.position = (self.position + 1) % self.size
+            self._next_time += self.tick
+
+            slot = self.slots.get(self.position)
+            if slot is None:
+                continue
+
+            for timer in list(slot):
+                if timer.wheel is None:
+                    # Cancelled by a callback fired earlier in this batch
+                    continue
+                if timer.rounds:
+                    timer.rounds -= 1
+                    continue
+
+                slot.discard(timer)
+                timer.wheel = None
+                self.count -= 1
+                try:
+                    timer.callback(*timer.args)
+                except Exception as error:
+                    self.logger.error("Timer callback error: %s", error)
+
+            if not slot and self.slots.get(self.position) is slot:
+                del self.slots[self.position]
+
+        if self.count:
+            self._handle = loop.call_at(self._next_time, self.advance)
+        else:
+            self._handle = None
+
+    def stop(self) -> None:
+        """Cancels every timer and stops ticking."""
+        for slot in self.slots.values():
+            for timer in slot:
+                timer.wheel = None
+        self.slots.clear()
+        self.count = 0
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
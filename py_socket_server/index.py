@@ -1,89 +1,183 @@
 import asyncio
-from logging.handlers import RotatingFileHandler
-import os
-import sys
 import pkg_resources
 from importlib.metadata import metadata
-import logging
-from py_socket_server.core.logger import NoExcInfoFilter
+from py_socket_server.core.logger import setup_logging
 from py_socket_server.core.context import Context
 from py_socket_server.server.xmls_server import PyXmlsServer
 from py_socket_server.server.ws_server import PyWsServer
+from py_socket_server.server.policy_server import PyPolicyServer
+from py_socket_server.server.metrics_server import PyMetricsServer
+from py_socket_server.server.http_server import PyHttpServer
+from py_socket_server.core.session_index import SessionIndex
+from py_socket_server.cluster.cluster import Cluster, backend_from_config
+from py_socket_server.protocol.frames import frame_cache
+from py_socket_server.core.metrics import COUNTER, GAUGE, HISTOGRAM
 
 class PySocketServer:
-    def __init__(self, config):
+    def __init__(self, config, worker_id=None, cluster_backend=None):
         distribution = pkg_resources.get_distribution("py_socket_server")
         pkg_metadata = metadata("py_socket_server")
 
         self.ctx = Context(config)
+        self.worker_id = worker_id
 
-        general_log_file = self.ctx.config['log_general_path'] if self.ctx.config['log_general_path'] \
-            else f"logs/{self.ctx.config['name'].lower()}.log"
-        errors_log_file = self.ctx.config['log_error_path'] if self.ctx.config['log_error_path'] \
-            else f"logs/{self.ctx.config['name'].lower()}-errors.log"
-        general_log_directory = os.path.dirname(general_log_file)
-        errors_log_directory = os.path.dirname(errors_log_file)
+        if worker_id is not None and (config.get('workers') or 1) > 1:
+            # Every worker binds the same ports, the kernel spreads connections between them
+            self.ctx.reuse_port = True
 
-        if not os.path.exists(general_log_directory):
-            os.mkdir(general_log_directory)
+        backend = cluster_backend or backend_from_config(self.ctx, worker_id)
+        if backend is not None:
+            self.ctx.cluster = Cluster(self.ctx, backend)
+            if (config.get('session_id') or {}).get('node_prefix'):
+                # Lets other nodes route to a session before its directory entry reaches them
+                self.ctx.session_ids.set_node(backend.node_id)
 
-        if not os.path.exists(errors_log_directory):
-            os.mkdir(errors_log_directory)
+        # Handlers run on a writer thread, the event loop only enqueues records
+        setup_logging(self.ctx.logger, self.ctx.config)
 
-        universal_handler = RotatingFileHandler(general_log_file,
-                                                maxBytes=2097152, backupCount=3, encoding='utf-8')
-
-        error_handler = logging.FileHandler(errors_log_file)
-        console_handler = logging.StreamHandler(stream=sys.stdout)
-
-        log_formatter = logging.Formatter('[%(asctime)s] [%(levelname)s] %(message)s')
-        error_handler.setLevel(logging.ERROR)
-
-        universal_handler.setFormatter(log_formatter)
-        console_handler.setFormatter(log_formatter)
-
-        self.ctx.logger.addHandler(universal_handler)
-        self.ctx.logger.addHandler(console_handler)
-        self.ctx.logger.addHandler(error_handler)
-
-        level = logging.getLevelName(config['log_type'].upper())
-        self.ctx.logger.setLevel(level)
-
-        websockets_logger = logging.getLogger("websockets.server")
-        websockets_logger.setLevel(logging.ERROR)
-        handler = logging.StreamHandler()
-        handler.setFormatter(log_formatter)
-        websockets_logger.addHandler(handler)
-        websockets_logger.addFilter(NoExcInfoFilter())
-
-        self.ctx.logger.info(f"py_socket_server v{distribution.version}")
-        self.ctx.logger.info(f"Homepage: {pkg_metadata['Home-page']}")
-        self.ctx.logger.info(f"License: {pkg_metadata['License']}")
-        self.ctx.logger.info(f"Author: {pkg_metadata['Author']}")
+        self.ctx.logger.info("py_socket_server v%s", distribution.version)
+        self.ctx.logger.info("Homepage: %s", pkg_metadata['Home-page'])
+        self.ctx.logger.info("License: %s", pkg_metadata['License'])
+        self.ctx.logger.info("Author: %s", pkg_metadata['Author'])
 
         self.xmls_server = PyXmlsServer(self.ctx)
         self.ws_server = PyWsServer(self.ctx)
+        self.policy_server = PyPolicyServer(self.ctx)
+        self.metrics_server = PyMetricsServer(self.ctx, self.metrics, worker_id)
+        self.http_server = PyHttpServer(self.ctx, self, worker_id)
+        if self.http_server.enabled:
+            self.ctx.session_index = SessionIndex()
+        if self.ctx.metrics.enabled:
+            self.ctx.metrics.collect(self.collect_stats)
 
     def clients(self):
         return list(self.ctx.sessions.values())
 
     async def run(self):
+        if self.ctx.cluster is not None:
+            await self.ctx.cluster.start()
+        self.ctx.ticks.start()
+
         tasks = []
         if self.xmls_server:
             tasks.append(self.xmls_server.run())
         if self.ws_server:
             tasks.append(self.ws_server.run())
+        if self.policy_server.enabled:
+            tasks.append(self.policy_server.run())
+        if self.metrics_server.enabled:
+            tasks.append(self.metrics_server.run())
+        if self.http_server.enabled:
+            tasks.append(self.http_server.run())
         
         await asyncio.gather(*tasks)
 
     async def on(self, event_name, listener):
-        self.ctx.py_event.on(event_name, listener)
+        self.ctx.router.on(event_name, listener)
+
+    async def off(self, event_name, listener):
+        self.ctx.router.off(event_name, listener)
+
+    def use(self, middleware):
+        """Adds a command middleware, see Router.use."""
+        self.ctx.router.use(middleware)
 
     async def stop(self):
+        self.ctx.ticks.stop()
+        await self.http_server.stop()
+        await self.metrics_server.stop()
+        await self.policy_server.stop()
         if hasattr(self.xmls_server, 'stop'):
             await self.xmls_server.stop()
         if hasattr(self.ws_server, 'stop'):
             await self.ws_server.stop()
+        if self.ctx.cluster is not None:
+            await self.ctx.cluster.stop()
 
     def get_session(self, id):
-        return self.ctx.sessions.get(id)
\ No newline at end of file
+        """Returns a local session, or a proxy when another worker owns it."""
+        session = self.ctx.sessions.get(id)
+        if session is None and self.ctx.cluster is not None:
+            return self.ctx.cluster.get_session(id)
+        return session
+
+    def stats(self):
+        """Returns server counters."""
+        return {
+            'sessions': len(self.ctx.sessions),
+            'frame_cache': frame_cache.stats(),
+            'admission': self.ctx.admission.stats(),
+            'policy_requests': self.xmls_server.policy_requests + self.policy_server.requests,
+            'dispatch': self.dispatch_stats(),
+            'tick': self.ctx.ticks.stats(),
+            'replication': self.ctx.replication.stats(),
+            'ws_compression': self.ws_server.stats(),
+        }
+
+    def dispatch_stats(self):
+        dispatcher = self.ctx.dispatcher
+        return {
+            'active': dispatcher.active,
+            'waiting': dispatcher.waiting,
+            'queued': dispatcher.queued,
+            'wait_max': dispatcher.wait_max,
+        }
+
+    def metrics(self):
+        """Returns every metric in the Prometheus text format, metrics must be enabled."""
+        return self.ctx.metrics.render()
+
+    def collect_stats(self):
+        """Metrics collector exporting stats()."""
+        stats = self.stats()
+        cache, admission, dispatch = stats['frame_cache'], stats['admission'], stats['dispatch']
+        yield 'sessions', GAUGE, 'Sessions connected to this process.', [({}, stats['sessions'])]
+        yield 'frame_cache_hits_total', COUNTER, 'Frame cache hits.', [({}, cache['hits'])]
+        yield 'frame_cache_misses_total', COUNTER, 'Frame cache misses.', [({}, cache['misses'])]
+        yield 'frame_cache_entries', GAUGE, 'Cached frames and templates.', [
+            ({'kind': 'frame'}, cache['frames']), ({'kind': 'template'}, cache['templates'])]
+        yield 'admission_pending', GAUGE, 'Connects running their preConnect handlers.', [({}, admission['pending'])]
+        yield 'admission_queued', GAUGE, 'Connects waiting for a pending slot.', [({}, admission['queued'])]
+        yield 'admission_rejected_total', COUNTER, 'Rejected connects.', [
+            ({'reason': reason}, count) for reason, count in sorted(admission['rejected'].items())]
+        yield 'admission_dropped_messages_total', COUNTER, 'Commands over the IP message rate.', [
+            ({}, admission['dropped_messages'])]
+        yield 'policy_requests_total', COUNTER, 'Policy-file requests answered.', [({}, stats['policy_requests'])]
+        yield 'handlers_active', GAUGE, 'Commands being handled.', [({}, dispatch['active'])]
+        yield 'handlers_waiting', GAUGE, 'Mailboxes waiting for a concurrency slot.', [({}, dispatch['waiting'])]
+        yield 'mailbox_queued', GAUGE, 'Commands queued in session mailboxes.', [({}, dispatch['queued'])]
+        ticks = self.ctx.ticks
+        if ticks.rate:
+            yield 'ticks_total', COUNTER, 'State ticks run.', [({}, ticks.tick)]
+            yield 'tick_overruns_total', COUNTER, 'Ticks that ran into the next one.', [({}, ticks.overruns)]
+            yield 'tick_overrun_seconds_total', COUNTER, 'Time ticks ran past their slot.', [({}, ticks.overrun_time)]
+            yield 'tick_skipped_total', COUNTER, 'Ticks skipped after an overrun.', [({}, ticks.skipped)]
+            yield 'tick_duration_seconds', HISTOGRAM, 'Time spent building and queueing a tick.', [({}, ticks.duration)]
+            yield 'tick_frame_bytes', HISTOGRAM, 'Size of the frame a client is sent per tick.', [({}, ticks.frame_bytes)]
+        replication = stats['replication']
+        yield 'replication_bytes_total', COUNTER, 'Replicated state bytes queued for clients.', [
+            ({'kind': kind}, count) for kind, count in sorted(replication['bytes'].items())]
+        yield 'replication_resyncs_total', COUNTER, 'Full snapshots sent to sessions out of sync.', [
+            ({}, replication['resyncs'])]
+        yield 'replication_keyframes_total', COUNTER, 'Keyframes sent to delta clients.', [({}, replication['keyframes'])]
+        yield 'replication_build_seconds_total', COUNTER, 'Time spent diffing and encoding replicated state.', [
+            ({}, replication['build_time'])]
+        compression = sorted(stats['ws_compression'].items())
+        yield 'ws_shared_deflate_total', COUNTER, 'Shared WebSocket messages compressed or reused.', [
+            ({'protocol': protocol, 'result': result}, counters[result])
+            for protocol, counters in compression for result in ('hits', 'misses', 'skipped')]
+        yield 'ws_shared_deflate_bytes_total', COUNTER, 'Shared WebSocket messages before and after compression.', [
+            ({'protocol': protocol, 'stage': stage}, counters[f'bytes_{stage}'])
+            for protocol, counters in compression for stage in ('in', 'out')]
+        if self.ctx.dispatcher.queue_wait is not None:
+            yield 'mailbox_wait_seconds', HISTOGRAM, 'Time commands waited in mailboxes, sampled.', [
+                ({}, self.ctx.dispatcher.queue_wait)]
+
+    def room_members(self, room):
+        return list(self.ctx.rooms.members(room))
+
+    async def broadcast(self, room, *args, exclude=None, key=None):
+        return await self.ctx.broadcast(room, *args, exclude=exclude, key=key)
+
+    async def broadcast_nearby(self, session, radius, *args, key=None, include_self=False):
+        return self.ctx.broadcast_nearby(session, radius, *args, key=key, include_self=include_self)
\ No newline at end of file
@@ -1,86 +1,79 @@
 from typing import Any
-import logging
-from py_socket_server.core.spacket import SPacket
+from py_socket_server.core.frame_decoder import FrameDecoder, FrameTooLargeError
 from py_socket_server.core.utils import safe_tags_replace
-
-import json
-
-END_MARKER = chr(0)
+from py_socket_server.core.codec import get_codec
+from py_socket_server.protocol.frames import END_MARKER, END_MARKER_BYTES, encode_frame, status_frame, policy_frame
 
 class BaseProtocol:
-    def __init__(self):
-        self.parser_packet = SPacket()
-        self.custom_commands = {}
-
-    async def on_output_callback(self, message: Any) -> None:
-        """Abstract method for handling output callbacks."""
-        raise NotImplementedError("Subclasses should implement this method.")
-
-    async def on_stop_callback(self, closed=False) -> None:
-        """Abstract method for handling stop callbacks."""
-        raise NotImplementedError("Subclasses should implement this method.")
-
-    async def on_connect_callback(self, invoke_message):
-        """Abstract method for handling connect callbacks."""
-        raise NotImplementedError("Subclasses should implement this method.")
-
-    async def on_event_emit_callback(self, event_name, *args):
-        """Abstract method for handling event emit callbacks."""
-        raise NotImplementedError("Subclasses should implement this method.")
-    
-    async def on_policy_callback(self):
-        """Abstract method for handling event emit callbacks."""
-        raise NotImplementedError("Subclasses should implement this method.")
-
-    async def send_ping_request(self):
-        """Abstract method for sending ping requests."""
-        raise NotImplementedError("Subclasses should implement this method.")
+    """
+    Wire protocol of one session.
+    The session binds the callbacks the protocol drives:
+    on_output_callback(message) sends a serialized message,
+    on_frame_callback(frame) sends an already terminated frame,
+    on_stop_callback(closed=False) stops the session,
+    on_connect_callback(invoke_message) handles the connect command,
+    on_command_callback(command, message, args) handles a routed command,
+    on_policy_callback() answers a policy-file request.
+    """
+
+    __slots__ = ('decoder', 'codec', 'custom_commands', 'on_output_callback', 'on_frame_callback',
+                 'on_stop_callback', 'on_connect_callback', 'on_command_callback', 'on_policy_callback')
+
+    def __init__(self, max_frame_size=None, codec=None):
+        self.decoder = FrameDecoder(END_MARKER_BYTES, max_frame_size)
+        self.codec = codec or get_codec()
+        # Created by register_command, most sessions never have custom commands
+        self.custom_commands = None
+
+        self.on_output_callback = None
+        self.on_frame_callback = None
+        self.on_stop_callback = None
+        self.on_connect_callback = None
+        self.on_command_callback = None
+        self.on_policy_callback = None
 
     async def parser_data(self, message) -> Any:
         """Parses incoming data from various formats."""
         if isinstance(message, str):
-            # Преобразуем строку в bytearray
-            data = bytearray(message.encode('utf-8'))
-        elif isinstance(message, bytes):
-            # Преобразуем байты в bytearray
-            data = bytearray(message)
-        elif isinstance(message, bytearray):
-            # Если уже bytearray, оставляем как есть
+            data = message.encode('utf-8')
+        elif isinstance(message, (bytes, bytearray, memoryview)):
+            # The decoder copies into its own buffer, no need for a copy here
             data = message
         elif isinstance(message, list):
-            # Преобразуем список в bytearray
-            data = bytearray(b''.join(bytes(item) for item in message))
+            data = b''.join(bytes(item) for item in message)
         else:
             raise ValueError(f"Unsupported message type")
 
         return await self.socket_read(data)
 
-    async def socket_read(self, data: bytearray) -> Any:
-        """Reads data from the socket and processes it."""
-        self.parser_packet.data += data
-        
-        while END_MARKER.encode() in self.parser_packet.data:
-            null_byte_index = self.parser_packet.data.index(END_MARKER.encode())
-            complete_data = self.parser_packet.data[:null_byte_index]
-            self.parser_packet.data = self.parser_packet.data[null_byte_index + 1:]
-
-            invoke_data = complete_data.decode()
-            if len(invoke_data) < 1:
-                return 'No data received'
-            
-            return await self.socket_invoke_handler(invoke_data)
-
-    async def socket_invoke_handler(self, data: str):
+    async def socket_read(self, data) -> Any:
+        """Reads data from the socket and processes every complete frame."""
+        self.decoder.feed(data)
+        return await self.dispatch_frames()
+
+    async def dispatch_frames(self) -> Any:
+        """Invokes the handler for each buffered frame, stopping at the first error."""
+        try:
+            for frame in self.decoder:
+                if not frame:
+                    return 'No data received'
+
+                err = await self.socket_invoke_handler(frame)
+                if err is not None:
+                    return err
+        except FrameTooLargeError as error:
+            self.decoder.clear()
+            return f'Disconnected - {error}'
+
+    async def socket_invoke_handler(self, data: bytes):
         """Handles invocation of data received."""
         try:
-            invoke_message = json.loads(data)
-        except json.JSONDecodeError as e:
+            invoke_message = self.codec.decode(data)
+        except self.codec.errors as e:
             return 'Disconnected due to message parsing error'
 
-        logging.info(invoke_message)
-
         command = invoke_message[0]
-        if command in self.custom_commands:
+        if self.custom_commands and command in self.custom_commands:
             self.custom_commands[command](invoke_message)
             return
         
@@ -92,8 +85,7 @@ class BaseProtocol:
     async def call(self, *args):
         """Calls a method with arguments serialized as JSON."""
         try:
-            str_args = json.dumps(args)
-            await self.on_output_callback(str_args.encode())
+            await self.on_output_callback(self.codec.encode(args))
         except Exception as error:
             return f'Parse message error: {error}'
 
@@ -107,20 +99,12 @@ class BaseProtocol:
 
     async def send_policy_file(self, port):
         """Sends a policy file."""
-        await self.on_output_callback(f'<cross-domain-policy><allow-access-from domain="*" to-ports="'
-                             f'{port}" /></cross-domain-policy>'.encode())
+        await self.on_frame_callback(policy_frame(port))
         await self.on_stop_callback(True)
 
     async def call_status(self, code, desc, error_code=None):
         """Sends a status response."""
-        status_response = {
-            "code": code,
-            "description": desc,
-        }
-        if error_code is not None:
-            status_response['error_code'] = error_code
-
-        await self.call('onStatus', status_response)
+        await self.on_frame_callback(status_frame(code, desc, error_code))
 
     async def disconnect(self):
         """Disconnects the protocol."""
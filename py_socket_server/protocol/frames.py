@@ -0,0 +1,206 @@
+from py_socket_server.core.codec import get_codec
+
+END_MARKER = chr(0)
+END_MARKER_BYTES = END_MARKER.encode()
+
+# Placeholder for the values a FrameTemplate splices in
+SLOT = '\x01slot\x01'
+
+MAX_CACHED_FRAMES = 1024
+
+def encode_frame(*args) -> bytes:
+    """
+    Serializes a call once into a NUL-terminated frame that can be shared between sessions.
+    Shared frames use the default codec, any codec produces the same JSON for clients.
+    """
+    return get_codec().encode(args) + END_MARKER_BYTES
+
+class SharedFrame(bytes):
+    """
+    A frame queued unchanged for several sessions: broadcasts, room ticks and cached frames.
+    Work done per session on a frame, like binary conversion, is cached for shared frames
+    only. Slicing or joining one gives plain bytes, so frames built for one session are
+    never mistaken for shared ones.
+    """
+
+def shared_frame(*args) -> SharedFrame:
+    """Serializes a call once into a frame sent unchanged to several sessions."""
+    return SharedFrame(encode_frame(*args))
+
+class FrameTemplate:
+    """
+    A call serialized once with SLOT placeholders.
+    render() only encodes the values that fill the slots and joins them with
+    the constant parts, without building and serializing the whole payload.
+    """
+
+    __slots__ = ('parts',)
+
+    def __init__(self, *args):
+        codec = get_codec()
+        self.parts = (codec.encode(args) + END_MARKER_BYTES).split(codec.encode(SLOT))
+
+    def render(self, codec, *values) -> bytes:
+        parts = self.parts
+        chunks = [parts[0]]
+        for i, value in enumerate(values, 1):
+            chunks.append(codec.encode(value))
+            chunks.append(parts[i])
+        return b''.join(chunks)
+
+class FrameCache:
+    """
+    Serialized frames and templates for frequent server-to-client calls.
+    Lookups count hits and misses, frames built on a miss are kept up to
+    max_entries so unusual arguments cannot grow the cache without bound.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_FRAMES):
+        self.max_entries = max_entries
+        self.frames = {}
+        self.templates = {}
+        self.hits = 0
+        self.misses = 0
+
+    def frame(self, key, build) -> bytes:
+        """Returns the frame cached under key, calling build() to serialize it on a miss."""
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.hits += 1
+            return frame
+
+        self.misses += 1
+        frame = build()
+        if len(self.frames) < self.max_entries:
+            frame = self.frames[key] = SharedFrame(frame)
+        return frame
+
+    def template(self, key, build) -> FrameTemplate:
+        """Returns the template cached under key, calling build() to create it on a miss."""
+        template = self.templates.get(key)
+        if template is not None:
+            self.hits += 1
+            return template
+
+        self.misses += 1
+        template = build()
+        if len(self.templates) < self.max_entries:
+            self.templates[key] = template
+        return template
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'frames': len(self.frames),
+            'templates': len(self.templates),
+        }
+
+frame_cache = FrameCache()
+
+class BinaryFrames:
+    """
+    Shared JSON frames converted for binary sessions, one encoded message per call.
+    A broadcast queues the same frame for every recipient, so it is converted
+    for the first binary session and looked up for the others. The lookup
+    hashes the frame once, bytes keep their hash. Frames built for one session
+    are converted without the cache, they would only evict shared ones. The
+    oldest entries are dropped when full.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_FRAMES):
+        self.max_entries = max_entries
+        self.calls = {}
+        self.conversions = 0
+
+    def convert(self, frame: bytes, codec) -> tuple:
+        """Returns the calls of a NUL-terminated JSON frame encoded with a binary codec."""
+        if not isinstance(frame, SharedFrame):
+            self.conversions += 1
+            return self.encode(frame, codec)
+
+        calls = self.calls.get(frame)
+        if calls is not None:
+            return calls
+
+        self.conversions += 1
+        calls = tuple(SharedFrame(call) for call in self.encode(frame, codec))
+        if len(self.calls) >= self.max_entries:
+            del self.calls[next(iter(self.calls))]
+        self.calls[frame] = calls
+        return calls
+
+    def encode(self, frame: bytes, codec) -> tuple:
+        decode = get_codec().decode
+        with memoryview(frame) as view:
+            return tuple(codec.encode(decode(view[start:end])) for start, end in split_frame(frame))
+
+def split_frame(frame: bytes):
+    """Yields (start, end) of every NUL-terminated call in a frame."""
+    start = 0
+    while True:
+        end = frame.find(END_MARKER_BYTES, start)
+        if end < 0:
+            return
+        if end > start:
+            yield start, end
+        start = end + 1
+
+binary_frames = BinaryFrames()
+
+NSF_FRAME = shared_frame('_NSF')
+RCD_FRAME = shared_frame('_RCD')
+
+def status_frame(code, desc, error_code=None) -> bytes:
+    """Returns the onStatus frame for a status code."""
+    def build():
+        status_response = {
+            "code": code,
+            "description": desc,
+        }
+        if error_code is not None:
+            status_response['error_code'] = error_code
+        return encode_frame('onStatus', status_response)
+
+    # Only plain values make a key, other error codes are serialized every time
+    if not isinstance(error_code, (str, int, float, bool, type(None))):
+        return build()
+    return frame_cache.frame(('onStatus', code, desc, error_code), build)
+
+def policy_frame(port) -> bytes:
+    """Returns the cross-domain policy file allowing access to a port."""
+    return frame_cache.frame(('policy', port), lambda: (
+        f'<cross-domain-policy><allow-access-from domain="*" to-ports="'
+        f'{port}" /></cross-domain-policy>'.encode() + END_MARKER_BYTES))
+
+def response_payload(data, callback_uid) -> list:
+    """Returns the _B call answering a command, for binary codecs that encode whole calls."""
+    arr = data if isinstance(data, list) else [data]
+    result = {'callback_uid': callback_uid}
+    for i, value in enumerate(arr):
+        result[str(i)] = value
+    result['length'] = len(arr)
+    return ['_B', result]
+
+def response_frame(codec, data, callback_uid) -> bytes:
+    """Returns the _B frame answering a command, built from a template per number of values."""
+    arr = data if isinstance(data, list) else [data]
+    length = len(arr)
+
+    def build():
+        result = {'callback_uid': SLOT}
+        for i in range(length):
+            result[str(i)] = SLOT
+        result['length'] = length
+        return FrameTemplate('_B', result)
+
+    return frame_cache.template(('_B', length), build).render(codec, callback_uid, *arr)
+
+# Serialized at import, these are sent on every connect, close and keepalive
+for code, desc in (('NetConnection.Connect.Success', 'Connection succeeded.'),
+                   ('NetConnection.Connect.Rejected', 'Connection rejected.'),
+                   ('NetConnection.Connect.Closed', 'Connection closed.')):
+    status_frame(code, desc)
+frame_cache.hits = frame_cache.misses = 0
@@ -1,41 +1,56 @@
-import json
 import defusedxml.cElementTree as Et
-#import logging
-from py_socket_server.protocol.base_protocol import BaseProtocol, END_MARKER
-from py_socket_server.core.spacket import SPacket
+from py_socket_server.protocol.base_protocol import BaseProtocol
+from py_socket_server.protocol.frames import RCD_FRAME, response_frame, response_payload
 
 class RolyPolyProtocol(BaseProtocol):
-    def __init__(self):
-        super().__init__()
-        self.parser_packet = SPacket()
-        self.custom_commands = {}
+    # Command -> (handlers receive the message, name of the responder method handlers receive last)
+    COMMANDS = {
+        '_SOO': (True, None),
+        '__resolve': (True, None),
+        '_P': (True, None),
+        '_LS': (True, 'respond_ls'),
+        '_LG': (True, 'respond_cmd'),
+        '_S': (True, None),
+        '_SS': (True, None),
+        '_SCA': (True, 'respond_cmd'),
+        '_NSF': (False, None),
+        '$': (True, 'respond_cmd'),
+        '_SCD': (True, 'respond_cmd'),
+        '_RCD': (False, 'respond_cmd'),
+        '_SCT': (True, 'respond_cmd'),
+        '_G': (True, 'respond_g'),
+    }
+
+    __slots__ = ('pong', 'text_codec')
+
+    def __init__(self, max_frame_size=None, codec=None):
+        super().__init__(max_frame_size, codec)
         self.pong = None
-
-    async def send_ping_request(self):
-        """Sends a ping request."""
-        if self.pong is None or self.pong is True:
-            self.pong = False
-            await self.call('_NSF')
-        else:
-            await self.disconnect()
+        # Decodes NUL-terminated calls, kept when a WebSocket session switches codec to binary framing
+        self.text_codec = self.codec
 
     async def disconnect(self):
         """Disconnects the protocol."""
-        await self.call("_RCD")
+        await self.on_frame_callback(RCD_FRAME)
         await self.on_stop_callback()
 
     async def respond_cmd(self, data, callback_uid):
         """Responds to a command with data."""
-        arr = data if isinstance(data, list) else [data]
+        try:
+            if self.codec.binary:
+                await self.on_output_callback(self.codec.encode(response_payload(data, callback_uid)))
+            else:
+                await self.on_frame_callback(response_frame(self.codec, data, callback_uid))
+        except Exception as error:
+            return f'Parse message error: {error}'
 
-        result = {'callback_uid': callback_uid}
-        for i, value in enumerate(arr):
-            result[str(i)] = value
-        result['length'] = len(arr)
+    async def respond_ls(self, result):
+        await self.call("_LS", result)
 
-        await self.call("_B", result)
+    async def respond_g(self, result):
+        await self.call("_G", result)
 
-    async def socket_invoke_handler(self, data: str):
+    async def socket_invoke_handler(self, data: bytes):
         """
         Handles invocation of received data.
         Returns status message about the processing result.
@@ -43,7 +58,7 @@ class RolyPolyProtocol(BaseProtocol):
         if not data:
             return 'Disconnected - empty message received'
         
-        if data.startswith('<'):
+        if data.startswith(b'<'):
             try:
                 element_tree = Et.fromstring(data)
 
@@ -56,83 +71,53 @@ class RolyPolyProtocol(BaseProtocol):
                 return 'Disconnected due to XML parsing error'
         else:
             try:
-                invoke_message = json.loads(data)
-            except json.JSONDecodeError as e:
+                invoke_message = self.text_codec.decode(data)
+            except self.text_codec.errors as e:
                 return 'Disconnected due to message parsing error'
 
-        #logging.info(invoke_message)
+        return await self.invoke(invoke_message)
 
+    async def binary_invoke_handler(self, data: bytes):
+        """
+        Handles a binary message, framed by the transport: one call, or a list of calls
+        sent together. Returns status message about the processing result.
+        """
+        try:
+            message = self.codec.decode(data)
+        except self.codec.errors as e:
+            return 'Disconnected due to message parsing error'
+        if not isinstance(message, list) or not message:
+            return 'Disconnected - unexpected binary message'
+
+        if not isinstance(message[0], list):
+            return await self.invoke(message)
+        for invoke_message in message:
+            if not invoke_message:
+                return 'Disconnected - unexpected binary message'
+            err = await self.invoke(invoke_message)
+            if err is not None:
+                return err
+
+    async def invoke(self, invoke_message):
+        """Routes a decoded call."""
         command = invoke_message[0]
-        if command in self.custom_commands:
+        if self.custom_commands and command in self.custom_commands:
             await self.custom_commands[command](self, invoke_message)
             return
 
-        handlers = {
-            'connect': self.on_connect_callback,
-            '_SOO': self.on_SOO,
-            '__resolve': self.on_resolve,
-            '_P': self.on_P,
-            '_LS': self.on_LS,
-            '_LG': self.on_LG,
-            '_S': self.on_S,
-            '_SS': self.on_SS,
-            '_SCA': self.on_SCA,
-            '_NSF': self.on_NSF,
-            '$': self.on_sigil,
-            '_SCD': self.on_SCD,
-            '_RCD': self.on_RCD,
-            '_SCT': self.on_SCT,
-            '_G': self.on_G,
-        }
-
-        handler = handlers.get(command)
-        if handler:
-            await handler(invoke_message)
-        else:
-            return f'Disconnected due to unimplemented cmd {command}'
-
-    async def on_SOO(self, invoke_message):
-        await self.on_event_emit_callback('_SOO', invoke_message)
-
-    async def on_resolve(self, invoke_message):
-        await self.on_event_emit_callback('__resolve', invoke_message)
-
-    async def on_P(self, invoke_message):
-        await self.on_event_emit_callback('_P', invoke_message)
-
-    async def on_LS(self, invoke_message):
-        #logging.info(json.dumps(invoke_message))
-        await self.on_event_emit_callback('_LS', invoke_message, lambda result: self.call("_LS", result))
-
-    async def on_LG(self, invoke_message):
-        #logging.info(json.dumps(invoke_message))
-        await self.on_event_emit_callback('_LG', invoke_message, self.respond_cmd)
-
-    async def on_S(self, invoke_message):
-        await self.on_event_emit_callback('_S', invoke_message)
-
-    async def on_SS(self, invoke_message):
-        await self.on_event_emit_callback('_SS', invoke_message)
-
-    async def on_SCA(self, invoke_message):
-        await self.on_event_emit_callback('_SCA', invoke_message, self.respond_cmd)
-
-    async def on_NSF(self, invoke_message):
-        await self.on_event_emit_callback('_NSF')
-
-    async def on_sigil(self, invoke_message):
-        #logging.info(json.dumps(invoke_message))
-        await self.on_event_emit_callback('$', invoke_message, self.respond_cmd)
-
-    async def on_SCD(self, invoke_message):
-        await self.on_event_emit_callback('_SCD', invoke_message, self.respond_cmd)
+        if command == 'connect':
+            await self.on_connect_callback(invoke_message)
+            return
 
-    async def on_RCD(self, invoke_message):
-        await self.on_event_emit_callback('_RCD', self.respond_cmd)
+        route = self.COMMANDS.get(command)
+        if route is None:
+            return f'Disconnected due to unimplemented cmd {command}'
 
-    async def on_SCT(self, invoke_message):
-        await self.on_event_emit_callback('_SCT', invoke_message, self.respond_cmd)
+        with_message, responder = route
+        if command == '_NSF':
+            self.pong = True
 
-    async def on_G(self, invoke_message):
-        #logging.info(json.dumps(invoke_message))
-        await self.on_event_emit_callback('_G', invoke_message, lambda result: self.call("_G", result))
\ No newline at end of file
+        args = (invoke_message,) if with_message else ()
+        if responder is not None:
+            args += (getattr(self, responder),)
+        await self.on_command_callback(command, invoke_message, args)
@@ -0,0 +1,247 @@
+import asyncio
+import hmac
+import math
+import time
+from py_socket_server.core.context import Context
+from py_socket_server.core.session_index import PAGE_SIZE, MAX_PAGE_SIZE
+from py_socket_server.server.http_util import HttpError, read_request, http_response, json_response, MAX_HEAD_SIZE
+from py_socket_server.server.metrics_server import CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+LOCAL_BINDS = ('127.0.0.1', '::1', 'localhost')
+# Routes addressed to one session, /sessions/<id>[/<name>]
+SESSION_ROUTES = ('session', 'kick', 'call')
+
+class PyHttpServer:
+    """
+    HTTP control API of one server process, enabled by http.port:
+
+        GET  /sessions?cursor=&limit=&protocol=&ip=&connected_after=&connected_before=
+        GET  /sessions/<id>
+        POST /sessions/<id>/kick
+        POST /sessions/<id>/call        {"args": [...]}
+        POST /broadcast                 {"room": "...", "args": [...], "exclude": [...]}
+        GET  /stats
+        GET  /metrics
+
+    Session listings page through ctx.session_index with cursors, so a request
+    only touches the sessions it returns. Times are Unix timestamps. Kick, call
+    and broadcast also reach sessions of other workers, listings are local.
+    With http.token set, requests need an "Authorization: Bearer <token>" header.
+    Workers listen on http.port plus their worker id.
+    """
+
+    def __init__(self, ctx: Context, server, worker_id=None):
+        self.ctx = ctx
+        self.server = server
+        self.server_instance = None
+
+        config = ctx.config.get('http') or {}
+        self.bind = config.get('bind') or '127.0.0.1'
+        self.port = config.get('port')
+        if self.port and worker_id is not None:
+            self.port += worker_id
+        self.token = config.get('token') or ''
+
+        self.routes = {
+            ('GET', 'sessions'): self.list_sessions,
+            ('GET', 'session'): self.get_session,
+            ('POST', 'kick'): self.kick,
+            ('POST', 'call'): self.call,
+            ('POST', 'broadcast'): self.broadcast,
+            ('GET', 'stats'): self.stats,
+            ('GET', 'metrics'): self.metrics,
+        }
+
+    @property
+    def enabled(self):
+        return bool(self.port)
+
+    def route(self, method, path):
+        """Returns the handler and session id for a request path."""
+        parts = [part for part in path.split('/') if part]
+        if len(parts) == 1 and parts[0] not in SESSION_ROUTES:
+            name, session_id = parts[0], None
+        elif len(parts) == 2 and parts[0] == 'sessions':
+            name, session_id = 'session', parts[1]
+        elif len(parts) == 3 and parts[0] == 'sessions' and parts[2] in SESSION_ROUTES:
+            name, session_id = parts[2], parts[1]
+        else:
+            raise HttpError(404)
+
+        handler = self.routes.get((method, name))
+        if handler is None:
+            if any(route_name == name for _, route_name in self.routes):
+                raise HttpError(405)
+            raise HttpError(404)
+        return handler, session_id
+
+    def authorized(self, request) -> bool:
+        if not self.token:
+            return True
+        return hmac.compare_digest(request.headers.get('authorization', ''), f"Bearer {self.token}")
+
+    async def handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request = await read_request(reader)
+                if not self.authorized(request):
+                    raise HttpError(401)
+                handler, session_id = self.route(request.method, request.path)
+                response = await handler(request, session_id)
+            except HttpError as e:
+                response = json_response(e.status, {'error': str(e)})
+            except Exception as e:
+                self.ctx.logger.error("HTTP API request failed, %s: %s", e.__class__.__name__, e)
+                response = json_response(500, {'error': str(e)})
+            writer.write(response)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def describe(self, session, now, wall) -> dict:
+        connect_time = session.connect_time
+        return {
+            'id': session.id,
+            'protocol': session.protocol,
+            'ip': session.ip,
+            'connect_time': wall - (now - connect_time) if connect_time is not None else None,
+            'rooms': list(session.rooms or ()),
+            'queue_depth': session.queue_depth,
+        }
+
+    def matcher(self, query):
+        """Builds the filter of a session listing, None when nothing is filtered."""
+        checks = []
+        protocol = query.get('protocol')
+        if protocol:
+            checks.append(lambda session: session.protocol == protocol)
+        ip = query.get('ip')
+        if ip:
+            checks.append(lambda session: session.ip == ip)
+
+        # Connect times are loop times, move the bounds onto the loop clock once
+        offset = asyncio.get_running_loop().time() - time.time()
+        for name, after in (('connected_after', True), ('connected_before', False)):
+            if query.get(name):
+                bound = number(query, name) + offset
+                if after:
+                    checks.append(lambda session, bound=bound:
+                                  session.connect_time is not None and session.connect_time >= bound)
+                else:
+                    checks.append(lambda session, bound=bound:
+                                  session.connect_time is not None and session.connect_time < bound)
+
+        if not checks:
+            return None
+        return lambda session: all(check(session) for check in checks)
+
+    async def list_sessions(self, request, _):
+        index = self.ctx.session_index
+        cursor = max(int(number(request.query, 'cursor', 0)), 0)
+        limit = int(number(request.query, 'limit', PAGE_SIZE))
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise HttpError(400, f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+        sessions, next_cursor = index.page(cursor, limit, self.matcher(request.query))
+        now, wall = asyncio.get_running_loop().time(), time.time()
+        return json_response(200, {
+            'sessions': [self.describe(session, now, wall) for session in sessions],
+            'next_cursor': next_cursor,
+            'total': len(index),
+        })
+
+    async def get_session(self, request, session_id):
+        session = self.ctx.sessions.get(session_id)
+        if session is not None:
+            return json_response(200, self.describe(session, asyncio.get_running_loop().time(), time.time()))
+
+        remote = self.server.get_session(session_id)
+        if remote is None:
+            raise HttpError(404, f"Unknown session {session_id}")
+        return json_response(200, {'id': session_id, 'node': remote.node_id})
+
+    def find(self, session_id):
+        session = self.server.get_session(session_id)
+        if session is None:
+            raise HttpError(404, f"Unknown session {session_id}")
+        return session
+
+    async def kick(self, request, session_id):
+        session = self.find(session_id)
+        self.ctx.logger.info("[http kick] id=%s", session_id)
+        # Closing can wait for a slow client to drain, answer right away
+        asyncio.ensure_future(session.disconnect())
+        return json_response(200, {'kicked': session_id})
+
+    async def call(self, request, session_id):
+        args = arguments(request.json())
+        await self.find(session_id).call(*args)
+        return json_response(200, {'called': session_id})
+
+    async def broadcast(self, request, _):
+        body = request.json()
+        room = body.get('room')
+        if not isinstance(room, str) or not room:
+            raise HttpError(400, 'room is required')
+        sent = await self.server.broadcast(room, *arguments(body), exclude=excluded(body))
+        return json_response(200, {'sent': sent})
+
+    async def stats(self, request, _):
+        return json_response(200, self.server.stats())
+
+    async def metrics(self, request, _):
+        if not self.ctx.metrics.enabled:
+            raise HttpError(404, 'Metrics are disabled')
+        return http_response(200, self.server.metrics().encode(), METRICS_CONTENT_TYPE)
+
+    async def run(self):
+        if not self.enabled:
+            return
+
+        if not self.token and self.bind not in LOCAL_BINDS:
+            self.ctx.logger.warning("HTTP API on %s:%s has no token, anyone reaching it can kick sessions", self.bind, self.port)
+
+        server = await asyncio.start_server(self.handle_request, self.bind, self.port, limit=MAX_HEAD_SIZE)
+        self.server_instance = server
+        self.ctx.logger.info("HTTP API listening on %s:%s", self.bind, self.port)
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            self.ctx.logger.info("HTTP API has been cancelled.")
+        except Exception as e:
+            self.ctx.logger.error("HTTP API unexpected error: %s", e)
+
+    async def stop(self):
+        if self.server_instance:
+            self.server_instance.close()
+            await self.server_instance.wait_closed()
+            self.server_instance = None
+
+def number(query, name, default=None) -> float:
+    value = query.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        value = float(value)
+    except ValueError:
+        raise HttpError(400, f"{name} must be a number")
+    if not math.isfinite(value):
+        raise HttpError(400, f"{name} must be a finite number")
+    return value
+
+def arguments(body) -> list:
+    args = body.get('args')
+    if not isinstance(args, list) or not args:
+        raise HttpError(400, 'args must be a non-empty list')
+    return args
+
+def excluded(body):
+    exclude = body.get('exclude')
+    if exclude is None or isinstance(exclude, str):
+        return exclude
+    if not isinstance(exclude, list) or not all(isinstance(item, str) for item in exclude):
+        raise HttpError(400, 'exclude must be a session id or a list of session ids')
+    return exclude
@@ -0,0 +1,80 @@
+import asyncio
+import json
+from urllib.parse import parse_qsl, unquote
+
+MAX_HEAD_SIZE = 8192
+MAX_BODY_SIZE = 65536
+REQUEST_TIMEOUT = 5
+
+STATUS = {
+    200: 'OK',
+    400: 'Bad Request',
+    401: 'Unauthorized',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+class HttpError(Exception):
+    def __init__(self, status, message=''):
+        super().__init__(message or STATUS.get(status, ''))
+        self.status = status
+
+class HttpRequest:
+    """A parsed request, header names are lowercase."""
+
+    __slots__ = ('method', 'path', 'query', 'headers', 'body')
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            body = json.loads(self.body)
+        except ValueError:
+            raise HttpError(400, 'Body is not valid JSON')
+        if not isinstance(body, dict):
+            raise HttpError(400, 'Body must be a JSON object')
+        return body
+
+async def read_request(reader: asyncio.StreamReader, max_body=MAX_BODY_SIZE) -> HttpRequest:
+    """Reads one HTTP/1.1 request, the reader limit bounds the head size."""
+    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), REQUEST_TIMEOUT)
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise HttpError(400)
+
+    headers = {}
+    for line in lines[1:]:
+        name, separator, value = line.partition(':')
+        if separator:
+            headers[name.strip().lower()] = value.strip()
+
+    body = b''
+    length = headers.get('content-length')
+    if length:
+        if not length.isdigit():
+            raise HttpError(400)
+        if int(length) > max_body:
+            raise HttpError(413)
+        body = await asyncio.wait_for(reader.readexactly(int(length)), REQUEST_TIMEOUT)
+
+    path, _, query = target.partition('?')
+    return HttpRequest(method, unquote(path), dict(parse_qsl(query)), headers, body)
+
+def http_response(status, body: bytes, content_type='text/plain; charset=utf-8') -> bytes:
+    head = (f"HTTP/1.1 {status} {STATUS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+    return head.encode() + body
+
+def json_response(status, data) -> bytes:
+    return http_response(status, json.dumps(data).encode(), 'application/json')
@@ -0,0 +1,69 @@
+import asyncio
+from py_socket_server.core.context import Context
+from py_socket_server.server.http_util import HttpError, read_request, http_response, MAX_HEAD_SIZE
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class PyMetricsServer:
+    """
+    Minimal HTTP listener serving GET /metrics in the Prometheus text format,
+    enabled by metrics.enabled and metrics.port. Meant for a scraper on a
+    private interface, every request is answered and closed. Workers listen
+    on metrics.port plus their worker id, each one exports its own metrics.
+    """
+
+    def __init__(self, ctx: Context, render, worker_id=None):
+        self.ctx = ctx
+        self.render = render
+        self.server_instance = None
+
+        config = ctx.config.get('metrics') or {}
+        self.bind = config.get('bind') or '127.0.0.1'
+        self.port = config.get('port')
+        if self.port and worker_id is not None:
+            self.port += worker_id
+        self.path = config.get('path') or '/metrics'
+
+    @property
+    def enabled(self):
+        return self.ctx.metrics.enabled and bool(self.port)
+
+    async def handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await read_request(reader, 0)
+            if request.method != 'GET':
+                writer.write(http_response(405, b''))
+            elif request.path != self.path:
+                writer.write(http_response(404, b''))
+            else:
+                writer.write(http_response(200, self.render().encode(), CONTENT_TYPE))
+            await writer.drain()
+        except HttpError as e:
+            writer.write(http_response(e.status, b''))
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except Exception as e:
+            self.ctx.logger.error("Metrics request failed: %s", e)
+        finally:
+            writer.close()
+
+    async def run(self):
+        if not self.enabled:
+            return
+
+        server = await asyncio.start_server(self.handle_request, self.bind, self.port, limit=MAX_HEAD_SIZE)
+        self.server_instance = server
+        self.ctx.logger.info("Metrics Server listening on %s:%s%s", self.bind, self.port, self.path)
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            self.ctx.logger.info("Metrics server has been cancelled.")
+        except Exception as e:
+            self.ctx.logger.error("Metrics Server unexpected error: %s", e)
+
+    async def stop(self):
+        if self.server_instance:
+            self.server_instance.close()
+            await self.server_instance.wait_closed()
+            self.server_instance = None
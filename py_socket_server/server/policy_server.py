@@ -0,0 +1,91 @@
+import asyncio
+from py_socket_server.core.context import Context
+from py_socket_server.protocol.frames import policy_frame
+
+POLICY_REQUEST = b'<policy-file-request/>\x00'
+
+# sniff_policy_request results
+POLICY = 'policy'
+PARTIAL = 'partial'
+OTHER = 'other'
+
+def sniff_policy_request(data: bytes) -> str:
+    """Tells whether the first bytes of a connection are exactly a Flash policy-file request."""
+    if data == POLICY_REQUEST:
+        return POLICY
+    if len(data) < len(POLICY_REQUEST) and POLICY_REQUEST.startswith(data):
+        return PARTIAL
+    return OTHER
+
+class PolicyProtocol(asyncio.Protocol):
+    """Answers one policy-file request and closes, anything else is dropped."""
+
+    def __init__(self, server: 'PyPolicyServer'):
+        self.server = server
+        self.transport = None
+        self.data = b''
+        self.timer = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.timer = self.server.ctx.timers.schedule(self.server.timeout, transport.abort)
+
+    def data_received(self, data):
+        self.data += data
+        match = sniff_policy_request(self.data)
+        if match is PARTIAL:
+            return
+
+        if match is POLICY:
+            self.server.requests += 1
+            self.transport.write(policy_frame(self.server.policy_port))
+        self.transport.close()
+
+    def connection_lost(self, exc):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+class PyPolicyServer:
+    """
+    Optional dedicated listener (port 843 for Flash) serving the socket policy file
+    that allows the XMLSocket port, enabled by xmls.policy_port.
+    """
+
+    def __init__(self, ctx: Context):
+        self.ctx = ctx
+        self.server_instance = None
+        self.requests = 0
+
+        config = ctx.config.get('xmls') or {}
+        self.bind = config.get('bind')
+        self.port = config.get('policy_port')
+        self.policy_port = config.get('port')
+        self.timeout = config.get('connect_timeout') or 30
+
+    @property
+    def enabled(self):
+        return bool(self.port)
+
+    async def run(self):
+        if not self.enabled:
+            return
+
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: PolicyProtocol(self), self.bind, self.port,
+                                          reuse_port=self.ctx.reuse_port or None)
+        self.server_instance = server
+        self.ctx.logger.info("Policy Server listening on %s:%s", self.bind, self.port)
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            self.ctx.logger.info("Policy server has been cancelled.")
+        except Exception as e:
+            self.ctx.logger.error("Policy Server unexpected error: %s", e)
+
+    async def stop(self):
+        if self.server_instance:
+            self.server_instance.close()
+            await self.server_instance.wait_closed()
+            self.server_instance = None
@@ -0,0 +1,145 @@
+import zlib
+from websockets.frames import Frame, CTRL_OPCODES
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+
+# LZ77 window of the server's compressor, 2 ** bits bytes, 9 to 15
+WINDOW_BITS = 12
+# zlib memory level of the compressor, 1 to 9
+MEM_LEVEL = 5
+# Messages shorter than this are sent uncompressed
+MIN_SIZE = 256
+
+MAX_SHARED_FRAMES = 1024
+
+# Sync flush trailer, removed from compressed messages as permessage-deflate requires
+EMPTY_BLOCK = b'\x00\x00\xff\xff'
+
+class Deflated(bytes):
+    """A message payload already compressed for permessage-deflate, sent as is with RSV1 set."""
+
+class SharedDeflate:
+    """
+    Messages compressed once and reused for every connection that negotiated the same window.
+    Without context takeover every message is compressed on its own, so the bytes
+    compressed for one connection decode on any other with a window as large.
+    A broadcast queues the same frame object for every recipient, it is
+    compressed for the first one and looked up for the others. Sessions only
+    pass shared frames, messages built for one client would evict broadcasts.
+    The oldest entries are dropped when full, recipients send a broadcast
+    close together.
+    """
+
+    def __init__(self, compress_settings=None, max_entries=MAX_SHARED_FRAMES):
+        self.compress_settings = compress_settings or {}
+        self.max_entries = max_entries
+        # window bits -> {frame -> compressed}
+        self.frames = {}
+
+        self.hits = 0
+        self.misses = 0
+        # Messages under the size threshold, sent uncompressed
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def compress(self, data: bytes, window_bits) -> Deflated:
+        frames = self.frames.get(window_bits)
+        if frames is None:
+            frames = self.frames[window_bits] = {}
+        compressed = frames.get(data)
+        if compressed is not None:
+            self.hits += 1
+            return compressed
+
+        self.misses += 1
+        compressed = Deflated(deflate(data, window_bits, self.compress_settings))
+        if len(frames) >= self.max_entries:
+            del frames[next(iter(frames))]
+        frames[data] = compressed
+        self.bytes_in += len(data)
+        self.bytes_out += len(compressed)
+        return compressed
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'skipped': self.skipped,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+        }
+
+class ThresholdDeflate(PerMessageDeflate):
+    """
+    permessage-deflate leaving messages under min_size uncompressed, which the extension allows,
+    and passing Deflated payloads through. Other messages are compressed per connection.
+    """
+
+    def __init__(self, extension: PerMessageDeflate, shared: SharedDeflate, min_size=MIN_SIZE):
+        super().__init__(extension.remote_no_context_takeover, extension.local_no_context_takeover,
+                         extension.remote_max_window_bits, extension.local_max_window_bits,
+                         extension.compress_settings)
+        self.shared = shared
+        self.min_size = min_size
+
+    @property
+    def can_share(self) -> bool:
+        return self.local_no_context_takeover
+
+    def compress_shared(self, data: bytes) -> bytes:
+        """Returns data compressed once for every connection with this window, short data unchanged."""
+        if len(data) < self.min_size:
+            return data
+        return self.shared.compress(data, self.local_max_window_bits)
+
+    def encode(self, frame: Frame) -> Frame:
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+        if isinstance(frame.data, Deflated):
+            return Frame(frame.opcode, frame.data, frame.fin, True, frame.rsv2, frame.rsv3)
+        if len(frame.data) < self.min_size:
+            self.shared.skipped += 1
+            return frame
+        return super().encode(frame)
+
+class CompressionFactory(ServerPerMessageDeflateFactory):
+    """Negotiates permessage-deflate with the settings of a listener, see compression_from_config()."""
+
+    def __init__(self, window_bits=WINDOW_BITS, mem_level=MEM_LEVEL, min_size=MIN_SIZE, shared=True):
+        compress_settings = {'memLevel': mem_level}
+        super().__init__(server_no_context_takeover=shared, server_max_window_bits=window_bits,
+                         client_max_window_bits=window_bits, compress_settings=compress_settings)
+        self.min_size = min_size
+        self.deflate = SharedDeflate(compress_settings)
+
+    def process_request_params(self, params, accepted_extensions):
+        response, extension = super().process_request_params(params, accepted_extensions)
+        return response, ThresholdDeflate(extension, self.deflate, self.min_size)
+
+def deflate(data: bytes, window_bits, compress_settings) -> bytes:
+    """Compresses a whole message the way permessage-deflate does without context takeover."""
+    compressor = zlib.compressobj(wbits=-window_bits, **compress_settings)
+    data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    return data[:-4] if data.endswith(EMPTY_BLOCK) else data
+
+def negotiated_deflate(websocket) -> ThresholdDeflate | None:
+    """Returns the compression extension of a connection when its messages can be shared."""
+    for extension in websocket.protocol.extensions:
+        if isinstance(extension, ThresholdDeflate) and extension.can_share:
+            return extension
+    return None
+
+def compression_from_config(config) -> CompressionFactory | None:
+    """
+    Builds the permessage-deflate negotiation of a listener from its compression config section,
+    None when compression is disabled. With shared, the default, the server compresses
+    without context takeover so broadcast frames are compressed once for all recipients,
+    at some cost in ratio for messages that repeat earlier ones.
+    """
+    config = config or {}
+    if not config.get('enabled', True):
+        return None
+    return CompressionFactory(config.get('window_bits') or WINDOW_BITS, config.get('mem_level') or MEM_LEVEL,
+                              config.get('min_size', MIN_SIZE), config.get('shared', True))
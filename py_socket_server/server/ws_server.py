@@ -1,30 +1,41 @@
-import asyncio
 import ssl
+from functools import partial
 import websockets
 from py_socket_server.core.context import Context
-from py_socket_server.session.ws_session import WsSession
+from py_socket_server.core.codec import get_codec, text_codec
+from py_socket_server.session.ws_session import WsSession, BINARY_SUBPROTOCOL, BINARY_ENCODING
+from py_socket_server.server.ws_compression import compression_from_config
 
 class PyWsServer:
     def __init__(self, ctx: Context):
         self.ctx = ctx
         self.ws_server_instance = None
         self.wss_server_instance = None
+        # protocol -> permessage-deflate negotiation of the listener
+        self.compression = {}
 
         # HTTP WebSocket (ws) Server
         self.ws_server = None
         if ctx.config.get('ws') and ctx.config['ws'].get('port'):
+            # Text messages carry NUL-terminated calls, binary sessions are negotiated separately
+            text_codec(ctx.config['ws'].get('codec'))
             try:
                 self.ws_server = websockets.serve(
-                    self.handle_connection,
+                    partial(self.handle_connection, protocol='ws'),
                     ctx.config['ws'].get('bind'),
-                    ctx.config['ws'].get('port')
+                    ctx.config['ws'].get('port'),
+                    select_subprotocol=self.subprotocol_selector(ctx.config['ws']),
+                    compression=None,
+                    extensions=self.extensions('ws'),
+                    reuse_port=ctx.reuse_port or None
                 )
             except Exception as e:
-                self.ctx.logger.error(f'Caught Exception: {e}')
+                self.ctx.logger.error('Caught Exception: %s', e)
 
         # HTTPS WebSocket (wss) Server
         self.wss_server = None
         if ctx.config.get('wss') and ctx.config['wss'].get('port'):
+            text_codec(ctx.config['wss'].get('codec'))
             server_ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
             server_ssl_context.load_cert_chain(
                 ctx.config['wss'].get('cert'),
@@ -33,29 +44,61 @@ class PyWsServer:
 
             try:
                 self.wss_server = websockets.serve(
-                    self.handle_connection,
+                    partial(self.handle_connection, protocol='wss'),
                     ctx.config['wss'].get('bind'),
                     ctx.config['wss'].get('port'),
-                    ssl=server_ssl_context
+                    ssl=server_ssl_context,
+                    select_subprotocol=self.subprotocol_selector(ctx.config['wss']),
+                    compression=None,
+                    extensions=self.extensions('wss'),
+                    reuse_port=ctx.reuse_port or None
                 )
             except Exception as e:
-                self.ctx.logger.error(f'Caught Exception: {e}')
+                self.ctx.logger.error('Caught Exception: %s', e)
+
+    def subprotocol_selector(self, config):
+        """
+        Returns the subprotocol selection of a listener. BINARY_SUBPROTOCOL is picked when
+        offered and binary framing is enabled, any other offer continues without a subprotocol.
+        """
+        if not config.get('binary', True):
+            return select_none
+        try:
+            get_codec(BINARY_ENCODING)
+        except ImportError:
+            self.ctx.logger.info("Binary WebSocket framing needs msgspec or msgpack, clients get JSON")
+            return select_none
+        return select_binary
+
+    def extensions(self, protocol):
+        """Returns the extensions of a listener, permessage-deflate unless its compression is disabled."""
+        factory = compression_from_config(self.ctx.config[protocol].get('compression'))
+        if factory is None:
+            return None
+        self.compression[protocol] = factory
+        return [factory]
+
+    def stats(self) -> dict:
+        """Returns the shared compression counters of every listener with compression."""
+        return {protocol: factory.deflate.stats() for protocol, factory in self.compression.items()}
 
     async def run(self):
         if self.ws_server:
             self.ws_server_instance = await self.ws_server
-            self.ctx.logger.info(f"WebSocket Server listening on {self.ctx.config['ws']['bind']}:{self.ctx.config['ws']['port']}")
+            self.ctx.logger.info("WebSocket Server listening on %s:%s", self.ctx.config['ws']['bind'], self.ctx.config['ws']['port'])
 
         if self.wss_server:
             self.wss_server_instance = await self.wss_server
-            self.ctx.logger.info(f"Secure WebSocket Server listening on {self.ctx.config['wss']['bind']}:{self.ctx.config['wss']['port']}")
+            self.ctx.logger.info("Secure WebSocket Server listening on %s:%s", self.ctx.config['wss']['bind'], self.ctx.config['wss']['port'])
 
-    async def handle_connection(self, websocket: websockets.ServerConnection):
+    async def handle_connection(self, websocket: websockets.ServerConnection, protocol='ws'):
         """
         Handles a new WebSocket connection.
         Wraps the session logic in a try-except block to handle exceptions gracefully.
         """
-        session = WsSession(self.ctx, websocket)
+        session = WsSession(self.ctx, websocket, protocol)
+        if websocket.subprotocol == BINARY_SUBPROTOCOL:
+            session.use_binary()
         await session.run()
 
     async def stop(self):
@@ -78,4 +121,9 @@ class PyWsServer:
                 try:
                     await session.stop()
                 except Exception as e:
-                    self.ctx.logger.error(f"Error stopping WS session: {e}")
\ No newline at end of file
+                    self.ctx.logger.error("Error stopping WS session: %s", e)
+def select_binary(connection, subprotocols):
+    return BINARY_SUBPROTOCOL if BINARY_SUBPROTOCOL in subprotocols else None
+
+def select_none(connection, subprotocols):
+    return None
@@ -0,0 +1,196 @@
+import asyncio
+from py_socket_server.core.context import Context
+from py_socket_server.session.xmls_session import XmlsSession
+from py_socket_server.server.policy_server import sniff_policy_request, POLICY, PARTIAL
+
+class TransportWriter:
+    """StreamWriter-compatible facade over a raw transport with flow control."""
+
+    __slots__ = ('transport', '_paused', '_drain_waiter', '_lost', '_closed')
+
+    def __init__(self, transport: asyncio.Transport):
+        self.transport = transport
+        self._paused = False
+        self._drain_waiter = None
+        self._lost = False
+        # Only created when someone waits for the connection to close
+        self._closed = None
+
+    def get_extra_info(self, name, default=None):
+        return self.transport.get_extra_info(name, default)
+
+    def write(self, data):
+        self.transport.write(data)
+
+    def writelines(self, data):
+        self.transport.writelines(data)
+
+    def is_closing(self):
+        return self.transport.is_closing()
+
+    def close(self):
+        self.transport.close()
+
+    async def wait_closed(self):
+        if self._lost:
+            return
+        if self._closed is None:
+            self._closed = asyncio.get_running_loop().create_future()
+        await asyncio.shield(self._closed)
+
+    async def drain(self):
+        if self.transport.is_closing():
+            # Let the loop run so connection_lost() gets delivered, like StreamWriter does
+            await asyncio.sleep(0)
+            if self._lost:
+                raise ConnectionResetError('Connection lost')
+
+        if not self._paused:
+            return
+
+        self._drain_waiter = asyncio.get_running_loop().create_future()
+        await self._drain_waiter
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        self._wake_drain()
+
+    def connection_lost(self, exc):
+        self._lost = True
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+        self._wake_drain(exc or ConnectionResetError('Connection lost'))
+
+    def _wake_drain(self, exc=None):
+        waiter, self._drain_waiter = self._drain_waiter, None
+        if waiter is None or waiter.done():
+            return
+        if exc is None:
+            waiter.set_result(None)
+        else:
+            waiter.set_exception(exc)
+
+class XmlsBufferedProtocol(asyncio.BufferedProtocol):
+    """
+    XMLSocket transport that receives straight into a preallocated buffer.
+    Received bytes go to the session frame decoder and are dispatched by a
+    single consumer task, so a burst costs one wakeup instead of one per read.
+    The session is only created once the first bytes are not a policy-file
+    request, which is answered by the server directly.
+    """
+
+    __slots__ = ('ctx', 'server', 'session', 'sniffed', 'sniff_timer', 'writer', 'read_buffer',
+                 'paused_reading', 'lost', 'error', 'data_ready', 'waiter', 'task')
+
+    def __init__(self, ctx: Context, server):
+        self.ctx = ctx
+        self.server = server
+        self.session = None
+        self.sniffed = b''
+        self.sniff_timer = None
+        self.writer = None
+        self.read_buffer = None
+        self.paused_reading = False
+        self.lost = False
+        self.error = None
+        # Set when there is something for the consumer, which waits on a future created on demand
+        self.data_ready = False
+        self.waiter = None
+        self.task = None
+
+    def connection_made(self, transport):
+        self.writer = TransportWriter(transport)
+        self.read_buffer = self.server.read_buffer()
+        self.sniff_timer = self.ctx.timers.schedule(self.server.connect_timeout, self.server.on_sniff_timeout, transport)
+
+    def get_buffer(self, sizehint):
+        return self.read_buffer
+
+    def start_session(self, data):
+        self.sniff_timer.cancel()
+        self.session = XmlsSession(self.ctx, None, self.writer)
+        if self.session.metrics is not None:
+            self.session.metrics.bytes_in += len(data)
+        self.session.bp.decoder.feed(data)
+        self.wake()
+        self.task = asyncio.get_running_loop().create_task(self.consume())
+
+    def buffer_updated(self, nbytes):
+        if self.session is None:
+            self.sniffed += self.read_buffer[:nbytes]
+            match = sniff_policy_request(self.sniffed)
+            if match is POLICY:
+                self.sniff_timer.cancel()
+                self.server.serve_policy(self.writer.transport)
+            elif match is not PARTIAL:
+                data, self.sniffed = self.sniffed, None
+                self.start_session(data)
+            return
+
+        if self.session.metrics is not None:
+            self.session.metrics.bytes_in += nbytes
+        decoder = self.session.bp.decoder
+        decoder.feed(self.read_buffer[:nbytes])
+        self.wake()
+
+        # Stop reading while the consumer is behind, resuming once it catches up
+        if not self.paused_reading and len(decoder) >= 4 * self.session.read_buffer_size:
+            self.paused_reading = True
+            self.writer.transport.pause_reading()
+
+    def eof_received(self):
+        self.lost = True
+        self.wake()
+        return False
+
+    def connection_lost(self, exc):
+        if self.session is None:
+            self.sniff_timer.cancel()
+        self.lost = True
+        self.error = exc
+        self.wake()
+        if self.writer is not None:
+            self.writer.connection_lost(exc)
+
+    def wake(self):
+        self.data_ready = True
+        waiter, self.waiter = self.waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def pause_writing(self):
+        self.writer.pause_writing()
+
+    def resume_writing(self):
+        self.writer.resume_writing()
+
+    async def consume(self):
+        session = self.session
+        session.bind_protocol()
+
+        while session.writer is not None:
+            if not self.data_ready:
+                self.waiter = asyncio.get_running_loop().create_future()
+                await self.waiter
+            self.data_ready = False
+
+            try:
+                if len(session.bp.decoder):
+                    await session.on_frames()
+            except Exception as e:
+                await session.on_error(e)
+                break
+
+            if self.paused_reading and session.writer is not None:
+                self.paused_reading = False
+                self.writer.transport.resume_reading()
+
+            if self.lost:
+                if self.error is not None:
+                    await session.stop(True)
+                break
+
+        await session.on_close()
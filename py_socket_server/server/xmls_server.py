@@ -1,32 +1,72 @@
 import asyncio
 from py_socket_server.core.context import Context
-from py_socket_server.session.xmls_session import XmlsSession
+from py_socket_server.core.codec import text_codec
+from py_socket_server.session.xmls_session import XmlsSession, READ_BUFFER_SIZE
+from py_socket_server.server.xmls_protocol import XmlsBufferedProtocol
+from py_socket_server.server.policy_server import sniff_policy_request, POLICY, PARTIAL
+from py_socket_server.protocol.frames import policy_frame, status_frame
 
 class PyXmlsServer:
     def __init__(self, ctx: Context):
         self.ctx = ctx
         self.tcp_server = None
         self.server_instance = None
+        self.mode = None
+        self.policy_requests = 0
+
+        config = ctx.config.get('xmls') or {}
+        self.read_buffer_size = config.get('read_buffer_size') or READ_BUFFER_SIZE
+        self.shared_read_buffer = None
+        self.connect_timeout = config.get('connect_timeout') or 30
 
         if ctx.config.get('xmls') and ctx.config['xmls'].get('port'):
-            self.tcp_server = asyncio.start_server(
-                self.handle_request, 
-                ctx.config['xmls'].get('bind'), 
-                ctx.config['xmls'].get('port')
-            )
+            # Fails at startup rather than on the first connection
+            text_codec(config.get('codec'))
+            self.mode = ctx.config['xmls'].get('mode', 'stream')
+            if self.mode == 'buffered':
+                self.tcp_server = self.create_buffered_server()
+            else:
+                self.tcp_server = asyncio.start_server(
+                    self.handle_request, 
+                    ctx.config['xmls'].get('bind'), 
+                    ctx.config['xmls'].get('port'),
+                    reuse_port=ctx.reuse_port or None
+                )
+
+    def read_buffer(self) -> memoryview:
+        """
+        Returns the receive buffer for a buffered connection.
+        Selector loops fill it and call buffer_updated() synchronously, which copies the
+        bytes out, so every connection shares one buffer. Proactor loops receive into it
+        in the background and get a buffer per connection.
+        """
+        if isinstance(asyncio.get_running_loop(), getattr(asyncio, 'ProactorEventLoop', ())):
+            return memoryview(bytearray(self.read_buffer_size))
+        if self.shared_read_buffer is None:
+            self.shared_read_buffer = memoryview(bytearray(self.read_buffer_size))
+        return self.shared_read_buffer
+
+    async def create_buffered_server(self):
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(
+            lambda: XmlsBufferedProtocol(self.ctx, self),
+            self.ctx.config['xmls'].get('bind'),
+            self.ctx.config['xmls'].get('port'),
+            reuse_port=self.ctx.reuse_port or None
+        )
 
     async def run(self):
         if self.tcp_server:
             server = await self.tcp_server
             self.server_instance = server
-            self.ctx.logger.info(f"XMLSocket Server listening on {self.ctx.config['xmls'].get('bind')}:{self.ctx.config['xmls'].get('port')}")
+            self.ctx.logger.info("XMLSocket Server listening on %s:%s (%s mode)", self.ctx.config['xmls'].get('bind'), self.ctx.config['xmls'].get('port'), self.mode)
             try:
                 async with server:
                     await server.serve_forever()
             except asyncio.CancelledError:
                 self.ctx.logger.info("Server has been cancelled.")
             except Exception as e:
-                self.ctx.logger.error(f"XMLSocket Server unexpected error: {e}")
+                self.ctx.logger.error("XMLSocket Server unexpected error: %s", e)
         else:
             self.ctx.logger.error("No port found in XML configuration.")
 
@@ -46,8 +86,43 @@ class PyXmlsServer:
                 try:
                     await session.stop()
                 except Exception as e:
-                    self.ctx.logger.error(f"Error stopping session {session_id}: {e}")
+                    self.ctx.logger.error("Error stopping session %s: %s", session_id, e)
+
+    def serve_policy(self, transport):
+        """Answers a policy-file request without creating a session."""
+        self.policy_requests += 1
+        transport.write(policy_frame(self.ctx.config['xmls']['port']))
+        transport.close()
+
+    def on_sniff_timeout(self, transport):
+        """Closes a connection that sent nothing within connect_timeout, as a session would."""
+        transport.write(status_frame('NetConnection.Connect.Closed', 'Connection closed.'))
+        transport.close()
 
     async def handle_request(self, reader, writer):
+        # Sniff the first bytes, policy-file requests are answered before any session exists
+        timer = self.ctx.timers.schedule(self.connect_timeout, self.on_sniff_timeout, writer.transport)
+        match = None
+        try:
+            data = await reader.read(self.read_buffer_size)
+            match = sniff_policy_request(data)
+            while match is PARTIAL:
+                more = await reader.read(self.read_buffer_size)
+                if not more:
+                    break
+                data += more
+                match = sniff_policy_request(data)
+        except ConnectionError:
+            data = b''
+        finally:
+            timer.cancel()
+
+        if match is POLICY:
+            self.serve_policy(writer.transport)
+            return
+        if not data:
+            writer.close()
+            return
+
         session = XmlsSession(self.ctx, reader, writer)
-        await session.run()
\ No newline at end of file
+        await session.run(data)
\ No newline at end of file
@@ -1,61 +1,30 @@
-import os
-import math
+import asyncio
 import traceback
 from typing import Any
 
 from py_socket_server.core.context import Context
-from py_socket_server.protocol.base_protocol import BaseProtocol
-
-POOL_SIZE_MULTIPLIER = 128
-pool = None
-pool_offset = 0
-
-def fill_pool(bytes):
-    global pool, pool_offset
-    if pool is None or len(pool) < bytes:
-        pool = os.urandom(bytes * POOL_SIZE_MULTIPLIER)
-        pool_offset = 0
-    elif pool_offset + bytes > len(pool):
-        pool = os.urandom(len(pool))
-        pool_offset = 0
-    pool_offset += bytes
-
-def random_bytes(bytes):
-    global pool_offset
-    fill_pool(bytes)
-    
-    if pool is None or len(pool) == 0:
-        raise ValueError("Random pool has not been initialized properly.")
-    
-    return pool[pool_offset - bytes:pool_offset]
-
-def custom_random(alphabet, default_size, get_random):
-    mask = (2 << (31 - (alphabet_length := len(alphabet)) - 1).bit_length()) - 1
-    step = math.ceil((1.6 * mask * default_size) / alphabet_length)
-
-    def generate(size=default_size):
-        id_str = ""
-        while True:
-            bytes_data = get_random(step)
-            for i in range(step):
-                char_index = bytes_data[i] & mask
-                if char_index < alphabet_length:
-                    id_str += alphabet[char_index]
-                if len(id_str) >= size:
-                    return id_str
-    return generate
-
-random_id = custom_random("1234567890abcdefghijklmnopqrstuvwxyz", 16, random_bytes)
+from py_socket_server.core.dispatcher import IMMEDIATE
+# random_id used to live here, kept importable for applications
+from py_socket_server.core.session_id import random_id  # noqa: F401
+from py_socket_server.protocol.frames import NSF_FRAME
+
 SOCKET_PING_TIME = 60000
 SOCKET_PING_TIMEOUT = 30000
+SOCKET_CONNECT_TIMEOUT = 30000
 
 class BaseSession:
     SOCKET_PING_TIME = 60000
     SOCKET_PING_TIMEOUT = 30000
+    SOCKET_CONNECT_TIMEOUT = 30000
+
+    # Attributes set by applications still go to a __dict__, created only when first used
+    __slots__ = ('ctx', 'id', 'ip', 'is_local', 'protocol', 'host', 'bp', 'output', '_mailbox',
+                 'ping_time', 'ping_timeout', 'ping_interval', 'connect_timeout', 'connect_timer',
+                 'connect_time', 'start_timestamp', 'rooms', 'position', 'admitted', 'message_bucket', 'metrics', '__dict__')
 
-    def __init__(self):
-        self.ctx = Context()
-        self.id = random_id()
+    def __init__(self, ctx: Context):
+        self.ctx = ctx
+        self.id = ctx.session_ids.allocate()
         self.ip = ""
         self.protocol = ""
         self.host = ""
@@ -63,41 +32,161 @@ class BaseSession:
         self.ping_time = self.SOCKET_PING_TIME
         self.ping_timeout = self.SOCKET_PING_TIMEOUT
         self.ping_interval = None
-
-        self.bp = BaseProtocol()
+        self.connect_timeout = self.SOCKET_CONNECT_TIMEOUT
+        self.connect_timer = None
+        self.connect_time = None
+        self.start_timestamp = None
+        # Joined room names, the set is created on the first join
+        self.rooms = None
+        # (space, x, y, cell) in the interest grid, set by move()
+        self.position = None
+        self.admitted = False
+        self.message_bucket = None
+        # Listener counters, None when metrics are disabled
+        self.metrics = None
+
+        self.bp = None
+        self.output = None
+        self._mailbox = None
 
     def send_buffer(self, buffer):
         raise NotImplementedError("Subclasses should implement this!")
 
+    def send_frame(self, frame: bytes, key=None, droppable=False):
+        """
+        Queues an already serialized, NUL-terminated frame, replacing a queued frame with the same key.
+        Keyed and droppable frames may be dropped by the drop_oldest overflow policy.
+        """
+        raise NotImplementedError("Subclasses should implement this!")
+
+    @property
+    def dropped_frames(self):
+        return self.output.dropped
+
+    @property
+    def coalesced_frames(self):
+        return self.output.coalesced
+
+    @property
+    def output_overflows(self):
+        return self.output.overflows
+
+    @property
+    def mailbox(self):
+        """Command mailbox, created when the first command is queued."""
+        if self._mailbox is None:
+            self._mailbox = self.ctx.dispatcher.mailbox(self)
+        return self._mailbox
+
+    @property
+    def queue_depth(self):
+        """Commands waiting in the mailbox, including the one being handled."""
+        return self._mailbox.depth if self._mailbox is not None else 0
+
+    @property
+    def queue_wait_time(self):
+        """Seconds the last handled command waited before its handler ran."""
+        return self._mailbox.wait_last if self._mailbox is not None else 0.0
+
     async def on_output(self, message: Any) -> None:
         await self.send_buffer(message)
 
+    async def on_frame(self, frame: bytes) -> None:
+        self.send_frame(frame)
+
     async def on_stop(self, closed=False) -> None:
         await self.stop(closed)
 
     async def on_close(self):
-        self.ctx.logger.info(f"Session {self.id} close")
+        self.ctx.logger.info("Session %s close", self.id)
         await self.stop()
 
     async def on_data(self, data):
+        if self.metrics is not None:
+            self.metrics.bytes_in += len(data)
         err = await self.bp.parser_data(data)
         if err is not None:
-            self.ctx.logger.error(f"Session {self.id} {self.ip} parserData error, {err}")
+            if self.metrics is not None:
+                self.metrics.parse_errors += 1
+            self.ctx.logger.error("Session %s %s parserData error, %s", self.id, self.ip, err)
             await self.stop()
 
+    async def on_frames(self):
+        """Processes frames already fed into the protocol decoder."""
+        err = await self.bp.dispatch_frames()
+        if err is not None:
+            if self.metrics is not None:
+                self.metrics.parse_errors += 1
+            self.ctx.logger.error("Session %s %s parserData error, %s", self.id, self.ip, err)
+            await self.stop()
+
+    async def on_command(self, command, message, args):
+        if self.message_bucket is not None and not self.ctx.admission.allow_message(self):
+            return
+
+        priority = self.ctx.dispatcher.priority(command)
+        if priority <= IMMEDIATE:
+            await self.ctx.router.dispatch(self, command, message, args)
+        else:
+            await self.mailbox.push(priority, command, message, args)
+
     async def on_error(self, error):
         tb = traceback.extract_tb(error.__traceback__)
         filename, lineno, funcname, text = tb[-1]
 
-        self.ctx.logger.error(f"Session {self.id} socket error, {error.__class__.__name__}: {str(error)}")
-        self.ctx.logger.error(f"Error occurred in file: {filename}, line: {lineno}, function: {funcname}, text: {text}")
+        self.ctx.logger.error("Session %s socket error, %s: %s", self.id, error.__class__.__name__, str(error))
+        self.ctx.logger.error("Error occurred in file: %s, line: %s, function: %s, text: %s", filename, lineno, funcname, text)
         
         await self.stop(True)
 
     async def on_timeout(self):
-        self.ctx.logger.info(f"Session {self.id} socket timeout")
+        self.ctx.logger.info("Session %s socket timeout", self.id)
         await self.stop()
 
+    def load_timeouts(self, config):
+        """Reads ping and connect timeouts (in seconds) from a protocol config section."""
+        self.ping_time = config['ping'] * 1000 if config.get('ping') else self.ping_time
+        self.ping_timeout = config['ping_timeout'] * 1000 if config.get('ping_timeout') else self.ping_timeout
+        self.connect_timeout = config['connect_timeout'] * 1000 if config.get('connect_timeout') else self.connect_timeout
+
+    def start_connect_timer(self):
+        """Drops the socket if it does not send connect within connect_timeout."""
+        self.connect_timer = self.ctx.timers.schedule(self.connect_timeout / 1000, self.on_connect_timer)
+
+    def start_ping(self):
+        """Schedules _NSF keepalives on the shared timer wheel."""
+        self.cancel_timers()
+        self.ping_interval = self.ctx.timers.schedule(self.ping_time / 1000, self.on_ping_due)
+
+    def cancel_timers(self):
+        if self.connect_timer is not None:
+            self.connect_timer.cancel()
+            self.connect_timer = None
+        if self.ping_interval is not None:
+            self.ping_interval.cancel()
+            self.ping_interval = None
+
+    def on_connect_timer(self):
+        self.connect_timer = None
+        self.ctx.logger.info("Session %s %s sent no connect within %ss", self.id, self.ip, self.connect_timeout / 1000)
+        asyncio.ensure_future(self.on_timeout())
+
+    def on_ping_due(self):
+        self.bp.pong = False
+        self.send_frame(NSF_FRAME)
+        self.ping_interval = self.ctx.timers.schedule(self.ping_timeout / 1000, self.on_pong_deadline)
+
+    def on_pong_deadline(self):
+        if self.bp.pong is False:
+            self.ping_interval = None
+            self.ctx.logger.info("Session %s %s did not answer _NSF within %ss", self.id, self.ip, self.ping_timeout / 1000)
+            asyncio.ensure_future(self.disconnect())
+            return
+
+        # The next ping is due ping_time after the previous one was sent
+        delay = max(self.ping_time - self.ping_timeout, 0) / 1000
+        self.ping_interval = self.ctx.timers.schedule(delay, self.on_ping_due)
+
     async def accept_connection(self):
         await self.bp.call_status('NetConnection.Connect.Success', 'Connection succeeded.')
 
@@ -114,6 +203,15 @@ class BaseSession:
     async def call_xml(self, data, uid):
         await self.bp.call_xml(data, uid)
 
+    def join(self, room):
+        self.ctx.rooms.join(room, self)
+
+    def leave(self, room):
+        self.ctx.rooms.leave(room, self)
+
+    def move(self, x, y, space=None):
+        self.ctx.interest.move(self, x, y, space)
+
     async def run(self):
         raise NotImplementedError("Subclasses should implement this!")
 
@@ -121,10 +219,12 @@ class BaseSession:
         raise NotImplementedError("Subclasses should implement this!")
 
     async def reject(self):
-        self.ctx.logger.info(f"[socket reject] id={self.id}")
+        self.ctx.logger.info("[socket reject] id=%s", self.id)
         await self.stop()
 
     async def register_command(self, command_name, handler):
-        # self.ctx.logger.info(f"registerCommand: {command_name}")
+        # self.ctx.logger.info("registerCommand: %s", command_name)
+        if self.bp.custom_commands is None:
+            self.bp.custom_commands = {}
         self.bp.custom_commands[command_name] = handler
-        # self.ctx.logger.info(f"customCommands: {self.bp.custom_commands}")
\ No newline at end of file
+        # self.ctx.logger.info("customCommands: %s", self.bp.custom_commands)
\ No newline at end of file
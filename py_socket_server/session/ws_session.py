@@ -2,31 +2,66 @@ import asyncio
 import websockets
 
 from py_socket_server.core.context import Context
+from py_socket_server.core.output_queue import output_queue_from_config
+from py_socket_server.core.codec import get_codec, text_codec, msgpack_array_header
 from py_socket_server.session.base_session import BaseSession
-from py_socket_server.protocol.rolypoly_protocol import RolyPolyProtocol, END_MARKER
+from py_socket_server.protocol.rolypoly_protocol import RolyPolyProtocol
+from py_socket_server.protocol.base_protocol import END_MARKER_BYTES
+from py_socket_server.protocol.frames import SharedFrame, binary_frames
+from py_socket_server.server.ws_compression import negotiated_deflate
+
+# Offered in Sec-WebSocket-Protocol, selecting it starts the session in binary framing
+BINARY_SUBPROTOCOL = 'rolypoly.msgpack'
+# Value of the encoding connect parameter switching to binary framing after the connect
+BINARY_ENCODING = 'msgpack'
+
+CLOSE_TIMEOUT = 10
 
 class WsSession(BaseSession):
-    def __init__(self, ctx: Context, socket: websockets.ServerConnection):
-        super().__init__()
-        self.ctx = ctx
+    """
+    Session of a WebSocket client.
+    By default calls are NUL-terminated JSON like on XMLSocket, several may share
+    a message. Binary sessions, negotiated with the BINARY_SUBPROTOCOL subprotocol
+    or an "encoding": "msgpack" connect parameter, use WebSocket framing only:
+    every binary message is one MessagePack call, or an array of calls sent
+    together, with no NUL scan and no JSON. After a connect parameter, the
+    switch applies from the connect reply on, incoming calls are binary from
+    the next message, the rest of the message holding the connect is JSON.
+
+    A message holding a single shared frame, the usual shape of a broadcast, is
+    compressed through the listener's shared cache when the connection
+    negotiated permessage-deflate without server context takeover.
+    """
+
+    __slots__ = ('socket', 'send_task', 'binary', 'deflate')
+
+    def __init__(self, ctx: Context, socket: websockets.ServerConnection, protocol="ws"):
+        super().__init__(ctx)
         self.socket = socket
         self.ip = socket.remote_address[0]
         self.is_local = self.ip in ['127.0.0.1', '::1', '::ffff:127.0.0.1']
 
 
-        self.protocol = "wss" if ctx.config.get('wss') is not None else "ws"
-        self.ping_time = ctx.config[self.protocol]['ping'] * 1000 if ctx.config[self.protocol].get('ping') else self.ping_time
-        self.ping_timeout = ctx.config[self.protocol]['ping_timeout'] * 1000 if ctx.config[self.protocol].get('ping_timeout') else self.ping_timeout
+        self.protocol = protocol
+        self.load_timeouts(ctx.config[self.protocol])
+        self.metrics = ctx.metrics.listener(self.protocol, ctx.config[self.protocol])
 
-        self.bp = RolyPolyProtocol()
+        self.bp = RolyPolyProtocol(codec=text_codec(ctx.config[self.protocol].get('codec')))
+        self.output = output_queue_from_config(ctx.config[self.protocol], self.flush_output,
+                                               self.on_output_overflow, self.get_pending_output)
+        self.send_task = None
+        self.binary = False
+        self.deflate = negotiated_deflate(socket)
 
-        self.ctx.sessions[self.id] = self
+        self.ctx.add_session(self)
+        self.start_connect_timer()
 
     async def run(self):
         self.bp.on_connect_callback = self.on_connect
         self.bp.on_output_callback = self.on_output
+        self.bp.on_frame_callback = self.on_frame
         self.bp.on_stop_callback = self.on_stop
-        self.bp.on_event_emit_callback = self.on_event_emit
+        self.bp.on_command_callback = self.on_command
 
         if self.socket is None: return
 
@@ -55,50 +90,146 @@ class WsSession(BaseSession):
     async def stop(self, closed=False):
         if self.socket is None: return
             
-        if hasattr(self, 'ping_interval') and self.ping_interval is not None:
-            self.ping_interval.cancel()
-            self.ping_interval = None
+        self.cancel_timers()
+        if self._mailbox is not None:
+            self._mailbox.close()
 
-        self.ctx.logger.info(f"[socket disconnect] id={self.id} closed={closed}")
+        self.ctx.logger.info("[socket disconnect] id=%s closed=%s", self.id, closed)
 
-        self.ctx.py_event.emit('doneConnect', self, self.ctx)
+        asyncio.ensure_future(self.ctx.router.emit('doneConnect', self, self.ctx))
 
         if closed == False: await self.bp.call_status('NetConnection.Connect.Closed', 'Connection closed.')
 
-        if self.id in self.ctx.sessions: del self.ctx.sessions[self.id]
+        self.output.flush()
+        if self.send_task is not None and self.send_task is not asyncio.current_task():
+            try:
+                await asyncio.wait_for(asyncio.shield(self.send_task), CLOSE_TIMEOUT)
+            except asyncio.TimeoutError:
+                # The peer stopped reading and the queued messages cannot be sent, drop the connection
+                self.send_task.cancel()
+                self.socket.transport.abort()
+
+        self.ctx.remove_session(self)
 
-        await self.socket.close()
-        self.socket = None
+        if self.socket is None: return
+        socket, self.socket = self.socket, None
+        self.output.clear()
+        await socket.close()
 
 
     async def on_close(self):
-        self.ctx.logger.info(f"Session {self.id} close")
+        self.ctx.logger.info("Session %s close", self.id)
         await self.stop()
 
+    def use_binary(self) -> None:
+        """Switches the session to binary framing, the codec must be installed."""
+        self.binary = True
+        self.bp.codec = get_codec(BINARY_ENCODING)
+
+    async def on_data(self, data):
+        if not self.binary:
+            await super().on_data(data)
+            return
+
+        if self.metrics is not None:
+            self.metrics.bytes_in += len(data)
+        if isinstance(data, str):
+            err = 'Disconnected - text message on a binary session'
+        else:
+            err = await self.bp.binary_invoke_handler(data)
+        if err is not None:
+            if self.metrics is not None:
+                self.metrics.parse_errors += 1
+            self.ctx.logger.error("Session %s %s parserData error, %s", self.id, self.ip, err)
+            await self.stop()
+
     async def on_connect(self, invoke_message):
-        self.ctx.py_event.emit('preConnect', self.id, self.ctx, invoke_message)
+        if not self.binary and binary_requested(invoke_message) and self.ctx.config[self.protocol].get('binary', True):
+            try:
+                self.use_binary()
+            except ImportError:
+                pass
+
+        if not await self.ctx.admission.admit(self):
+            return
+        try:
+            await self.ctx.router.emit('preConnect', self.id, self.ctx, invoke_message)
+        finally:
+            self.ctx.admission.release(self)
         if not self.socket: return
         
         self.connect_time = asyncio.get_event_loop().time()
         self.start_timestamp = asyncio.get_event_loop().time()
-        self.ping_interval = asyncio.create_task(self.ping())
-
-        self.ctx.logger.info(f"[socket connect] id={self.id} ip={self.ip} args={invoke_message}")
-        self.ctx.py_event.emit('postConnect', self.id, self.ctx, invoke_message)
+        self.start_ping()
 
-    async def ping(self):
-        while self.socket:
-            await asyncio.sleep(self.ping_time / 1000)
-            await self.bp.send_ping_request()
+        self.ctx.logger.info("[socket connect] id=%s ip=%s args=%s", self.id, self.ip, invoke_message)
+        await self.ctx.router.emit('postConnect', self.id, self.ctx, invoke_message)
 
-    async def on_event_emit(self, event_name, *args):
-        self.ctx.py_event.emit(event_name, self.id, self.ctx, *args)
+    def flush_output(self):
+        """ Start the sender task unless one is already writing. """
+        if self.send_task is None and self.socket is not None:
+            self.send_task = asyncio.create_task(self.write_output())
 
-    async def send_buffer(self, buffer):
+    async def write_output(self):
+        """ Send queued frames, batching everything queued meanwhile into one WebSocket message. """
         try:
-            data_to_send = buffer + END_MARKER.encode()
-            if self.socket:
-                await self.socket.send(data_to_send)
+            while self.output.size and self.socket:
+                chunks = self.output.take()
+                if len(chunks) == 1:
+                    data = chunks[0]
+                elif self.binary:
+                    # Every queued chunk is one encoded call
+                    data = msgpack_array_header(len(chunks)) + b''.join(chunks)
+                else:
+                    data = b''.join(chunks)
+                if self.metrics is not None:
+                    self.metrics.bytes_out += len(data)
+                    self.metrics.writes += 1
+                if self.deflate is not None and type(data) is SharedFrame:
+                    # Sent to other sessions too, other messages are compressed by the connection
+                    data = self.deflate.compress_shared(data)
+                await self.socket.send(data)
         except (websockets.exceptions.ConnectionClosed, Exception) as error:
-            self.ctx.logger.error(f'Send buffer error: {error}')
-            await self.stop(True)
\ No newline at end of file
+            if self.metrics is not None:
+                self.metrics.send_errors += 1
+            self.ctx.logger.error('Send buffer error: %s', error)
+            self.output.clear()
+            await self.stop(True)
+        finally:
+            self.send_task = None
+
+    def get_pending_output(self):
+        return self.socket.transport.get_write_buffer_size() if self.socket is not None else 0
+
+    def on_output_overflow(self):
+        """ Abort a consumer that fell too far behind, the receive loop then stops the session. """
+        self.ctx.logger.warning("Session %s %s output backlog over %s bytes, disconnecting", self.id, self.ip, self.output.max_bytes)
+        if self.socket is not None:
+            self.socket.transport.abort()
+
+    def send_frame(self, frame: bytes, key=None, droppable=False):
+        if self.socket is None:
+            return
+        if self.binary:
+            calls = binary_frames.convert(frame, self.bp.codec)
+            if len(calls) == 1:
+                self.output.push(calls[0], key=key, droppable=droppable)
+            else:
+                droppable = droppable or key is not None
+                for call in calls:
+                    self.output.push(call, droppable=droppable)
+            return
+        self.output.push(frame, key=key, droppable=droppable)
+
+    async def send_buffer(self, buffer):
+        if self.socket is None:
+            return
+
+        if self.binary:
+            self.output.push(buffer)
+        else:
+            self.output.push(buffer, END_MARKER_BYTES)
+
+def binary_requested(invoke_message) -> bool:
+    params = invoke_message[1] if len(invoke_message) > 1 else None
+    return isinstance(params, dict) and params.get('encoding') == BINARY_ENCODING
\ No newline at end of file
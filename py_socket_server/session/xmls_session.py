@@ -1,12 +1,19 @@
 import asyncio
 from py_socket_server.core.context import Context
+from py_socket_server.core.output_queue import output_queue_from_config
+from py_socket_server.core.codec import text_codec
 from py_socket_server.session.base_session import BaseSession
-from py_socket_server.protocol.rolypoly_protocol import RolyPolyProtocol, END_MARKER
+from py_socket_server.protocol.rolypoly_protocol import RolyPolyProtocol
+from py_socket_server.protocol.base_protocol import END_MARKER_BYTES
+
+READ_BUFFER_SIZE = 65536
+CLOSE_TIMEOUT = 10
 
 class XmlsSession(BaseSession):
-    def __init__(self, ctx: Context, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
-        super().__init__()
-        self.ctx = ctx
+    __slots__ = ('reader', 'writer', 'read_buffer_size', 'drain_task')
+
+    def __init__(self, ctx: Context, reader: asyncio.StreamReader | None, writer: asyncio.StreamWriter):
+        super().__init__(ctx)
         self.reader = reader
         self.writer = writer
         
@@ -17,27 +24,39 @@ class XmlsSession(BaseSession):
         self.is_local = self.ip in ['127.0.0.1', '::1', '::ffff:127.0.0.1']
 
         self.protocol = "xmls"
-        self.ping_time = ctx.config[self.protocol]['ping'] * 1000 if ctx.config[self.protocol].get('ping') else self.ping_time
-        self.ping_timeout = ctx.config[self.protocol]['ping_timeout'] * 1000 if ctx.config[self.protocol].get('ping_timeout') else self.ping_timeout
+        self.load_timeouts(ctx.config[self.protocol])
+        self.metrics = ctx.metrics.listener(self.protocol, ctx.config[self.protocol])
 
-        self.bp = RolyPolyProtocol()
+        self.read_buffer_size = ctx.config[self.protocol].get('read_buffer_size') or READ_BUFFER_SIZE
 
-        self.ctx.sessions[self.id] = self
-        self.ping_interval = None
+        self.bp = RolyPolyProtocol(ctx.config[self.protocol].get('max_frame_size'),
+                                   text_codec(ctx.config[self.protocol].get('codec')))
+        self.output = output_queue_from_config(ctx.config[self.protocol], self.flush_output,
+                                               self.on_output_overflow, self.get_pending_output)
+        self.drain_task = None
 
+        self.ctx.add_session(self)
+        self.start_connect_timer()
 
-    async def run(self):
+    def bind_protocol(self):
         self.bp.on_connect_callback = self.on_connect
         self.bp.on_output_callback = self.on_output
+        self.bp.on_frame_callback = self.on_frame
         self.bp.on_policy_callback = self.on_policy
         self.bp.on_stop_callback = self.on_stop
-        self.bp.on_event_emit_callback = self.on_event_emit
+        self.bp.on_command_callback = self.on_command
+
+    async def run(self, data=None):
+        """Reads until the connection closes, starting with data already read by the server."""
+        self.bind_protocol()
 
         while True:
             try:
-                data = await self.reader.read(1024)
+                if data is None:
+                    data = await self.reader.read(self.read_buffer_size)
                 if data:
                     await self.on_data(data)
+                    data = None
                 else:
                     break
             except ConnectionAbortedError:
@@ -53,79 +72,123 @@ class XmlsSession(BaseSession):
         if self.writer is None: 
             return
 
-        if self.ping_interval is not None:
-            self.ping_interval.cancel()
-            self.ping_interval = None
+        self.cancel_timers()
+        if self._mailbox is not None:
+            self._mailbox.close()
 
-        self.ctx.logger.info(f"[socket disconnect] id={self.id}")
+        self.ctx.logger.info("[socket disconnect] id=%s", self.id)
 
-        self.ctx.py_event.emit('doneConnect', self, self.ctx)
+        asyncio.ensure_future(self.ctx.router.emit('doneConnect', self, self.ctx))
 
         if closed == False: 
             await self.bp.call_status('NetConnection.Connect.Closed', 'Connection closed.')
 
-        if self.id in self.ctx.sessions: 
-            del self.ctx.sessions[self.id]
+        self.output.cancel()
+        self.flush_output(force=True)
+        if self.drain_task is not None:
+            self.drain_task.cancel()
+            self.drain_task = None
+
+        self.ctx.remove_session(self)
         
         try:
             if not self.writer.is_closing():
                 self.writer.close()
-                await self.writer.wait_closed()
+                await asyncio.wait_for(self.writer.wait_closed(), CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # The peer stopped reading and the transport cannot flush, drop it
+            self.writer.transport.abort()
         except Exception as e:
-            self.ctx.logger.error(f"Error closing writer: {e}")
+            self.ctx.logger.error("Error closing writer: %s", e)
         finally:
             self.writer = None
+            self.output.clear()
 
     async def on_connect(self, invoke_message):
-        self.ctx.py_event.emit('preConnect', self.id, self.ctx, invoke_message)
+        if not await self.ctx.admission.admit(self):
+            return
+        try:
+            await self.ctx.router.emit('preConnect', self.id, self.ctx, invoke_message)
+        finally:
+            self.ctx.admission.release(self)
         if self.writer is None or self.writer.is_closing(): 
             return
         
         self.connect_time = asyncio.get_event_loop().time()
         self.start_timestamp = asyncio.get_event_loop().time() * 1000
-        self.ping_interval = asyncio.ensure_future(self.send_ping())
-
-        self.ctx.logger.info(f"[socket connect] id={self.id} ip={self.ip} args={invoke_message}")
-        self.ctx.py_event.emit('postConnect', self.id, self.ctx, invoke_message)
-
-    async def send_ping(self):
-        while self.writer is not None and not self.writer.is_closing():
-            if self.ping_time is not None:
-                try:
-                    await asyncio.sleep(self.ping_time / 1000)
-                    await self.bp.send_ping_request()
-                except ConnectionError:
-                    self.ctx.logger.warning("Connection lost during ping")
-                    await self.stop()
-                    break
-                except Exception as e:
-                    self.ctx.logger.error(f"Ping error: {e}")
-                    await self.stop()
-                    break
-            else:
-                self.ctx.logger.warning('Ping time is not set. Skipping ping request.')
-                await asyncio.sleep(1)
+        self.start_ping()
+
+        self.ctx.logger.info("[socket connect] id=%s ip=%s args=%s", self.id, self.ip, invoke_message)
+        await self.ctx.router.emit('postConnect', self.id, self.ctx, invoke_message)
 
     async def on_policy(self):
         await self.bp.send_policy_file(self.ctx.config[self.protocol]['port'])
         await self.stop(True)
 
-    async def on_event_emit(self, event_name, *args):
-        """ Emit an event with the given name and arguments. """
-        self.ctx.py_event.emit(event_name, self.id, self.ctx, *args)
-
-    async def send_buffer(self, buffer: bytes):
-        """ Send a buffer through the socket. """
+    def flush_output(self, force=False):
+        """ Write every queued frame with a single writelines call. """
         if self.writer is None or self.writer.is_closing():
+            self.output.clear()
             return
-            
+
+        if not force:
+            if self.drain_task is not None:
+                return
+
+            # Keep frames corked in the queue, where they can still be dropped or coalesced,
+            # until the transport goes back under its high-water mark
+            transport = self.writer.transport
+            if transport.get_write_buffer_size() >= transport.get_write_buffer_limits()[1]:
+                self.drain_task = asyncio.ensure_future(self.flush_when_drained())
+                return
+
+        if self.metrics is not None:
+            self.metrics.bytes_out += self.output.size
+            self.metrics.writes += 1
+        try:
+            self.writer.writelines(self.output.take())
+        except Exception as error:
+            if self.metrics is not None:
+                self.metrics.send_errors += 1
+            self.ctx.logger.error('Flush output error: %s', error)
+
+    async def flush_when_drained(self):
         try:
-            data_to_send = buffer + END_MARKER.encode('utf-8')
-            self.writer.write(data_to_send)
             await self.writer.drain()
         except ConnectionResetError:
             self.ctx.logger.info('Connection reset by peer')
-            await self.stop()
+            self.drain_task = None
+            await self.stop(True)
+            return
         except Exception as error:
-            self.ctx.logger.error(f'Send buffer error: {error}')
-            await self.stop()
\ No newline at end of file
+            if self.metrics is not None:
+                self.metrics.send_errors += 1
+            self.ctx.logger.error('Send buffer error: %s', error)
+            self.drain_task = None
+            await self.stop(True)
+            return
+
+        self.drain_task = None
+        self.output.flush()
+
+    def get_pending_output(self):
+        return self.writer.transport.get_write_buffer_size() if self.writer is not None else 0
+
+    def on_output_overflow(self):
+        """ Abort a consumer that fell too far behind, the read loop then stops the session. """
+        self.ctx.logger.warning("Session %s %s output backlog over %s bytes, disconnecting", self.id, self.ip, self.output.max_bytes)
+        if self.writer is not None:
+            self.writer.transport.abort()
+
+    def send_frame(self, frame: bytes, key=None, droppable=False):
+        """ Queue a shared, already terminated frame. """
+        if self.writer is None or self.writer.is_closing():
+            return
+        self.output.push(frame, key=key, droppable=droppable)
+
+    async def send_buffer(self, buffer: bytes):
+        """ Queue a buffer for the socket, backpressure is handled by the output queue policy. """
+        if self.writer is None or self.writer.is_closing():
+            return
+            
+        self.output.push(buffer, END_MARKER_BYTES)
\ No newline at end of file
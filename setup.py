@@ -12,9 +12,13 @@ setuptools.setup(
     install_requires = [
         "events",
         "websockets",
-        "pyee",
         "defusedxml"
     ],
+    extras_require = {
+        "orjson": ["orjson"],
+        "msgspec": ["msgspec"],
+        "msgpack": ["msgpack"],
+    },
     version = "1.2.0",
     license = "MIT",
     long_description=long_description,
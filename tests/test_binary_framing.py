@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from py_socket_server.core.codec import get_codec
+from py_socket_server.protocol.frames import SharedFrame, binary_frames, encode_frame, shared_frame
+from py_socket_server.protocol.rolypoly_protocol import RolyPolyProtocol
+
+msgpack = pytest.importorskip('msgpack')
+
+def test_binary_message_holds_one_call_or_a_list():
+    async def main():
+        protocol = RolyPolyProtocol(codec=get_codec('msgpack'))
+        commands = []
+
+        async def on_command(command, message, args):
+            commands.append(message)
+
+        protocol.on_command_callback = on_command
+        await protocol.binary_invoke_handler(msgpack.packb(['_S', 1]))
+        await protocol.binary_invoke_handler(msgpack.packb([['_S', 2], ['_P', 3]]))
+        error = await protocol.binary_invoke_handler(msgpack.packb('_S'))
+        return commands, error
+
+    commands, error = asyncio.run(main())
+    assert commands == [['_S', 1], ['_S', 2], ['_P', 3]]
+    assert error == 'Disconnected - unexpected binary message'
+
+def test_switch_applies_from_the_next_message():
+    async def main():
+        protocol = RolyPolyProtocol()
+        commands = []
+
+        async def on_connect(message):
+            # What WsSession.use_binary does on an "encoding": "msgpack" connect
+            protocol.codec = get_codec('msgpack')
+
+        async def on_command(command, message, args):
+            commands.append(message)
+
+        protocol.on_connect_callback = on_connect
+        protocol.on_command_callback = on_command
+        error = await protocol.parser_data('["connect",{"encoding":"msgpack"}]\x00["_S",1]\x00')
+        return commands, error
+
+    # The call after the connect is still JSON
+    assert asyncio.run(main()) == ([['_S', 1]], None)
+
+def test_shared_frames_convert_once():
+    codec = get_codec('msgpack')
+    frame = shared_frame('_S', 'p1', {'x': 1}) + encode_frame('_S', 'p2', {'x': 2})
+    calls = binary_frames.convert(SharedFrame(frame), codec)
+    assert [msgpack.unpackb(call) for call in calls] == [['_S', 'p1', {'x': 1}], ['_S', 'p2', {'x': 2}]]
+    assert binary_frames.convert(SharedFrame(frame), codec) is calls
+    assert all(isinstance(call, SharedFrame) for call in calls)
+
+def test_frames_of_one_session_are_not_cached():
+    codec = get_codec('msgpack')
+    frame = encode_frame('_S', 'p3', {'x': 3})
+    calls = binary_frames.convert(frame, codec)
+    assert [msgpack.unpackb(call) for call in calls] == [['_S', 'p3', {'x': 3}]]
+    assert frame not in binary_frames.calls
+    assert not isinstance(calls[0], SharedFrame)
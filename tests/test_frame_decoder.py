@@ -0,0 +1,61 @@
+import pytest
+
+from py_socket_server.core.frame_decoder import FrameDecoder, FrameTooLargeError
+
+def test_frame_split_across_feeds():
+    decoder = FrameDecoder()
+    decoder.feed(b'["_S",')
+    assert list(decoder) == []
+    decoder.feed(b'1]\x00["_P"')
+    assert list(decoder) == [b'["_S",1]']
+    decoder.feed(b']\x00')
+    assert list(decoder) == [b'["_P"]']
+    assert len(decoder) == 0
+
+def test_merged_frames_in_one_feed():
+    decoder = FrameDecoder()
+    decoder.feed(b'["a"]\x00["b"]\x00["c"')
+    assert list(decoder) == [b'["a"]', b'["b"]']
+    assert len(decoder) == len(b'["c"')
+
+def test_multibyte_marker():
+    decoder = FrameDecoder(marker=b'\r\n')
+    decoder.feed(b'one\r')
+    assert list(decoder) == []
+    decoder.feed(b'\ntwo\r\n')
+    assert list(decoder) == [b'one', b'two']
+
+def test_oversized_frame_without_marker():
+    decoder = FrameDecoder(max_frame_size=8)
+    decoder.feed(b'x' * 9)
+    with pytest.raises(FrameTooLargeError):
+        list(decoder)
+
+def test_oversized_frame_with_marker():
+    decoder = FrameDecoder(max_frame_size=8)
+    decoder.feed(b'ok\x00' + b'x' * 9 + b'\x00')
+    frames = decoder.frames()
+    assert next(frames) == b'ok'
+    with pytest.raises(FrameTooLargeError):
+        next(frames)
+
+def test_frame_at_max_size():
+    decoder = FrameDecoder(max_frame_size=8)
+    decoder.feed(b'x' * 8 + b'\x00')
+    assert list(decoder) == [b'x' * 8]
+
+def test_compacts_consumed_bytes():
+    decoder = FrameDecoder()
+    for _ in range(1000):
+        decoder.feed(b'y' * 10 + b'\x00')
+        assert list(decoder) == [b'y' * 10]
+    decoder.feed(b'partial')
+    assert list(decoder) == []
+    assert len(decoder) == len(b'partial')
+
+def test_clear():
+    decoder = FrameDecoder()
+    decoder.feed(b'half')
+    decoder.clear()
+    decoder.feed(b'new\x00')
+    assert list(decoder) == [b'new']
@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+from py_socket_server.core.codec import get_codec
+from py_socket_server.protocol.frames import FrameCache, encode_frame, response_frame, status_frame
+from py_socket_server.protocol.rolypoly_protocol import RolyPolyProtocol
+
+def test_frames_are_built_once():
+    cache = FrameCache(max_entries=1)
+    built = []
+    for key in ('a', 'a', 'b', 'b'):
+        cache.frame(key, lambda: built.append(key) or encode_frame(key))
+    # b is over the limit, it is built on every lookup
+    assert built == ['a', 'b', 'b']
+    assert cache.stats()['hits'] == 1
+
+def test_response_frame_matches_a_plain_call():
+    frame = response_frame(get_codec(), ['ok', {'x': 1}], 'cb1')
+    assert json.loads(frame[:-1]) == ['_B', {'callback_uid': 'cb1', '0': 'ok', '1': {'x': 1}, 'length': 2}]
+    assert json.loads(response_frame(get_codec(), 'one', 'cb2')[:-1]) == \
+           ['_B', {'callback_uid': 'cb2', '0': 'one', 'length': 1}]
+
+def test_status_frame_with_unhashable_error_code():
+    frame = status_frame('NetConnection.Connect.Rejected', 'Connection rejected.', {'reason': ['full']})
+    assert json.loads(frame[:-1])[1]['error_code'] == {'reason': ['full']}
+
+def test_response_that_cannot_be_serialized():
+    async def main():
+        protocol = RolyPolyProtocol()
+        sent = []
+
+        async def output(data):
+            sent.append(data)
+
+        protocol.on_frame_callback = protocol.on_output_callback = output
+        error = await protocol.respond_cmd([object()], 'cb1')
+        return error, sent
+
+    error, sent = asyncio.run(main())
+    assert error.startswith('Parse message error')
+    assert sent == []
@@ -0,0 +1,47 @@
+import math
+import random
+
+from py_socket_server.core.interest import InterestGrid
+
+class Session:
+    __slots__ = ('id', 'position')
+
+    def __init__(self, id):
+        self.id = id
+        self.position = None
+
+def scattered(grid, count, space=None, seed=1):
+    random.seed(seed)
+    sessions = [Session(i) for i in range(count)]
+    for session in sessions:
+        grid.move(session, random.uniform(-2000, 2000), random.uniform(-2000, 2000), space)
+    return sessions
+
+def within(sessions, x, y, radius, space=None) -> set:
+    return {session.id for session in sessions if session.position[0] == space
+            and math.hypot(session.position[1] - x, session.position[2] - y) <= radius}
+
+def test_query_matches_a_scan():
+    grid = InterestGrid(cell_size=100)
+    sessions = scattered(grid, 500)
+    for radius in (0, 50, 150, 700, 5000, 10 ** 9, math.inf):
+        assert {session.id for session in grid.query(10, -30, radius)} == within(sessions, 10, -30, radius)
+
+def test_spaces_are_separate():
+    grid = InterestGrid(cell_size=100)
+    here = scattered(grid, 50, 'here')
+    scattered(grid, 50, 'there')
+    for radius in (200, math.inf):
+        assert {session.id for session in grid.query(0, 0, radius, 'here')} == within(here, 0, 0, radius, 'here')
+
+def test_moves_between_cells():
+    grid = InterestGrid(cell_size=10)
+    player, other = Session('p'), Session('o')
+    grid.move(player, 0, 0)
+    grid.move(other, 5, 5)
+    assert grid.nearby(player, 10) == [other]
+    grid.move(other, 500, 500)
+    assert grid.nearby(player, 10) == []
+    assert grid.nearby(player, 10 ** 6) == [other]
+    grid.remove(other)
+    assert len(grid) == 1 and grid.nearby(player, math.inf) == []
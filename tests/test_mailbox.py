@@ -0,0 +1,110 @@
+import asyncio
+
+from py_socket_server.core.dispatcher import Dispatcher
+
+class Router:
+    """Records dispatched commands, each handler yields to the loop like a real one."""
+
+    def __init__(self):
+        self.handled = []
+        self.running = 0
+        self.max_running = 0
+
+    async def dispatch(self, session, command, message, args):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        self.handled.append((session, command, message))
+        self.running -= 1
+
+async def drained(*mailboxes):
+    while any(mailbox.task is not None for mailbox in mailboxes):
+        await asyncio.sleep(0)
+
+def test_commands_of_a_session_keep_their_order():
+    async def main():
+        router = Router()
+        mailbox = Dispatcher(router).mailbox('s1')
+        for i in range(5):
+            await mailbox.push(1, '_S', i, None)
+        await drained(mailbox)
+        return router
+
+    router = asyncio.run(main())
+    assert [message for _, _, message in router.handled] == [0, 1, 2, 3, 4]
+    # One handler at a time per session
+    assert router.max_running == 1
+
+def test_lower_priority_value_overtakes_queued_commands():
+    async def main():
+        router = Router()
+        mailbox = Dispatcher(router).mailbox('s1')
+        await mailbox.push(2, 'slow', 0, None)
+        await mailbox.push(2, 'slow', 1, None)
+        await mailbox.push(1, 'fast', 2, None)
+        await drained(mailbox)
+        return router
+
+    router = asyncio.run(main())
+    assert [(command, message) for _, command, message in router.handled] == [('fast', 2), ('slow', 0), ('slow', 1)]
+
+def test_close_keeps_queued_commands_and_refuses_new_ones():
+    async def main():
+        router = Router()
+        dispatcher = Dispatcher(router)
+        mailbox = dispatcher.mailbox('s1')
+        await mailbox.push(1, '_S', 0, None)
+        await mailbox.push(1, '_S', 1, None)
+        mailbox.close()
+        await mailbox.push(1, '_S', 2, None)
+        await drained(mailbox)
+        return router, dispatcher
+
+    router, dispatcher = asyncio.run(main())
+    assert [message for _, _, message in router.handled] == [0, 1]
+    assert dispatcher.queued == 0
+
+def test_full_mailbox_waits_for_space():
+    async def main():
+        router = Router()
+        mailbox = Dispatcher(router, mailbox_size=2).mailbox('s1')
+        for i in range(5):
+            await mailbox.push(1, '_S', i, None)
+            assert len(mailbox) <= 2
+        await drained(mailbox)
+        return router
+
+    router = asyncio.run(main())
+    assert [message for _, _, message in router.handled] == [0, 1, 2, 3, 4]
+
+def test_close_wakes_a_waiting_push():
+    async def main():
+        router = Router()
+        mailbox = Dispatcher(router, mailbox_size=1).mailbox('s1')
+        await mailbox.push(1, '_S', 0, None)
+        await mailbox.push(1, '_S', 1, None)
+        waiting = asyncio.create_task(mailbox.push(1, '_S', 2, None))
+        await asyncio.sleep(0)
+        mailbox.close()
+        await asyncio.wait_for(waiting, 1)
+        await drained(mailbox)
+        return router
+
+    router = asyncio.run(main())
+    assert 2 not in [message for _, _, message in router.handled]
+
+def test_concurrency_limit_spans_sessions():
+    async def main():
+        router = Router()
+        dispatcher = Dispatcher(router, max_concurrency=2)
+        mailboxes = [dispatcher.mailbox(f's{i}') for i in range(4)]
+        for mailbox in mailboxes:
+            await mailbox.push(1, '_S', 0, None)
+        await drained(*mailboxes)
+        return router, dispatcher
+
+    router, dispatcher = asyncio.run(main())
+    assert len(router.handled) == 4
+    assert router.max_running == 2
+    assert dispatcher.active == 0
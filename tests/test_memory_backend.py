@@ -0,0 +1,149 @@
+import asyncio
+import json
+
+import pytest
+
+from py_socket_server.core.context import Context
+from py_socket_server.cluster.cluster import Cluster
+from py_socket_server.cluster.memory_backend import MemoryBackend, MemoryHub
+from py_socket_server.cluster.remote_session import RemoteSession
+
+class Session:
+    """Local session stand-in recording what it is sent."""
+
+    def __init__(self, id):
+        self.id = id
+        self.metrics = None
+        self.rooms = None
+        self.position = None
+        self.admitted = False
+        self.dropped_frames = 0
+        self.calls = []
+        self.frames = []
+        self.disconnected = False
+
+    async def call(self, *args):
+        self.calls.append(list(args))
+
+    async def call_xml(self, data, uid):
+        self.calls.append(['xml', data, uid])
+
+    async def disconnect(self):
+        self.disconnected = True
+
+    def send_frame(self, frame, key=None, droppable=False):
+        self.frames.append(frame)
+
+async def start_node(hub, node_id):
+    ctx = Context({})
+    ctx.cluster = Cluster(ctx, MemoryBackend(node_id, hub))
+    await ctx.cluster.start()
+    return ctx
+
+async def delivered():
+    """Lets queued batches be flushed and consumed."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def calls(frames) -> list:
+    return [json.loads(frame[:-1]) for frame in frames]
+
+def test_directory_resolves_remote_sessions():
+    async def main():
+        hub = MemoryHub()
+        a, b = await start_node(hub, 'a'), await start_node(hub, 'b')
+        player = Session('p1')
+        b.add_session(player)
+
+        remote = a.cluster.get_session('p1')
+        assert isinstance(remote, RemoteSession)
+        assert remote.node_id == 'b'
+        # A node does not proxy its own sessions
+        assert b.cluster.get_session('p1') is None
+        assert a.cluster.get_session('unknown') is None
+
+        b.remove_session(player)
+        assert a.cluster.get_session('p1') is None
+
+    asyncio.run(main())
+
+def test_call_reaches_a_session_on_another_node():
+    async def main():
+        hub = MemoryHub()
+        a, b = await start_node(hub, 'a'), await start_node(hub, 'b')
+        player = Session('p1')
+        b.add_session(player)
+
+        remote = a.cluster.get_session('p1')
+        await remote.call('_S', {'x': 1})
+        await remote.call('_P', 2)
+        await remote.call_xml('<a/>', 'cb1')
+        # Batched per node, nothing is sent before the loop runs
+        assert player.calls == []
+        assert a.cluster.outbox == {'b': [('call', 'p1', ['_S', {'x': 1}]), ('call', 'p1', ['_P', 2]),
+                                          ('call_xml', 'p1', '<a/>', 'cb1')]}
+        await delivered()
+        assert player.calls == [['_S', {'x': 1}], ['_P', 2], ['xml', '<a/>', 'cb1']]
+
+        await remote.disconnect()
+        await delivered()
+        assert player.disconnected
+
+    asyncio.run(main())
+
+def test_broadcast_reaches_room_members_on_every_node():
+    async def main():
+        hub = MemoryHub()
+        a, b, c = await start_node(hub, 'a'), await start_node(hub, 'b'), await start_node(hub, 'c')
+        sender, near, far, elsewhere = Session('s'), Session('n'), Session('f'), Session('e')
+        a.add_session(sender)
+        a.add_session(near)
+        b.add_session(far)
+        c.add_session(elsewhere)
+        for ctx, session in ((a, sender), (a, near), (b, far)):
+            ctx.rooms.join('map', session)
+        c.rooms.join('lobby', elsewhere)
+
+        sent = await a.broadcast('map', '_S', 'p1', 7, exclude=sender)
+        # Only local recipients are counted
+        assert sent == 1
+        await delivered()
+        return sender, near, far, elsewhere
+
+    sender, near, far, elsewhere = asyncio.run(main())
+    assert sender.frames == []
+    assert calls(near.frames) == [['_S', 'p1', 7]]
+    assert calls(far.frames) == [['_S', 'p1', 7]]
+    assert elsewhere.frames == []
+
+def test_stopped_node_is_forgotten():
+    async def main():
+        hub = MemoryHub()
+        a, b = await start_node(hub, 'a'), await start_node(hub, 'b')
+        b.add_session(Session('p1'))
+        a.cluster.send('b', 'call', 'p1', ['_S'])
+        await b.cluster.stop()
+        assert a.cluster.get_session('p1') is None
+        assert a.cluster.backend.nodes() == []
+        assert 'b' not in a.cluster.outbox
+        await a.cluster.stop()
+
+    asyncio.run(main())
+
+def test_call_that_cannot_be_serialized_raises_to_the_caller():
+    async def main():
+        hub = MemoryHub()
+        a, b = await start_node(hub, 'a'), await start_node(hub, 'b')
+        player = Session('p1')
+        b.add_session(player)
+
+        remote = a.cluster.get_session('p1')
+        await remote.call('_S', 1)
+        with pytest.raises(TypeError):
+            await remote.call('_S', object())
+        await remote.call('_S', 2)
+        await delivered()
+        return player
+
+    # The other calls of the batch still arrive
+    assert asyncio.run(main()).calls == [['_S', 1], ['_S', 2]]
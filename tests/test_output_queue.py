@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from py_socket_server.core.output_queue import OutputQueue, DROP_OLDEST, DISCONNECT
+
+def make_queue(**kwargs):
+    flushes = []
+    overflows = []
+    queue = OutputQueue(lambda: flushes.append(queue.take()), on_overflow=lambda: overflows.append(True), **kwargs)
+    return queue, flushes, overflows
+
+def test_frames_of_one_iteration_flush_together():
+    async def main():
+        queue, flushes, _ = make_queue()
+        queue.push(b'a')
+        queue.push(b'b', b'\x00')
+        assert flushes == []
+        await asyncio.sleep(0)
+        return flushes
+
+    assert asyncio.run(main()) == [[b'a', b'b', b'\x00']]
+
+def test_threshold_flushes_right_away():
+    async def main():
+        queue, flushes, _ = make_queue(threshold=4)
+        queue.push(b'abcd')
+        return flushes
+
+    assert asyncio.run(main()) == [[b'abcd']]
+
+def test_coalesce_by_key():
+    async def main():
+        queue, _, _ = make_queue()
+        queue.push(b'first')
+        queue.push(b'x=1', key='pos')
+        queue.push(b'last')
+        queue.push(b'x=22', key='pos')
+        assert queue.size == len(b'first') + len(b'x=22') + len(b'last')
+        assert queue.coalesced == 1
+        return queue.take()
+
+    # The replaced frame keeps its place in the queue
+    assert asyncio.run(main()) == [b'first', b'x=22', b'last']
+
+def test_drop_oldest_only_drops_state():
+    async def main():
+        queue, _, overflows = make_queue(threshold=1000, max_bytes=100, policy=DROP_OLDEST)
+        queue.push(b'r' * 30)
+        queue.push(b's' * 30, key='state')
+        queue.push(b't' * 30, droppable=True)
+        queue.push(b'u' * 30, droppable=True)
+        assert queue.dropped == 1
+        assert overflows == []
+        return queue.take()
+
+    assert asyncio.run(main()) == [b'r' * 30, b't' * 30, b'u' * 30]
+
+def test_drop_oldest_disconnects_when_state_is_not_enough():
+    async def main():
+        queue, flushes, overflows = make_queue(threshold=1000, max_bytes=100, policy=DROP_OLDEST)
+        queue.push(b's' * 30, droppable=True)
+        queue.push(b'r' * 60)
+        queue.push(b'r' * 60)
+        assert overflows == [True]
+        # The droppable frame, then both replies
+        assert queue.dropped == 3
+        assert queue.size == 0
+        await asyncio.sleep(0)
+        return flushes
+
+    assert asyncio.run(main()) == []
+
+def test_disconnect_policy():
+    async def main():
+        queue, _, overflows = make_queue(threshold=1000, max_bytes=100, policy=DISCONNECT)
+        queue.push(b'x' * 60, key='state')
+        queue.push(b'y' * 60)
+        assert overflows == [True]
+        assert queue.dropped == 2
+        assert queue.overflows == 1
+        assert queue.take() == []
+
+    asyncio.run(main())
+
+def test_backlog_counts_transport_bytes():
+    async def main():
+        pending = [90]
+        queue = OutputQueue(lambda: None, threshold=1000, max_bytes=100, policy=DROP_OLDEST,
+                            get_pending=lambda: pending[0])
+        queue.push(b'a' * 5, droppable=True)
+        queue.push(b'b' * 5, droppable=True)
+        # 90 bytes held by the transport plus 10 queued is not over the limit
+        assert queue.dropped == 0
+        queue.push(b'c' * 5, droppable=True)
+        assert queue.dropped == 1
+
+    asyncio.run(main())
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        OutputQueue(lambda: None, policy='ignore')
@@ -0,0 +1,82 @@
+import json
+
+from py_socket_server.core.context import Context
+
+class Player:
+    __slots__ = ('id', 'position', 'rooms', 'frames', 'dropped_frames')
+
+    def __init__(self, id):
+        self.id = id
+        self.position = None
+        self.rooms = None
+        self.frames = []
+        self.dropped_frames = 0
+
+    def send_frame(self, frame, key=None, droppable=False):
+        self.frames.append(frame)
+
+    def received(self) -> list:
+        calls = [json.loads(call) for frame in self.frames for call in frame.split(b'\x00') if call]
+        self.frames = []
+        return calls
+
+def room(rate=20, keyframe_every=100):
+    ctx = Context({'tick': {'rate': rate}, 'replication': {'keyframe_every': keyframe_every}})
+    old, new = Player('old'), Player('new')
+    for player in (old, new):
+        ctx.rooms.join('map', player)
+    ctx.replication.enable_delta(new)
+    ctx.replication.update('map', 'e1', {'x': 1, 'y': 1, 'name': 'one'})
+    ctx.ticks.flush()
+    return ctx, old, new
+
+def test_joining_members_get_a_snapshot():
+    _, old, new = room()
+    assert old.received() == [['_S', 'e1', {'x': 1, 'y': 1, 'name': 'one'}]]
+    assert new.received() == [['_S', 'e1', {'x': 1, 'y': 1, 'name': 'one'}]]
+
+def test_delta_clients_get_changed_fields_only():
+    ctx, old, new = room()
+    old.received(), new.received()
+    ctx.replication.update('map', 'e1', {'x': 2, 'name': 'one'})
+    ctx.ticks.flush()
+    assert old.received() == [['_S', 'e1', {'x': 2, 'y': 1, 'name': 'one'}]]
+    assert new.received() == [['_SD', 'e1', {'x': 2}]]
+
+def test_unchanged_values_are_not_sent():
+    ctx, old, new = room()
+    old.received(), new.received()
+    ctx.replication.update('map', 'e1', {'x': 1})
+    ctx.ticks.flush()
+    assert old.frames == [] and new.frames == []
+
+def test_dropped_frame_triggers_a_snapshot():
+    ctx, old, new = room()
+    old.received(), new.received()
+    ctx.replication.update('map', 'e1', {'x': 2})
+    ctx.ticks.flush()
+    # The output queue lost the frame carrying x=2
+    new.frames = []
+    new.dropped_frames += 1
+    ctx.replication.update('map', 'e1', {'y': 3})
+    ctx.ticks.flush()
+    assert new.received() == [['_S', 'e1', {'x': 2, 'y': 3, 'name': 'one'}]]
+    assert ctx.replication.resyncs == 3
+
+def test_keyframes_for_delta_clients():
+    ctx, old, new = room(keyframe_every=2)
+    old.received(), new.received()
+    ctx.replication.update('map', 'e1', {'x': 2})
+    ctx.ticks.flush()
+    assert new.received() == [['_S', 'e1', {'x': 2, 'y': 1, 'name': 'one'}]]
+    assert old.received() == [['_S', 'e1', {'x': 2, 'y': 1, 'name': 'one'}]]
+
+def test_without_a_rate_updates_are_sent_right_away():
+    ctx = Context({})
+    player = Player('p')
+    ctx.rooms.join('map', player)
+    ctx.replication.enable_delta(player)
+    ctx.replication.sync(player)
+    ctx.replication.update('map', 'e1', {'x': 1})
+    ctx.replication.update('map', 'e1', {'x': 2})
+    assert player.received() == [['_S', 'e1', {'x': 1}], ['_SD', 'e1', {'x': 2}]]
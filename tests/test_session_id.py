@@ -0,0 +1,29 @@
+from py_socket_server.core.session_id import IdAllocator, ALPHABET, node_of, random_id
+
+def test_ids_use_the_alphabet_and_size():
+    allocator = IdAllocator(size=12, batch=8)
+    ids = [allocator.allocate() for _ in range(100)]
+    assert all(len(session_id) == 12 and set(session_id) <= set(ALPHABET) for session_id in ids)
+    assert len(set(ids)) == 100
+
+def test_taken_ids_are_skipped():
+    taken = {}
+    allocator = IdAllocator(taken, batch=4)
+    allocator.refill()
+    # The next id handed out is taken by a live session
+    taken[allocator.ready[-1]] = object()
+    skipped = allocator.ready[-1]
+    assert allocator.allocate() != skipped
+
+def test_node_prefix():
+    allocator = IdAllocator(batch=4)
+    assert node_of(allocator.allocate()) is None
+    allocator.set_node(3)
+    session_id = allocator.allocate()
+    assert session_id.startswith('3-')
+    assert node_of(session_id) == '3'
+
+def test_random_id_keeps_its_size_argument():
+    assert len(random_id()) == 16
+    short = random_id(8)
+    assert len(short) == 8 and set(short) <= set(ALPHABET)
@@ -0,0 +1,97 @@
+import asyncio
+
+from py_socket_server.core.timer_wheel import TimerWheel
+
+TICK = 0.01
+
+def test_fires_after_delay():
+    async def main():
+        wheel = TimerWheel(tick=TICK)
+        loop = asyncio.get_running_loop()
+        fired = []
+        start = loop.time()
+        wheel.schedule(3 * TICK, lambda name: fired.append((name, loop.time() - start)), 'late')
+        wheel.schedule(TICK, lambda name: fired.append((name, loop.time() - start)), 'early')
+        assert len(wheel) == 2
+        await asyncio.sleep(6 * TICK)
+        return wheel, fired
+
+    wheel, fired = asyncio.run(main())
+    assert [name for name, _ in fired] == ['early', 'late']
+    # Resolution is one tick, a timer never fires early
+    assert fired[1][1] >= 3 * TICK
+    assert len(wheel) == 0
+    assert wheel._handle is None
+
+def test_cancel():
+    async def main():
+        wheel = TimerWheel(tick=TICK)
+        fired = []
+        timer = wheel.schedule(TICK, fired.append, 'cancelled')
+        wheel.schedule(2 * TICK, fired.append, 'kept')
+        timer.cancel()
+        assert timer.cancelled()
+        # Cancelling twice is harmless
+        timer.cancel()
+        assert len(wheel) == 1
+        await asyncio.sleep(4 * TICK)
+        return fired
+
+    assert asyncio.run(main()) == ['kept']
+
+def test_cancel_from_a_callback_of_the_same_slot():
+    async def main():
+        wheel = TimerWheel(tick=TICK)
+        fired = []
+        timers = {}
+
+        def fire(name, other):
+            fired.append(name)
+            timers[other].cancel()
+
+        timers['a'] = wheel.schedule(TICK, fire, 'a', 'b')
+        timers['b'] = wheel.schedule(TICK, fire, 'b', 'a')
+        await asyncio.sleep(3 * TICK)
+        return wheel, fired
+
+    wheel, fired = asyncio.run(main())
+    # Timers of a slot fire in no particular order, whichever fires first cancels the other
+    assert len(fired) == 1
+    assert len(wheel) == 0
+
+def test_delay_longer_than_the_wheel():
+    async def main():
+        wheel = TimerWheel(tick=TICK, size=4)
+        fired = []
+        wheel.schedule(6 * TICK, fired.append, 'wrapped')
+        await asyncio.sleep(4 * TICK)
+        early = list(fired)
+        await asyncio.sleep(5 * TICK)
+        return early, fired
+
+    early, fired = asyncio.run(main())
+    assert early == []
+    assert fired == ['wrapped']
+
+def test_callback_errors_are_logged():
+    async def main():
+        wheel = TimerWheel(tick=TICK)
+        fired = []
+        wheel.schedule(TICK, lambda: 1 / 0)
+        wheel.schedule(TICK, fired.append, 'after')
+        await asyncio.sleep(3 * TICK)
+        return fired
+
+    assert asyncio.run(main()) == ['after']
+
+def test_stop():
+    async def main():
+        wheel = TimerWheel(tick=TICK)
+        fired = []
+        timer = wheel.schedule(TICK, fired.append, 'stopped')
+        wheel.stop()
+        assert timer.cancelled()
+        await asyncio.sleep(3 * TICK)
+        return fired
+
+    assert asyncio.run(main()) == []
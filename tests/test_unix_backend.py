@@ -0,0 +1,31 @@
+import asyncio
+
+from py_socket_server.cluster.unix_backend import UnixSocketBackend
+from py_socket_server.protocol.frames import encode_frame
+
+def test_malformed_frames_are_skipped(tmp_path):
+    async def main():
+        backend = UnixSocketBackend('a', ['a', 'b'], str(tmp_path), 'test')
+        batches = []
+
+        async def on_batch(messages):
+            batches.append(messages)
+
+        backend.on_batch = on_batch
+        await backend.start()
+        _, writer = await asyncio.open_unix_connection(backend.path('a'))
+        writer.write(encode_frame('hello', 'b', ['p1']) + b'["batch",[["call"\x00' + encode_frame('batch', [['call', 'p1', ['_S']]]))
+        await writer.drain()
+        for _ in range(20):
+            if batches:
+                break
+            await asyncio.sleep(0.01)
+
+        # The link survives the malformed frame
+        assert backend.links['b'] is not None
+        assert backend.lookup('p1') == 'b'
+        writer.close()
+        await backend.stop()
+        return batches
+
+    assert asyncio.run(main()) == [[['call', 'p1', ['_S']]]]
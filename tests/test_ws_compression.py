@@ -0,0 +1,66 @@
+import zlib
+
+from websockets.frames import Frame, Opcode
+
+from py_socket_server.server.ws_compression import CompressionFactory, Deflated, EMPTY_BLOCK, compression_from_config
+
+FRAME = b'["_S","p1",{"x":412,"y":318,"dir":3,"state":"walk"}]\x00' * 20
+
+def negotiate(factory, params=(('client_max_window_bits', None),)):
+    return factory.process_request_params(list(params), [])
+
+def inflate(data, window_bits=15) -> bytes:
+    return zlib.decompressobj(-window_bits).decompress(data + EMPTY_BLOCK)
+
+def test_shared_negotiates_without_context_takeover():
+    response, extension = negotiate(CompressionFactory(window_bits=11, shared=True))
+    assert ('server_no_context_takeover', None) in response
+    assert ('server_max_window_bits', '11') in response
+    assert extension.can_share
+
+    _, extension = negotiate(CompressionFactory(shared=False))
+    assert not extension.can_share
+
+def test_frame_is_compressed_once_for_every_connection():
+    factory = CompressionFactory(min_size=64)
+    extensions = [negotiate(factory)[1] for _ in range(3)]
+    payloads = [extension.compress_shared(FRAME) for extension in extensions]
+    assert payloads[0] is payloads[1] is payloads[2]
+    assert isinstance(payloads[0], Deflated)
+    assert factory.deflate.misses == 1 and factory.deflate.hits == 2
+
+    encoded = extensions[0].encode(Frame(Opcode.BINARY, payloads[0]))
+    assert encoded.rsv1
+    assert inflate(encoded.data) == FRAME
+
+def test_shared_bytes_decode_like_per_connection_ones():
+    factory = CompressionFactory(min_size=64, shared=False)
+    extension = negotiate(factory)[1]
+    first = extension.encode(Frame(Opcode.BINARY, FRAME))
+    assert first.rsv1
+    assert inflate(first.data) == FRAME
+
+def test_window_is_per_connection():
+    factory = CompressionFactory(window_bits=12, min_size=64)
+    small = negotiate(factory, [('server_max_window_bits', '10')])[1]
+    default = negotiate(factory)[1]
+    assert small.local_max_window_bits == 10
+    assert small.compress_shared(FRAME) is not default.compress_shared(FRAME)
+    assert inflate(small.compress_shared(FRAME), 10) == FRAME
+
+def test_short_messages_are_not_compressed():
+    factory = CompressionFactory(min_size=256)
+    extension = negotiate(factory)[1]
+    short = FRAME[:100]
+    assert extension.compress_shared(short) is short
+    frame = extension.encode(Frame(Opcode.BINARY, short))
+    assert not frame.rsv1 and frame.data == short
+    assert factory.deflate.skipped == 1
+
+def test_config():
+    assert compression_from_config({'enabled': False}) is None
+    factory = compression_from_config({'window_bits': 10, 'mem_level': 8, 'min_size': 0, 'shared': False})
+    assert factory.server_max_window_bits == 10
+    assert factory.compress_settings == {'memLevel': 8}
+    assert factory.min_size == 0
+    assert not factory.server_no_context_takeover